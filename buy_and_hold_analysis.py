@@ -1,12 +1,16 @@
 import os
+import sys
 import pandas as pd
 
+sys.path.append(os.path.join(os.path.dirname(__file__), 'swing_trading_strategies'))
+from data_loader import load_ohlcv, ticker_files
+
 # Settings
 initial_cash = 100000
 stock_dir = 'stockData'
 
 # Get all stock files
-stock_files = [f for f in os.listdir(stock_dir) if f.endswith('.csv')]
+stock_files = ticker_files(stock_dir)
 num_stocks = len(stock_files)
 if num_stocks == 0:
     raise Exception('No stock files found!')
@@ -17,9 +21,7 @@ cash_per_stock = initial_cash / num_stocks
 results = []
 for filename in stock_files:
     ticker = filename.split('_')[0]
-    df = pd.read_csv(os.path.join(stock_dir, filename), index_col='Date', parse_dates=True)
-    df.index = pd.to_datetime(df.index, utc=True).tz_localize(None)
-    df = df[(df.index >= pd.Timestamp('2000-01-01')) & (df.index <= pd.Timestamp('2024-12-31'))]
+    df = load_ohlcv(os.path.join(stock_dir, filename), pd.Timestamp('2000-01-01'), pd.Timestamp('2024-12-31'))
     if df.empty:
         continue
     first_price = df['Close'].iloc[0]
@@ -1,11 +1,29 @@
-from custom_backtest_engine import BacktestEngine, MovingAverageCrossoverStrategy
+from custom_backtest_engine import (BacktestEngine, VectorizedBacktestEngine, MovingAverageCrossoverStrategy, BreakoutStrategy,
+                                    BreakoutVer2Strategy, TwoStdDevStrategy, RsiMomentumStrategy, compute_indicators, IncrementalRsi,
+                                    TradeLog, BarData, create_engine)
+from batch_engine import BatchBacktestEngine, ParameterBatchEngine
+from benchmark import compare_results
+from checkpoint import CheckpointStore, run_incremental
+from data_loader import load_ohlcv, slice_dates
+from indicators import INDICATORS, online_indicator
+from plotting import PlotJob, downsample, render_plots
+from profiling import PROFILER
+from portfolio_engine import PortfolioEngine
+from streaming_engine import StreamingEngine
+from result_cache import ResultCache, run_cached
+from strategy_spec import StrategySpec, load_strategy_specs, save_strategy_specs
+from synthetic_data import synthetic_ohlcv, write_universe
+from trade_store import LOG_COLUMN_NAMES, TradeStore
+from walk_forward import run_walk_forward, walk_forward_windows
+import pickle
+import tempfile
+import os
+import numpy as np
 import pandas as pd
 
 # Test 1: Trade count matches expected (no pyramiding, no margin)
 def test_trade_count():
-    df = pd.read_csv('stockData/AAPL_1d.csv', index_col='Date', parse_dates=True)
-    df.index = pd.to_datetime(df.index, utc=True).tz_localize(None)
-    df = df[(df.index >= pd.Timestamp('2000-01-01')) & (df.index <= pd.Timestamp('2024-12-31'))]
+    df = load_ohlcv('stockData/AAPL_1d.csv', pd.Timestamp('2000-01-01'), pd.Timestamp('2024-12-31'))
     df = df.reset_index()
     strat = MovingAverageCrossoverStrategy(n1=10, n2=20, sl=0.95, tp=1.10)
     engine = BacktestEngine(df, strat)
@@ -16,9 +34,7 @@ def test_trade_count():
 
 # Test 2: No negative cash balance (no margin)
 def test_no_negative_balance():
-    df = pd.read_csv('stockData/AAPL_1d.csv', index_col='Date', parse_dates=True)
-    df.index = pd.to_datetime(df.index, utc=True).tz_localize(None)
-    df = df[(df.index >= pd.Timestamp('2000-01-01')) & (df.index <= pd.Timestamp('2024-12-31'))]
+    df = load_ohlcv('stockData/AAPL_1d.csv', pd.Timestamp('2000-01-01'), pd.Timestamp('2024-12-31'))
     df = df.reset_index()
     strat = MovingAverageCrossoverStrategy(n1=10, n2=20, sl=0.95, tp=1.10)
     engine = BacktestEngine(df, strat)
@@ -37,9 +53,7 @@ def test_no_negative_balance():
 
 # Test 3: Number of buy signals matches number of trades (no pyramiding)
 def test_buy_signals_vs_trades():
-    df = pd.read_csv('stockData/AAPL_1d.csv', index_col='Date', parse_dates=True)
-    df.index = pd.to_datetime(df.index, utc=True).tz_localize(None)
-    df = df[(df.index >= pd.Timestamp('2000-01-01')) & (df.index <= pd.Timestamp('2024-12-31'))]
+    df = load_ohlcv('stockData/AAPL_1d.csv', pd.Timestamp('2000-01-01'), pd.Timestamp('2024-12-31'))
     df = df.reset_index()
     strat = MovingAverageCrossoverStrategy(n1=10, n2=20, sl=0.95, tp=1.10)
     engine = BacktestEngine(df, strat)
@@ -60,7 +74,482 @@ def test_buy_signals_vs_trades():
     result = 'PASS' if buy_signals == len(trades) else f'FAIL (buy_signals={buy_signals}, trades={len(trades)})'
     print(f"Test 3 - Buy signals vs trades: {result}")
 
+# Test 4: Precomputed indicators match the per-bar slice calculations (running sums to rounding, max exactly)
+def test_indicators_match_slices():
+    df = pd.read_csv('stockData/AAPL_1d.csv', index_col='Date', parse_dates=True)
+    df = df.iloc[-1500:].reset_index()
+    ind = compute_indicators(df, {'sma': ('sma', 'Close', 20), 'std': ('std', 'Close', 260), 'max': ('max', 'High', 20)})
+    mismatches = 0
+    for i in range(260, len(df)):
+        if not np.isclose(ind['sma'][i], df['Close'].iloc[i-19:i+1].mean(), rtol=1e-12, atol=0): mismatches += 1
+        if not np.isclose(ind['std'][i], df['Close'].iloc[i-259:i+1].std(), rtol=1e-9, atol=0): mismatches += 1
+        if ind['max'][i-1] != df['High'].iloc[i-20:i].max(): mismatches += 1
+    nan_warmup = np.isnan(ind['sma'][:19]).all() and not np.isnan(ind['sma'][19])
+    result = 'PASS' if mismatches == 0 and nan_warmup else f'FAIL (mismatches={mismatches})'
+    print(f"Test 4 - Indicators match slices: {result}")
+    assert result == 'PASS'
+
+# Test 5: Incremental RSI agrees with the whole-series RSI for both smoothing methods
+def test_incremental_rsi():
+    df = pd.read_csv('stockData/AAPL_1d.csv')
+    closes = df['Close'].iloc[-2000:].to_numpy()
+    failures = []
+    for method, kind in (('simple', 'rsi'), ('wilder', 'rsi_wilder')):
+        batch = compute_indicators(pd.DataFrame({'Close': closes}), {'rsi': (kind, 'Close', 14)})['rsi']
+        rsi = IncrementalRsi(14, method)
+        streamed = np.array([rsi.update(c) for c in closes])
+        if not np.allclose(batch, streamed, rtol=0, atol=1e-9, equal_nan=True):
+            failures.append(method)
+    result = 'PASS' if not failures else f'FAIL ({", ".join(failures)})'
+    print(f"Test 5 - Incremental RSI: {result}")
+    assert result == 'PASS'
+
+# Test 6: Vectorized engine reproduces the loop engine's trades and equity
+def test_vectorized_matches_loop():
+    df = load_ohlcv('stockData/AAPL_1d.csv')
+    failures = []
+    for name, make in (('MA', lambda: MovingAverageCrossoverStrategy(n1=10, n2=20, sl=0.95, tp=1.10)),
+                       ('Breakout', lambda: BreakoutStrategy(breakout_period=20, sl=0.95, tp=999999.9)),
+                       ('BreakoutV2', lambda: BreakoutVer2Strategy(trailing_stop_perc=0.10, max_pyramids=5, entry_size_perc=0.20, pyramid_profit_perc=0.10, tp_long_perc=999)),
+                       ('BreakoutV2_Fixed', lambda: BreakoutVer2Strategy(use_trailing_stop=False, max_pyramids=4, entry_size_perc=0.25, pyramid_profit_perc=0.05)),
+                       ('TwoStdDev', lambda: TwoStdDevStrategy(buy_condition_option='SMA - Cross Above', trailing_stop_perc=0.10, max_pyramids=5, pyramid_profit_perc=0.10, entry_size_perc=0.20, tp_long_perc=1.20))):
+        loop_trades, loop_equity = BacktestEngine(df, make()).run()
+        vec_trades, vec_equity = VectorizedBacktestEngine(df, make()).run()
+        if not (loop_trades.equals(vec_trades) and np.array_equal(loop_equity.values, vec_equity.values)):
+            failures.append(name)
+    result = 'PASS' if not failures else f'FAIL ({", ".join(failures)})'
+    print(f"Test 6 - Vectorized matches loop: {result}")
+    assert result == 'PASS'
+
+# Test 7: Strategy specs pickle, hash, round-trip through a file and build equivalent strategies
+def test_strategy_spec():
+    spec = StrategySpec.create(TwoStdDevStrategy, length=20, buy_condition_option='SMA - Cross Above', max_pyramids=4)
+    same = StrategySpec.create('TwoStdDevStrategy', max_pyramids=4, length=20, buy_condition_option='SMA - Cross Above')
+    restored = pickle.loads(pickle.dumps(spec))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'strategies.json')
+        save_strategy_specs([('TwoStdDev', spec)], path)
+        loaded = load_strategy_specs(path)
+    strat = restored()
+    checks = [spec == same, hash(spec) == hash(same), spec.key() == restored.key(),
+              loaded == [('TwoStdDev', spec)], isinstance(strat, TwoStdDevStrategy),
+              strat.length == 20 and strat.max_pyramids == 4, spec() is not spec()]
+    result = 'PASS' if all(checks) else f'FAIL (checks={checks})'
+    print(f"Test 7 - Strategy specs: {result}")
+    assert result == 'PASS'
+
+# Test 8: One strategy instance run concurrently on several tickers matches separate instances
+def test_shared_strategy_threads():
+    from concurrent.futures import ThreadPoolExecutor
+    frames = []
+    for ticker in ('AAPL', 'MSFT', 'NVDA', 'TSLA'):
+        frames.append(load_ohlcv(f'stockData/{ticker}_1d.csv'))
+    params = dict(buy_condition_option='SMA - Cross Above', trailing_stop_perc=0.10, max_pyramids=5, pyramid_profit_perc=0.10, entry_size_perc=0.20)
+    shared = TwoStdDevStrategy(**params)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        concurrent = list(executor.map(lambda df: BacktestEngine(df, shared).run(), frames))
+    separate = [BacktestEngine(df, TwoStdDevStrategy(**params)).run() for df in frames]
+    same = all(a[0].equals(b[0]) and a[1].equals(b[1]) for a, b in zip(concurrent, separate))
+    result = 'PASS' if same and 'pyramid_count' not in vars(shared) else 'FAIL'
+    print(f"Test 8 - Shared strategy across threads: {result}")
+    assert result == 'PASS'
+
+# Test 9: Cached loader matches read_csv, is invalidated when the CSV changes, and slices like the mask filter
+def test_data_loader_cache():
+    import shutil
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'AAPL_1d.csv')
+        shutil.copy('stockData/AAPL_1d.csv', path)
+        expected = pd.read_csv(path, index_col='Date', parse_dates=True)
+        expected.index = pd.to_datetime(expected.index, utc=True).tz_localize(None)
+        cold, warm = load_ohlcv(path), load_ohlcv(path)
+        cached = os.path.exists(os.path.join(tmp, '.cache', 'AAPL_1d.npz'))
+        with open(path) as f:
+            lines = f.readlines()
+        with open(path, 'w') as f:
+            f.writelines(lines[:-100])
+        truncated = load_ohlcv(path)
+    start, end = pd.Timestamp('2010-01-01'), pd.Timestamp('2015-06-30')
+    masked = expected[(expected.index >= start) & (expected.index <= end)]
+    checks = [cold.equals(expected), warm.equals(expected), cached, len(truncated) == len(expected) - 100,
+              slice_dates(expected, start, end).equals(masked)]
+    result = 'PASS' if all(checks) else f'FAIL (checks={checks})'
+    print(f"Test 9 - Data loader cache: {result}")
+    assert result == 'PASS'
+
+# Test 10: Result cache returns the stored run, rescales it to a new cash amount and evicts LRU entries
+def test_result_cache():
+    df = load_ohlcv('stockData/AAPL_1d.csv', pd.Timestamp('2000-01-01'), pd.Timestamp('2023-12-31'))
+    specs = [StrategySpec.create(BreakoutVer2Strategy, max_pyramids=4, entry_size_perc=0.25, pyramid_profit_perc=0.10),
+             StrategySpec.create(MovingAverageCrossoverStrategy, n1=10, n2=20)]
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ResultCache(tmp)
+        first = run_cached(df, specs[0], 100000, cache)
+        hit = run_cached(df, specs[0], 100000, cache)
+        scaled = run_cached(df, specs[0], 5000, cache)
+        direct = run_cached(df, specs[0], 5000, False)
+        entry_size = os.path.getsize(os.path.join(tmp, cache.key(df, specs[0]) + '.pkl'))
+        small = ResultCache(tmp, max_bytes=entry_size)
+        run_cached(df, specs[1], 100000, small)
+        remaining = set(os.listdir(tmp))
+    checks = [cache.hits == 2 and cache.misses == 1, first[0].equals(hit[0]) and first[1].equals(hit[1]),
+              np.allclose(scaled[1].values, direct[1].values, rtol=1e-12),
+              np.allclose(scaled[0]['pnl'], direct[0]['pnl'], rtol=1e-9),
+              remaining == {small.key(df, specs[1]) + '.pkl'}]
+    result = 'PASS' if all(checks) else f'FAIL (checks={checks})'
+    print(f"Test 10 - Result cache: {result}")
+    assert result == 'PASS'
+
+# Test 11: Vectorized rebalancing matches a day-by-day simulation for every frequency
+def test_rebalancing_simulation():
+    from portfolio_analyzer import run_rebalancing_simulation, REBALANCE_PERIODS
+    invested = load_ohlcv('stockData/QQQ_1d.csv', pd.Timestamp('2010-01-01'), pd.Timestamp('2015-12-31'))['Close']
+    daily_cash_return = 1.03 ** (1 / 252) - 1
+    failures = []
+    for frequency, period_of in REBALANCE_PERIODS.items():
+        periods = period_of(invested.index)
+        returns = invested.pct_change().fillna(0).to_numpy()
+        inv, cash, expected = 20000.0, 80000.0, [100000.0]
+        for i in range(1, len(invested)):
+            if periods[i] != periods[i-1]:
+                inv, cash = (inv + cash) * 0.2, (inv + cash) * 0.8
+            else:
+                inv, cash = inv * (1 + returns[i]), cash * (1 + daily_cash_return)
+            expected.append(inv + cash)
+        result = run_rebalancing_simulation(invested, 20000, 80000, daily_cash_return, frequency=frequency, cash_fraction=0.8)
+        if not np.allclose(result.values, expected, rtol=1e-12):
+            failures.append(frequency)
+    result = 'PASS' if not failures else f'FAIL ({", ".join(failures)})'
+    print(f"Test 11 - Rebalancing simulation: {result}")
+    assert result == 'PASS'
+
+# Test 12: Portfolio engine reproduces single-ticker runs and never spends cash it doesn't have
+def test_portfolio_engine():
+    tickers = ('AAPL', 'MSFT', 'NVDA', 'QQQ')
+    data = {t: load_ohlcv(f'stockData/{t}_1d.csv', pd.Timestamp('2000-01-01'), pd.Timestamp('2023-12-31')) for t in tickers}
+    failures = []
+    for name, make in (('MA', lambda: MovingAverageCrossoverStrategy(n1=10, n2=20, sl=0.95, tp=1.10)),
+                       ('Breakout', lambda: BreakoutStrategy(breakout_period=20, sl=0.95, tp=999999.9)),
+                       ('TwoStdDev', lambda: TwoStdDevStrategy(buy_condition_option='SMA - Cross Above', trailing_stop_perc=0.10, max_pyramids=1, entry_size_perc=1.0))):
+        loop_trades, loop_equity = BacktestEngine(data['AAPL'], make()).run()
+        trades, equity = PortfolioEngine({'AAPL': data['AAPL']}, make()).run()
+        if not (loop_trades.equals(trades.drop(columns='ticker')) and np.allclose(loop_equity.values[:-1], equity.values, rtol=1e-9)):
+            failures.append(name)
+    trades, equity = PortfolioEngine(data, BreakoutVer2Strategy(trailing_stop_perc=0.10, max_pyramids=5, entry_size_perc=0.20,
+                                                                pyramid_profit_perc=0.10, tp_long_perc=999),
+                                     max_positions=2, max_position_perc=0.5).run()
+    open_positions = [((trades['entry_date'] <= d) & (trades['exit_date'] > d)).sum() for d in trades['entry_date']]
+    costs = trades['entry_price'] * trades['size']
+    if max(open_positions) > 2 or (costs > equity.max() * 0.5 + 1e-6).any() or equity.min() <= 0:
+        failures.append('limits')
+    result = 'PASS' if not failures else f'FAIL ({", ".join(failures)})'
+    print(f"Test 12 - Portfolio engine: {result}")
+    assert result == 'PASS'
+
+def test_batch_engine():
+    # Tickers with different histories (META and PYPL start later) in one panel
+    tickers = ('AAPL', 'META', 'NVDA', 'PYPL')
+    data = {t: load_ohlcv(f'stockData/{t}_1d.csv', pd.Timestamp('2000-01-01'), pd.Timestamp('2023-12-31')).reset_index() for t in tickers}
+    failures = []
+    for name, make in (('MA', lambda: MovingAverageCrossoverStrategy(n1=10, n2=20, sl=0.95, tp=1.10)),
+                       ('Breakout', lambda: BreakoutStrategy(breakout_period=20, sl=0.95, tp=999999.9)),
+                       ('TwoStdDev', lambda: TwoStdDevStrategy(buy_condition_option='SMA - Cross Above', trailing_stop_perc=0.10, max_pyramids=3, entry_size_perc=0.5)),
+                       ('BV2', lambda: BreakoutVer2Strategy(trailing_stop_perc=0.10, max_pyramids=5, entry_size_perc=0.20,
+                                                           pyramid_profit_perc=0.10, tp_long_perc=999))):
+        results = BatchBacktestEngine(data, make()).run()
+        for ticker in tickers:
+            loop_trades, loop_equity = BacktestEngine(data[ticker], make()).run()
+            trades, equity = results[ticker]
+            if not (loop_trades.equals(trades) and np.array_equal(np.asarray(loop_equity, dtype=float), equity.values)):
+                failures.append(f'{name}/{ticker}')
+    result = 'PASS' if not failures else f'FAIL ({", ".join(failures)})'
+    print(f"Test 13 - Batch engine matches per-ticker runs: {result}")
+    assert result == 'PASS'
+
+def test_parameter_batch_engine():
+    data = load_ohlcv('stockData/NVDA_1d.csv', pd.Timestamp('2000-01-01'), pd.Timestamp('2023-12-31')).reset_index()
+    param_sets = [dict(trailing_stop_perc=ts, max_pyramids=mp, entry_size_perc=es, pyramid_profit_perc=0.10, tp_long_perc=tp)
+                  for ts in (0.05, 0.10, 1.5) for mp in (1, 5) for es in (0.2, 1.0) for tp in (0.3, 999)]
+    results = ParameterBatchEngine.from_params(data, BreakoutVer2Strategy, param_sets).run()
+    # Mixed strategy classes run side by side as well
+    mixed = [MovingAverageCrossoverStrategy(n1=10, n2=20, sl=0.95, tp=1.10), BreakoutStrategy(breakout_period=20, sl=0.95, tp=999999.9)]
+    cases = [(str(p), BreakoutVer2Strategy(**p), r) for p, r in zip(param_sets, results)]
+    cases += [(type(s).__name__, s, r) for s, r in zip(mixed, ParameterBatchEngine(data, mixed).run())]
+    failures = []
+    for name, strategy, (trades, equity) in cases:
+        loop_trades, loop_equity = BacktestEngine(data, strategy).run()
+        if not (loop_trades.equals(trades) and np.array_equal(np.asarray(loop_equity, dtype=float), equity.values)):
+            failures.append(name)
+    result = 'PASS' if not failures else f'FAIL ({", ".join(failures)})'
+    print(f"Test 14 - Parameter batch engine matches per-config runs: {result}")
+    assert result == 'PASS'
+
+def _write_plot(plot_path, equity):
+    with open(plot_path, 'w') as f:
+        f.write(f'{len(equity)} {equity.max()} {equity.min()}')
+
+def test_plot_stage():
+    equity = pd.Series(np.cumsum(np.random.default_rng(0).normal(size=6000)), index=pd.date_range('2000-01-01', periods=6000))
+    small = downsample(equity, 500)
+    # LTTB keeps the endpoints and picks a subset of the original points
+    shape_ok = (len(small) == 500 and small.index[0] == equity.index[0] and small.index[-1] == equity.index[-1]
+                and small.index.is_monotonic_increasing and equity.loc[small.index].equals(small))
+    with tempfile.TemporaryDirectory() as plots_dir:
+        job = PlotJob(_write_plot, os.path.join(plots_dir, 'a.png'), {'equity': equity})
+        first = render_plots([job], plots_dir, workers=1)
+        unchanged = render_plots([job], plots_dir, workers=1)
+        changed = render_plots([PlotJob(_write_plot, job.path, {'equity': equity * 2})], plots_dir, workers=1)
+        with open(job.path) as f:
+            drawn_points = int(f.read().split()[0])
+    result = 'PASS' if shape_ok and (first, unchanged, changed) == (1, 0, 1) and drawn_points < len(equity) else 'FAIL'
+    print(f"Test 15 - Plot stage downsampling and manifest: {result}")
+    assert result == 'PASS'
+
+def test_streaming_engine():
+    data = load_ohlcv('stockData/TSLA_1d.csv', pd.Timestamp('2000-01-01'), pd.Timestamp('2023-12-31'))
+    failures = []
+    for name, make in (('MA', lambda: MovingAverageCrossoverStrategy(n1=10, n2=20, sl=0.95, tp=1.10)),
+                       ('RSI', lambda: RsiMomentumStrategy(rsi_method='wilder')),
+                       ('TwoStdDev', lambda: TwoStdDevStrategy(buy_condition_option='SMA - Cross Above', trailing_stop_perc=0.10, max_pyramids=3, entry_size_perc=0.5)),
+                       ('BV2', lambda: BreakoutVer2Strategy(use_trailing_stop=False, max_pyramids=5, entry_size_perc=0.20,
+                                                           pyramid_profit_perc=0.10, tp_long_perc=999))):
+        loop_trades, loop_equity = BacktestEngine(data, make()).run()
+        # Warm up on most of the history, then feed the remaining bars one at a time
+        engine = StreamingEngine.from_history(make(), data.iloc[:-300])
+        orders = [engine.on_bar(bar) for bar in data.iloc[-300:].reset_index().to_dict('records')]
+        trades, equity = engine.results()
+        sells = sum(order is not None and order.action == 'sell' for order in orders)
+        recent_exits = (loop_trades['exit_date'] >= data.index[-300]).sum() - (loop_trades['exit_reason'] == 'forced_close').sum()
+        if not (loop_trades.equals(trades) and np.array_equal(loop_equity.values, equity.values) and sells == recent_exits):
+            failures.append(name)
+    result = 'PASS' if not failures else f'FAIL ({", ".join(failures)})'
+    print(f"Test 16 - Streaming engine matches batch run: {result}")
+    assert result == 'PASS'
+
+# Test 17: Each online indicator's update() gives exactly its compute() array
+def test_online_indicators():
+    df = load_ohlcv('stockData/NVDA_1d.csv')
+    closes = df['Close'].to_numpy()
+    failures = []
+    for kind in INDICATORS:
+        for window in (2, 14, 260):
+            indicator = online_indicator(kind, window)
+            streamed = np.array([indicator.update(c) for c in closes.tolist()])
+            if not np.array_equal(streamed, INDICATORS[kind](closes, window), equal_nan=True):
+                failures.append(f'{kind}/{window}')
+    # Rows of a (tickers x bars) array get the values of their own series
+    panel = np.vstack([closes, closes[::-1]])
+    for kind in ('sma', 'std', 'max'):
+        rows = INDICATORS[kind](panel, 20)
+        if not (np.array_equal(rows[0], INDICATORS[kind](closes, 20), equal_nan=True)
+                and np.array_equal(rows[1], INDICATORS[kind](closes[::-1], 20), equal_nan=True)):
+            failures.append(f'{kind}/panel')
+    result = 'PASS' if not failures else f'FAIL ({", ".join(failures)})'
+    print(f"Test 17 - Online indicators match compute: {result}")
+    assert result == 'PASS'
+
+# Test 18: Resuming a checkpoint after new bars gives the same run as a full backtest
+def test_checkpoint_resume():
+    df = load_ohlcv('stockData/MSFT_1d.csv', pd.Timestamp('2005-01-01'), pd.Timestamp('2023-12-31'))
+    spec = StrategySpec.create(TwoStdDevStrategy, buy_condition_option='SMA - Cross Above', trailing_stop_perc=0.10,
+                               max_pyramids=5, pyramid_profit_perc=0.10, entry_size_perc=0.20, tp_long_perc=1.20)
+    expected_trades, expected_equity = BacktestEngine(df, spec()).run()
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        store = CheckpointStore(tmp)
+        run_incremental(df.iloc[:-250], spec, 'MSFT', store=store)
+        for end in (-10, -1, None):  # nightly updates
+            trades, equity = run_incremental(df.iloc[:end], spec, 'MSFT', store=store)
+        if not (trades.equals(expected_trades) and np.array_equal(equity.values, expected_equity.values)):
+            failures.append('resumed run')
+        if (store.resumed, store.rebuilt) != (3, 1):
+            failures.append(f'resumed={store.resumed} rebuilt={store.rebuilt}')
+        # A revised history is not resumed
+        revised = df.copy()
+        revised.iloc[100, revised.columns.get_loc('Close')] *= 1.01
+        trades, _ = run_incremental(revised, spec, 'MSFT', store=store)
+        if store.rebuilt != 2 or not trades.equals(BacktestEngine(revised, spec()).run()[0]):
+            failures.append('revised history')
+    result = 'PASS' if not failures else f'FAIL ({", ".join(failures)})'
+    print(f"Test 18 - Checkpoint resume: {result}")
+    assert result == 'PASS'
+
+# Test 19: Benchmark comparison flags slowdowns above the threshold only
+def test_benchmark_compare():
+    baseline = {'engine.a': {'seconds': 1.0}, 'engine.b': {'seconds': 1.0}, 'engine.c': {'seconds': 0.001},
+                'engine.d': {'seconds': 1.0}}
+    results = {'engine.a': {'seconds': 1.5, 'bars': 10}, 'engine.b': {'seconds': 1.1, 'bars': 10},
+               'engine.c': {'seconds': 0.002, 'bars': 10}, 'engine.d': {'seconds': 0.5, 'bars': 10},
+               'engine.e': {'seconds': 1.0, 'bars': 10}}
+    status = dict(zip(*compare_results(results, baseline, threshold=0.2)[['Benchmark', 'Status']].to_numpy().T))
+    expected = {'engine.a': 'REGRESSION', 'engine.b': 'ok', 'engine.c': 'ok', 'engine.d': 'faster', 'engine.e': 'new'}
+    bars = synthetic_ohlcv(5000, seed=1)
+    valid_bars = (len(bars) == 5000 and (bars['High'] >= bars[['Open', 'Close']].max(axis=1)).all()
+                  and (bars['Low'] <= bars[['Open', 'Close']].min(axis=1)).all()
+                  and bars.equals(synthetic_ohlcv(5000, seed=1)))
+    result = 'PASS' if status == expected and valid_bars else f'FAIL (status={status}, valid_bars={valid_bars})'
+    print(f"Test 19 - Benchmark comparison: {result}")
+    assert result == 'PASS'
+
+# Test 20: Profiling hooks time each engine phase without changing results
+def test_profiling():
+    df = load_ohlcv('stockData/AAPL_1d.csv')
+    make = lambda: BreakoutVer2Strategy(trailing_stop_perc=0.10, max_pyramids=5, entry_size_perc=0.20, pyramid_profit_perc=0.10, tp_long_perc=999)
+    plain = [BacktestEngine(df, make()).run(), VectorizedBacktestEngine(df, make()).run()]
+    PROFILER.reset()
+    PROFILER.enabled = True
+    try:
+        profiled = [BacktestEngine(df, make()).run(), VectorizedBacktestEngine(df, make()).run()]
+        summary = PROFILER.summary()
+    finally:
+        PROFILER.enabled = False
+        PROFILER.reset()
+    same = all(a[0].equals(b[0]) and a[1].equals(b[1]) for a, b in zip(plain, profiled))
+    phases = all(f'{engine}.{phase}' in summary['timers'] for engine in ('BacktestEngine', 'VectorizedBacktestEngine')
+                 for phase in ('prepare', 'signals', 'fills'))
+    counted = (summary['counters']['BacktestEngine.bars'] == len(df)
+               and summary['counters']['BacktestEngine.trades'] == len(plain[0][0])
+               and summary['timers']['BacktestEngine.signals']['calls'] == len(df)
+               and summary['rates']['VectorizedBacktestEngine.bars_per_sec'] > 0)
+    result = 'PASS' if same and phases and counted else f'FAIL (same={same}, phases={phases}, counted={counted})'
+    print(f"Test 20 - Profiling hooks: {result}")
+    assert result == 'PASS'
+
+# Test 21: Synthetic files load back exactly as generated, from the CSV and from the primed cache
+def test_synthetic_data():
+    failures = []
+    with tempfile.TemporaryDirectory() as data_dir:
+        paths = write_universe(data_dir, 3, 2000, seed=7, model='regime')
+        for i, path in enumerate(paths):
+            expected = synthetic_ohlcv(2000, seed=7, ticker_index=i, model='regime')
+            if not (load_ohlcv(path, use_cache=False).equals(expected) and load_ohlcv(path).equals(expected)):
+                failures.append(os.path.basename(path))
+    with open('stockData/AAPL_1d.csv') as f:
+        header = f.readline()
+    gbm = synthetic_ohlcv(3000, seed=7)
+    if not synthetic_ohlcv(1000, seed=7).equals(gbm.iloc[:1000]):
+        failures.append('prefix')
+    if not ((gbm['High'] >= gbm[['Open', 'Close']].max(axis=1)).all() and (gbm['Low'] <= gbm[['Open', 'Close']].min(axis=1)).all()):
+        failures.append('ranges')
+    if synthetic_ohlcv(1000, seed=8).equals(gbm.iloc[:1000]) or list(gbm.columns) != header.strip().split(',')[1:]:
+        failures.append('layout')
+    result = 'PASS' if not failures else f'FAIL ({", ".join(failures)})'
+    print(f"Test 21 - Synthetic data: {result}")
+    assert result == 'PASS'
+
+# Test 22: Compact engine storage - simulate() defers the DataFrames, and the trade log grows past its capacity
+def test_compact_storage():
+    df = load_ohlcv('stockData/TSLA_1d.csv')
+    make = lambda: BreakoutVer2Strategy(trailing_stop_perc=0.10, max_pyramids=5, entry_size_perc=0.20, pyramid_profit_perc=0.10, tp_long_perc=999)
+    result = BacktestEngine(df, make()).simulate()
+    trades, equity = BacktestEngine(df, make()).run()
+    compact = (result.equity.dtype == np.float64 and len(result.equity) == len(df) + 1
+               and len(result.trade_log) == len(trades) and len(result.trade_log.reasons) < len(trades))
+    same = result.trades().equals(trades) and result.equity_curve().equals(equity)
+
+    log = TradeLog(capacity=2)
+    dates = df.index.to_numpy()
+    for i in range(40):
+        log.append(i, i + 3, 10.0 + i, 11.0 + i, 2.0, 'Stop Loss' if i % 2 else 'Take Profit')
+    frame = log.frame(dates)
+    grown = (len(frame) == 40 and frame['exit_reason'].iloc[-1] == 'Stop Loss' and frame['pnl'].eq(2.0).all()
+             and frame['exit_date'].iloc[-1] == dates[42] and len(log.reasons) == 2)
+    result = 'PASS' if compact and same and grown else f'FAIL (compact={compact}, same={same}, grown={grown})'
+    print(f"Test 22 - Compact engine storage: {result}")
+    assert result == 'PASS'
+
+# Test 23: Trade store round-trips engine trades, answers indexed queries and exports the text log
+def test_trade_store():
+    df = load_ohlcv('stockData/NVDA_1d.csv', '2000-01-01', '2023-12-31')
+    trailing, _ = BacktestEngine(df, BreakoutVer2Strategy(trailing_stop_perc=0.10, max_pyramids=5, entry_size_perc=0.20, pyramid_profit_perc=0.10, tp_long_perc=999)).run()
+    fixed, _ = BacktestEngine(df, MovingAverageCrossoverStrategy(n1=10, n2=20, sl=0.95, tp=1.10)).run()
+    empty = pd.DataFrame([])
+    with tempfile.TemporaryDirectory() as tmp:
+        with TradeStore(os.path.join(tmp, 'trades.db'), batch_rows=50) as store:
+            store.append('NVDA', 'Trailing', trailing)
+            store.append('NVDA', 'MA', fixed.rename(columns=LOG_COLUMN_NAMES))  # main.py's column names
+            store.append('NVDA', 'Idle', empty)
+        with TradeStore(os.path.join(tmp, 'trades.db')) as store:
+            round_trip = store.trades('NVDA', 'Trailing').equals(trailing) and store.trades('NVDA', 'MA').equals(fixed)
+            stops = store.query(ticker='NVDA', exit_reason='Trailing Stop', start='2010-01-01')
+            expected = trailing[(trailing['exit_reason'] == 'Trailing Stop') & (trailing['exit_date'] >= '2010-01-01')]
+            queried = (len(stops) == len(expected) > 0 and (stops['strategy'] == 'Trailing').all()
+                       and store.trades('NVDA', 'Idle').empty and len(store.backtests()) == 3)
+            store.export_text(os.path.join(tmp, 'trade_logs.txt'))
+        with open(os.path.join(tmp, 'trade_logs.txt')) as f:
+            text = f.read()
+    expected_text = ''.join(f'NVDA_{name} TRADES:\n' + trades.rename(columns=LOG_COLUMN_NAMES).to_string(index=False) + '\n\n'
+                            for name, trades in (('Trailing', trailing), ('MA', fixed), ('Idle', empty)))
+    exported = text == expected_text
+    result = 'PASS' if round_trip and queried and exported else f'FAIL (round_trip={round_trip}, queried={queried}, exported={exported})'
+    print(f"Test 23 - Trade store: {result}")
+    assert result == 'PASS'
+
+# Test 24: Walk-forward windows tile the history, share whole-series indicators and stitch to a carried-capital rerun
+def test_walk_forward():
+    df = load_ohlcv('stockData/NVDA_1d.csv', '2000-01-01', '2023-12-31')
+    windows = walk_forward_windows(df.index, in_sample_months=24, out_of_sample_months=6)
+    tiled = all(prev[3] == cur[2] for prev, cur in zip(windows, windows[1:])) and windows[-1][3] == len(df)
+    bars = BarData(df.reset_index())
+    window = bars.window(500, 900)
+    shared = (np.array_equal(window.indicator('sma', 'Close', 50), bars.indicator('sma', 'Close', 50)[500:900], equal_nan=True)
+              and not np.isnan(window.indicator('sma', 'Close', 50)).any() and len(bars._indicator_cache) == 1)
+
+    grid = {'length': [20, 50, 100], 'stdev_factor': [1.5, 2.0]}
+    walk = run_walk_forward(TwoStdDevStrategy, grid, tickers=['NVDA'], in_sample_months=24, out_of_sample_months=6, workers=1)
+    capital, curves = 100000.0, []
+    for (_, row), (_, _, oos_start, oos_stop) in zip(walk.windows.iterrows(), windows):
+        strategy = TwoStdDevStrategy(length=row['length'], stdev_factor=row['stdev_factor'])
+        _, equity = create_engine(bars.window(oos_start, oos_stop), strategy, initial_cash=capital).run()
+        curves.append(equity.to_numpy()[1:])
+        capital = equity.iloc[-1]
+    stitched = walk.equity['NVDA']
+    matches = (len(walk.windows) == len(windows) and stitched.index.equals(df.index[windows[0][2]:])
+               and np.allclose(np.concatenate(curves), stitched.to_numpy(), rtol=1e-12))
+    result = 'PASS' if tiled and shared and matches else f'FAIL (tiled={tiled}, shared={shared}, matches={matches})'
+    print(f"Test 24 - Walk-forward optimization: {result}")
+    assert result == 'PASS'
+
+# Test 25: A ticker whose data ends early is closed on its last bar, freeing its cash and position slot
+def test_portfolio_early_end():
+    aapl, msft = load_ohlcv('stockData/AAPL_1d.csv'), load_ohlcv('stockData/MSFT_1d.csv')
+    short = aapl.iloc[:3997]
+    trades, equity = PortfolioEngine({'AAPL': short, 'MSFT': msft}, BreakoutVer2Strategy(), max_positions=1).run()
+    last_aapl = trades[trades['ticker'] == 'AAPL'].iloc[-1]
+    closed = last_aapl['exit_reason'] == 'forced_close' and last_aapl['exit_date'] == short.index[-1]
+    later = trades[(trades['ticker'] == 'MSFT') & (trades['entry_date'] > short.index[-1])]
+    # The last date's move is MSFT's alone, and the curve ends on the realized pnl
+    held = trades[(trades['ticker'] == 'MSFT') & (trades['entry_date'] < msft.index[-1]) & (trades['exit_date'] == msft.index[-1])]
+    last_move = held['size'].sum() * (msft['Close'].iloc[-1] - msft['Close'].iloc[-2])
+    no_jump = (np.isclose(equity.iloc[-1] - equity.iloc[-2], last_move)
+               and np.isclose(equity.iloc[-1], 100000 + trades['pnl'].sum()))
+    result = 'PASS' if closed and len(later) > 0 and no_jump else f'FAIL (closed={closed}, later={len(later)}, no_jump={no_jump})'
+    print(f"Test 25 - Portfolio ticker ending early: {result}")
+    assert result == 'PASS'
+
 if __name__ == '__main__':
     test_trade_count()
     test_no_negative_balance()
     test_buy_signals_vs_trades()
+    test_indicators_match_slices()
+    test_incremental_rsi()
+    test_vectorized_matches_loop()
+    test_strategy_spec()
+    test_shared_strategy_threads()
+    test_data_loader_cache()
+    test_result_cache()
+    test_rebalancing_simulation()
+    test_portfolio_engine()
+    test_batch_engine()
+    test_parameter_batch_engine()
+    test_plot_stage()
+    test_streaming_engine()
+    test_online_indicators()
+    test_checkpoint_resume()
+    test_benchmark_compare()
+    test_profiling()
+    test_synthetic_data()
+    test_compact_storage()
+    test_trade_store()
+    test_walk_forward()
+    test_portfolio_early_end()
@@ -57,7 +57,8 @@ import pandas as pd
 import os
 import sys
 sys.path.append('..')  # Ensure parent dir is in path for import
-from custom_backtest_engine import BacktestEngine, MovingAverageCrossoverStrategy
+from custom_backtest_engine import BacktestEngine, MovingAverageCrossoverStrategy, RsiMomentumStrategy
+from data_loader import load_ohlcv
 
 def run_backtest(strategy_class, data, cash=100000):
     strat = strategy_class()
@@ -77,9 +78,7 @@ if __name__ == '__main__':
     for filename in os.listdir(data_dir):
         if filename.endswith('.csv'):
             ticker = filename.split('_')[0]
-            data = pd.read_csv(f'{data_dir}/{filename}', index_col='Date', parse_dates=True)
-            data.index = pd.to_datetime(data.index, utc=True).tz_localize(None)
-            data = data[(data.index >= pd.Timestamp('2000-01-01')) & (data.index <= pd.Timestamp('2024-12-31'))]
+            data = load_ohlcv(f'{data_dir}/{filename}', pd.Timestamp('2000-01-01'), pd.Timestamp('2024-12-31'))
 
             # Moving Average Crossover
             stats_ma = run_backtest(MovingAverageCrossoverStrategy, data)
@@ -92,14 +91,14 @@ if __name__ == '__main__':
                 trades_ma.to_csv('GOOGL_MA_Crossover_trades.csv')
             results[f'{ticker}_MA_Crossover'] = summary_ma
 
-            # RSI Momentum (not implemented in custom engine, placeholder)
-            # stats_rsi = run_backtest(RsiMomentumStrategy, data)
-            # trades_rsi = stats_rsi['_trades']
-            # equity_curve_rsi = stats_rsi['_equity_curve'] if stats_rsi['_equity_curve'] is not None and len(stats_rsi['_equity_curve']) > 0 else None
-            # if equity_curve_rsi is None:
-            #     print(f"Warning: Equity curve missing or empty for {ticker} RSI_Momentum")
-            # summary_rsi = generate_summary_from_trades(trades_rsi, equity_curve_rsi)
-            # results[f'{ticker}_RSI_Momentum'] = summary_rsi
+            # RSI Momentum
+            stats_rsi = run_backtest(RsiMomentumStrategy, data)
+            trades_rsi = stats_rsi['_trades']
+            equity_curve_rsi = stats_rsi['_equity_curve'] if stats_rsi['_equity_curve'] is not None and len(stats_rsi['_equity_curve']) > 0 else None
+            if equity_curve_rsi is None:
+                print(f"Warning: Equity curve missing or empty for {ticker} RSI_Momentum")
+            summary_rsi = generate_summary_from_trades(trades_rsi, equity_curve_rsi)
+            results[f'{ticker}_RSI_Momentum'] = summary_rsi
 
             # Breakout (not implemented in custom engine, placeholder)
             # stats_breakout = run_backtest(BreakoutStrategy, data)
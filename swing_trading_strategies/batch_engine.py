@@ -0,0 +1,284 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(__file__))
+from custom_backtest_engine import (BarData, INDICATORS, EXIT_FORCED, EXIT_STOP, EXIT_TARGET, EXIT_SIGNAL,
+                                    trade_frame)
+
+# --- Panel Data ---
+
+# Indicators whose windows run along the last axis of a 2-D array
+_PANEL_INDICATORS = {'sma', 'std', 'max'}
+
+class PanelBars(BarData):
+    """
+    BarData for several tickers at once. Each price attribute is a
+    (bars x tickers) array whose column k is ticker k's series, so row i is
+    every ticker's i-th bar. Tickers with shorter histories are padded with
+    NaN at the end; `lengths` holds each ticker's real bar count and
+    `date_values` its own dates. Indicators are computed for all tickers in
+    one call and are bit-identical to the single-ticker arrays.
+
+    Strategy.signal_arrays implementations index bars along the first axis,
+    so they produce (bars x tickers) signal arrays from a PanelBars unchanged.
+    """
+    def __init__(self, data):
+        self.source = data
+        self.frame = None
+        self.tickers = list(data)
+        frames = [data[t] if 'Date' in data[t].columns else data[t].reset_index() for t in self.tickers]
+        self.lengths = np.array([len(frame) for frame in frames], dtype=np.int64)
+        self.date_values = [frame['Date'].to_numpy() for frame in frames]
+        self._rows = {}
+        for column in ('Open', 'High', 'Low', 'Close', 'Volume'):
+            if all(column in frame.columns for frame in frames):
+                rows = np.full((len(frames), max(self.lengths, default=0)), np.nan)
+                for k, frame in enumerate(frames):
+                    rows[k, :len(frame)] = frame[column].to_numpy(dtype=np.float64)
+                self._rows[column] = rows
+        self.open, self.high, self.low, self.close, self.volume = (
+            self._rows[c].T if c in self._rows else None for c in ('Open', 'High', 'Low', 'Close', 'Volume'))
+        self.ind = {}
+        self._indicator_cache = {}
+
+    def date(self, i):
+        raise TypeError("PanelBars has one date series per ticker; use date_values[k]")
+
+    def array(self, column):
+        return self._rows[column].T
+
+    def indicator(self, kind, column, window):
+        key = (kind, column, window)
+        if key not in self._indicator_cache:
+            rows = self._rows[column]
+            if kind in _PANEL_INDICATORS:
+                values = INDICATORS[kind](rows, window)
+            else:
+                values = np.full(rows.shape, np.nan)
+                for k, n in enumerate(self.lengths):
+                    values[k, :n] = INDICATORS[kind](rows[k, :n], window)
+            self._indicator_cache[key] = values.T
+        return self._indicator_cache[key]
+
+# --- Column Simulation ---
+
+def _column_params(sigs):
+    """Per-column arrays of the SignalArrays settings; a missing setting becomes a value that never fires."""
+    def column(values, dtype=np.float64):
+        return np.array(values, dtype=dtype)
+    can_pyramid = [s.max_pyramids > 1 and s.pyramid_profit_perc is not None for s in sigs]
+    return {
+        'size_perc': column([s.size_perc or 1.0 for s in sigs]),
+        'trailing_stop': column([np.nan if s.trailing_stop is None else s.trailing_stop for s in sigs]),
+        'stop_loss': column([np.nan if s.stop_loss is None else s.stop_loss for s in sigs]),
+        'take_profit': column([s.take_profit if s.take_profit else np.nan for s in sigs]),
+        'max_pyramids': column([s.max_pyramids if p else 1 for s, p in zip(sigs, can_pyramid)], np.int64),
+        'pyramid_profit_perc': column([s.pyramid_profit_perc if p else np.inf for s, p in zip(sigs, can_pyramid)]),
+        'stop_after_pyramid': column([s.stop_after_pyramid if p and s.trailing_stop is None and s.stop_after_pyramid is not None
+                                      else np.nan for s, p in zip(sigs, can_pyramid)]),
+    }
+
+def _simulate(closes, highs, entries, exits, lengths, sigs, initial_cash):
+    """
+    Runs the BacktestEngine bookkeeping independently for every column of the
+    (bars x columns) arrays, column k following sigs[k]'s settings and ending
+    at bar lengths[k] - 1. Returns (trades per column, equity rows, final cash)
+    where trades are (entry bar, exit bar, entry price, exit price, size, code).
+    """
+    n_bars, n_cols = closes.shape
+    params = _column_params(sigs)
+    size_perc = params['size_perc']
+    has_trail = ~np.isnan(params['trailing_stop'])
+    has_stop_loss = ~np.isnan(params['stop_loss'])
+    has_target = ~np.isnan(params['take_profit'])
+    max_pyramids = params['max_pyramids']
+    pyramid_profit_perc = params['pyramid_profit_perc']
+    stop_after_pyramid = params['stop_after_pyramid']
+    has_reset = ~np.isnan(stop_after_pyramid)
+    can_pyramid = bool((max_pyramids > 1).any())
+    # (first, second) exit codes when a bar hits both the stop and the target
+    code_order = [(EXIT_TARGET, EXIT_STOP) if s.tp_first else (EXIT_STOP, EXIT_TARGET) for s in sigs]
+
+    # Row-level flags, so bars where nothing can happen cost only the equity update
+    entry_rows = entries.any(axis=1).tolist()
+    exit_rows = exits.any(axis=1).tolist() if exits is not None else [False] * n_bars
+    ending_by_row = {}
+    for k, n in enumerate(lengths.tolist()):
+        if n:
+            ending_by_row.setdefault(n - 1, []).append(k)
+    trail_stops = None
+    if has_trail.any():
+        with np.errstate(invalid='ignore'):
+            trail_stops = np.where(has_trail, highs * params['trailing_stop'], -np.inf)
+
+    cash = np.full(n_cols, float(initial_cash))
+    shares = np.zeros(n_cols)
+    held = np.zeros(n_cols, dtype=bool)
+    avg_price = np.zeros(n_cols)
+    # No stop / no target are -inf / +inf, so the comparisons never fire
+    stop = np.full(n_cols, -np.inf)
+    target = np.full(n_cols, np.inf)
+    count = np.zeros(n_cols, dtype=np.int64)
+    entry_bar = np.zeros(n_cols, dtype=np.int64)
+    equity = np.empty((n_bars, n_cols))
+    exiting = np.empty(n_cols, dtype=bool)
+    stop_hit = np.empty(n_cols, dtype=bool)
+    tp_hit = np.empty(n_cols, dtype=bool)
+    n_held = 0
+    trades = [[] for _ in range(n_cols)]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for i in range(n_bars):
+            price = closes[i]
+            current_equity = cash + shares * price
+            equity[i] = current_equity
+            entering = entries[i] & ~held if entry_rows[i] else None
+
+            if n_held:
+                # --- Exits ---
+                if trail_stops is not None:
+                    np.maximum(stop, trail_stops[i], out=stop, where=held)
+                np.less_equal(price, stop, out=stop_hit)
+                np.greater_equal(price, target, out=tp_hit)
+                np.logical_or(stop_hit, tp_hit, out=exiting)
+                if exit_rows[i]:
+                    exiting |= exits[i]
+                exiting &= held
+                n_exits = np.count_nonzero(exiting)
+                if n_exits:
+                    for k in np.flatnonzero(exiting).tolist():
+                        first_code, second_code = code_order[k]
+                        first, second = (tp_hit, stop_hit) if first_code == EXIT_TARGET else (stop_hit, tp_hit)
+                        code = first_code if first[k] else second_code if second[k] else EXIT_SIGNAL
+                        trades[k].append((entry_bar[k], i, avg_price[k], price[k], shares[k], code))
+                    np.add(cash, shares * price, out=cash, where=exiting)
+                    shares[exiting] = 0.0
+                    held &= ~exiting
+                    n_held -= n_exits
+
+                # --- Pyramid adds ---
+                if can_pyramid and entry_rows[i] and n_held:
+                    adding = held & entries[i] & (count < max_pyramids)
+                    adding &= (price - avg_price) / avg_price >= pyramid_profit_perc
+                    if adding.any():
+                        new_shares = np.where(adding, current_equity * size_perc / price, 0.0)
+                        new_total = shares + new_shares
+                        np.copyto(avg_price, ((avg_price * shares) + (price * new_shares)) / new_total, where=adding)
+                        np.copyto(shares, new_total, where=adding)
+                        np.subtract(cash, new_shares * price, out=cash, where=adding)
+                        count += adding
+                        np.copyto(stop, stop_after_pyramid, where=adding & has_reset)
+
+            # --- Entries (only while flat at the start of the bar) ---
+            if entering is not None and entering.any():
+                new_shares = current_equity * size_perc / price
+                np.copyto(shares, new_shares, where=entering)
+                np.subtract(cash, new_shares * price, out=cash, where=entering)
+                held |= entering
+                n_held += np.count_nonzero(entering)
+                np.copyto(avg_price, price, where=entering)
+                count[entering] = 1
+                entry_bar[entering] = i
+                stop[entering] = -np.inf
+                np.copyto(stop, price * params['stop_loss'], where=entering & has_stop_loss & ~has_trail)
+                if trail_stops is not None:
+                    np.copyto(stop, trail_stops[i], where=entering & has_trail)
+                target[entering] = np.inf
+                np.copyto(target, price * params['take_profit'], where=entering & has_target)
+
+            # --- Forced close on each column's last bar ---
+            for k in ending_by_row.get(i, ()):
+                if held[k]:
+                    trades[k].append((entry_bar[k], i, avg_price[k], price[k], shares[k], EXIT_FORCED))
+                    cash[k] += shares[k] * price[k]
+                    shares[k] = 0.0
+                    held[k] = False
+                    n_held -= 1
+
+    return trades, equity, cash
+
+def _trade_frame(trades, date_values, sig):
+    if not trades:
+        return pd.DataFrame([])
+    reason_names = {EXIT_FORCED: 'forced_close', EXIT_STOP: sig.stop_reason, EXIT_TARGET: sig.tp_reason, EXIT_SIGNAL: sig.exit_reason}
+    entry_bars, exit_bars, entry_prices, exit_prices, sizes, codes = (np.array(c) for c in zip(*trades))
+    return trade_frame(entry_bars, exit_bars, entry_prices, exit_prices, sizes,
+                       [reason_names[c] for c in codes.tolist()], date_values)
+
+def _column_result(trades, equity, cash, k, n, date_values, sig):
+    """(trades, equity_curve) of column k in the BacktestEngine.run format."""
+    return _trade_frame(trades[k], date_values, sig), pd.Series(np.append(equity[:n, k], cash[k]))
+
+# --- Batch Engines ---
+
+class BatchBacktestEngine:
+    """
+    Runs one vectorized strategy on many tickers in a single loop over bars.
+    Every ticker has its own cash and position, held as vectors across the
+    ticker axis (shares, average price, stop, target, pyramid count), and
+    each bar advances all of them with NumPy operations: equity, trailing
+    stop ratchets, stop / take-profit / signal exits, pyramid adds and
+    entries. The per-bar Python cost is shared by the whole universe.
+
+    run() returns {ticker: (trades, equity_curve)} with exactly the values
+    of BacktestEngine(data[ticker], strategy).run() for each ticker.
+    """
+    def __init__(self, data, strategy, initial_cash=100000):
+        if not strategy.vectorized:
+            raise ValueError(f"BatchBacktestEngine needs a vectorized strategy; {type(strategy).__name__} is not")
+        self.data = data if isinstance(data, PanelBars) else PanelBars(data)
+        self.strategy = strategy
+        self.initial_cash = initial_cash
+
+    def run(self):
+        bars = self.strategy.prepare(self.data)
+        sig = self.strategy.signal_arrays(bars)
+        entries = np.asarray(sig.entries, dtype=bool)
+        exits = np.asarray(sig.exits, dtype=bool) if sig.exits is not None else None
+        trades, equity, cash = _simulate(bars.close, bars.high, entries, exits, bars.lengths,
+                                         [sig] * len(bars.tickers), self.initial_cash)
+        return {ticker: _column_result(trades, equity, cash, k, bars.lengths[k], bars.date_values[k], sig)
+                for k, ticker in enumerate(bars.tickers)}
+
+class ParameterBatchEngine:
+    """
+    Runs K configurations of a strategy on one ticker in a single loop over
+    bars. Each configuration's signals come from its own signal_arrays on a
+    shared BarData (so indicators with the same window are computed once)
+    and become one column of a (bars x K) panel; K independent cash,
+    position, stop and pyramid states then advance together as in
+    BatchBacktestEngine. Configurations may differ in any parameter,
+    including stops, targets, sizing and pyramiding.
+
+    run() returns a list of (trades, equity_curve), one per strategy in
+    order, equal to BacktestEngine(data, strategy).run() for each.
+    """
+    def __init__(self, data, strategies, initial_cash=100000):
+        for strategy in strategies:
+            if not strategy.vectorized:
+                raise ValueError(f"ParameterBatchEngine needs vectorized strategies; {type(strategy).__name__} is not")
+        self.data = data if isinstance(data, BarData) else BarData(data)
+        self.strategies = list(strategies)
+        self.initial_cash = initial_cash
+
+    @classmethod
+    def from_params(cls, data, strategy_class, param_sets, initial_cash=100000):
+        """Engine for strategy_class(**params) for each dict in `param_sets`."""
+        return cls(data, [strategy_class(**params) for params in param_sets], initial_cash)
+
+    def run(self):
+        sigs = [strategy.signal_arrays(strategy.prepare(self.data)) for strategy in self.strategies]
+        n, k = len(self.data), len(sigs)
+        entries = np.empty((n, k), dtype=bool)
+        exits = np.zeros((n, k), dtype=bool) if any(s.exits is not None for s in sigs) else None
+        for j, sig in enumerate(sigs):
+            entries[:, j] = sig.entries
+            if sig.exits is not None:
+                exits[:, j] = sig.exits
+        # Every column walks the same prices
+        closes = np.broadcast_to(self.data.close[:, None], (n, k))
+        highs = np.broadcast_to(self.data.high[:, None], (n, k))
+        trades, equity, cash = _simulate(closes, highs, entries, exits, np.full(k, n), sigs, self.initial_cash)
+        return [_column_result(trades, equity, cash, j, n, self.data.date_values, sig) for j, sig in enumerate(sigs)]
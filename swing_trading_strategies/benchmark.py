@@ -0,0 +1,247 @@
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(__file__))
+from custom_backtest_engine import (BacktestEngine, MovingAverageCrossoverStrategy, BreakoutStrategy,
+                                    BreakoutVer2Strategy, TwoStdDevStrategy, RsiMomentumStrategy)
+from backtester import generate_summary_from_trades
+from config import START_DATE, END_DATE
+from data_loader import DATA_DIR, load_ohlcv, ticker_files
+from main import STRATEGIES, run_backtest, run_ticker_strategy
+from plotting import render_plots
+from report_generator import generate_report
+from rsi_benchmark import time_call
+from synthetic_data import TRADING_DAYS, synthetic_ohlcv
+from trade_store import TradeStore
+
+# Benchmark suite for the engine and the pipeline stages. Times
+# BacktestEngine.run for each strategy class on every stockData ticker and on
+# synthetic series, and the data-load, backtest, metrics, trade-store, report and
+# plotting stages of main.py and portfolio_analyzer.py (writing into a scratch
+# directory, never over the tracked reports). Each timing is the best of
+# several runs spread over a few rounds of the whole suite. Results can be saved as a JSON baseline and later compared against it:
+#
+#   python benchmark.py --save benchmark_baseline.json
+#   python benchmark.py --compare benchmark_baseline.json --threshold 0.2
+#
+# --compare exits with status 1 if any benchmark got slower than the threshold.
+# The main and portfolio groups can run on a larger universe written by
+# synthetic_data.py instead of stockData:
+#
+#   python synthetic_data.py --tickers 500 --out ../syntheticData
+#   python benchmark.py --groups main portfolio --data-dir ../syntheticData
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'benchmark_baseline.json')
+DEFAULT_THRESHOLD = 0.20   # flag benchmarks more than 20% slower than the baseline...
+NOISE_FLOOR_SECONDS = 0.005  # ...and slower by more than this, so tiny timings don't flap
+STRATEGY_CLASSES = [MovingAverageCrossoverStrategy, BreakoutStrategy, BreakoutVer2Strategy,
+                    TwoStdDevStrategy, RsiMomentumStrategy]
+SYNTHETIC_SIZES = [10_000, 100_000, 1_000_000]
+QUICK_SYNTHETIC_SIZES = [10_000, 100_000]
+PLOT_SAMPLE = 3  # equity plots drawn by the plotting stage
+MEASURE_BUDGET_SECONDS = 0.3  # fast calls are repeated up to about this long...
+MAX_REPEATS = 10              # ...and at most this many times, per round
+DEFAULT_ROUNDS = 3  # the suite runs this many times, so a slow spell of the machine only hits one sample
+GROUPS = ('engine', 'main', 'portfolio')
+
+def measure(func):
+    """
+    Best time of `func` over as many runs as fit in MEASURE_BUDGET_SECONDS
+    (1 to MAX_REPEATS). As in timeit, the garbage collector is paused while
+    timing, so a collection of unrelated objects doesn't land in one sample.
+    """
+    gc.collect()
+    gc.disable()
+    try:
+        first = time_call(func, 1)
+        repeats = int(min(MAX_REPEATS, MEASURE_BUDGET_SECONDS / max(first, 1e-9))) - 1
+        return min(first, time_call(func, repeats)) if repeats > 0 else first
+    finally:
+        gc.enable()
+
+# --- Benchmarks ---
+
+def bench_engine(synthetic_sizes=SYNTHETIC_SIZES):
+    """{name: (seconds, bars)} for BacktestEngine.run per strategy class and dataset."""
+    datasets = {filename.split('_')[0]: load_ohlcv(os.path.join(DATA_DIR, filename)) for filename in ticker_files()}
+    # Minute-stamped so any size fits in the Timestamp range, with daily dynamics
+    datasets.update((f'synthetic_{n}', synthetic_ohlcv(n, freq='min', bars_per_year=TRADING_DAYS))
+                    for n in synthetic_sizes)
+    results = {}
+    for dataset, data in datasets.items():
+        for strategy_class in STRATEGY_CLASSES:
+            seconds = measure(lambda: BacktestEngine(data, strategy_class()).run())
+            results[f'engine.{strategy_class.__name__}.{dataset}'] = (seconds, len(data))
+    return results
+
+def bench_main_stages(scratch_dir, data_dir=DATA_DIR):
+    """{name: (seconds, bars)} for the stages of main.main, on every ticker x STRATEGIES run."""
+    filenames = ticker_files(data_dir)
+    load_all = lambda use_cache: {f: load_ohlcv(os.path.join(data_dir, f), START_DATE, END_DATE, use_cache=use_cache)
+                                  for f in filenames}
+    results = {'main.data_load.csv': (measure(lambda: load_all(False)), None),
+               'main.data_load.cached': (measure(lambda: load_all(True)), None)}
+    data = load_all(True)
+    runs = [(f, name, spec) for f in filenames if not data[f].empty for name, spec in STRATEGIES]
+    bars = sum(len(data[f]) for f, _, _ in runs)
+
+    stats = {}
+    def backtests():
+        for f, name, spec in runs:
+            stats[f"{f.split('_')[0]}_{name}"] = run_backtest(spec, data[f], cache=False)
+    results['main.backtests'] = (measure(backtests), bars)
+
+    summaries = {}
+    def metrics():
+        for key, s in stats.items():
+            summaries[key] = generate_summary_from_trades(s['_trades'], s['_equity_curve'])
+    results['main.metrics'] = (measure(metrics), None)
+
+    with TradeStore(os.path.join(scratch_dir, 'trades.db')) as store:
+        def write_trades():
+            store.clear()
+            for key, s in stats.items():
+                store.append(*key.split('_', 1), s['_trades'])
+            store.flush()
+        results['main.trade_store'] = (measure(write_trades), None)
+        ticker = filenames[0].split('_')[0]
+        results['main.trade_query'] = (measure(lambda: store.query(ticker=ticker, exit_reason='Trailing Stop')), None)
+        results['main.trade_log_export'] = (measure(lambda: store.export_text(
+            os.path.join(scratch_dir, 'trade_logs.txt'))), None)
+
+    summary_csv_path = os.path.join(scratch_dir, 'backtest_summary.csv')
+    summary_df = pd.DataFrame.from_dict(summaries, orient='index')
+    summary_df.index.name = 'Strategy'
+    summary_df.to_csv(summary_csv_path)
+    results['main.report'] = (measure(lambda: generate_report(
+        None, summary_csv_path=summary_csv_path, report_path=os.path.join(scratch_dir, 'report.md'),
+        trade_log_path=os.path.join(scratch_dir, 'trade_logs.txt'))), None)
+
+    plots_dir = os.path.join(scratch_dir, 'plots')
+    jobs = [run_ticker_strategy(data_dir, filenames[0], k, plots_dir, 100000, use_cache=False)[3]
+            for k in range(min(PLOT_SAMPLE, len(STRATEGIES)))]
+    for job in jobs:
+        os.makedirs(os.path.dirname(job.path), exist_ok=True)  # main.main creates these per strategy
+    results['main.plotting'] = (measure(lambda: render_plots(jobs, plots_dir, workers=1, force=True)), None)
+    return results
+
+def bench_portfolio_stages(scratch_dir, data_dir=DATA_DIR):
+    """{name: (seconds, bars)} for run_portfolio_analysis and one portfolio plot."""
+    from portfolio_analyzer import run_portfolio_analysis, portfolio_plot_job
+    report_path = os.path.join(scratch_dir, 'portfolio_report.md')
+    results = {'portfolio.analysis': (measure(lambda: run_portfolio_analysis(
+        use_cache=False, plots=False, report_path=report_path, data_dir=data_dir)), None)}
+
+    data = load_ohlcv(os.path.join(data_dir, ticker_files(data_dir)[0]), START_DATE, END_DATE)
+    equity = 100000 * data['Close'] / data['Close'].iloc[0]
+    plots_dir = os.path.join(scratch_dir, 'portfolio_plots')
+    os.makedirs(plots_dir, exist_ok=True)
+    job = portfolio_plot_job(plots_dir, 'Benchmark', {}, portfolio_equity=equity, initial_capital=100000,
+                             pure_buy_and_hold_equity=equity)
+    results['portfolio.plotting'] = (measure(lambda: render_plots([job], plots_dir, workers=1, force=True)), None)
+    return results
+
+def run_benchmarks(groups=GROUPS, quick=False, rounds=DEFAULT_ROUNDS, data_dir=DATA_DIR):
+    """Runs the benchmark groups `rounds` times and returns {name: {'seconds': best, 'bars': ...}}."""
+    timings = {}
+    for _ in range(rounds):
+        # The pipeline functions report progress on stdout; keep the benchmark output readable
+        with tempfile.TemporaryDirectory() as scratch_dir, contextlib.redirect_stdout(io.StringIO()):
+            round_timings = {}
+            if 'engine' in groups:
+                round_timings.update(bench_engine(QUICK_SYNTHETIC_SIZES if quick else SYNTHETIC_SIZES))
+            if 'main' in groups:
+                round_timings.update(bench_main_stages(scratch_dir, data_dir))
+            if 'portfolio' in groups:
+                round_timings.update(bench_portfolio_stages(scratch_dir, data_dir))
+        for name, (seconds, bars) in round_timings.items():
+            timings[name] = (min(seconds, timings.get(name, (np.inf,))[0]), bars)
+    return {name: {'seconds': seconds, 'bars': bars} for name, (seconds, bars) in timings.items()}
+
+# --- Baselines ---
+
+def save_baseline(results, path):
+    baseline = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'results': results,
+    }
+    with open(path, 'w') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+
+def load_baseline(path):
+    with open(path) as f:
+        return json.load(f)['results']
+
+def compare_results(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    DataFrame comparing each benchmark with the baseline. Status is
+    'REGRESSION' when the current time exceeds the baseline by more than
+    `threshold` (a fraction) and NOISE_FLOOR_SECONDS, 'faster' for the mirror
+    case, 'new' when the baseline lacks it, otherwise 'ok'.
+    """
+    rows = []
+    for name, current in results.items():
+        seconds = current['seconds']
+        old = baseline.get(name, {}).get('seconds')
+        if old is None:
+            status, change = 'new', np.nan
+        else:
+            change = (seconds - old) / old * 100 if old > 0 else np.nan
+            if seconds > old * (1 + threshold) and seconds - old > NOISE_FLOOR_SECONDS:
+                status = 'REGRESSION'
+            elif seconds < old / (1 + threshold) and old - seconds > NOISE_FLOOR_SECONDS:
+                status = 'faster'
+            else:
+                status = 'ok'
+        rows.append({'Benchmark': name, 'Baseline [s]': old, 'Current [s]': seconds,
+                     'Change [%]': change, 'Status': status})
+    return pd.DataFrame(rows, columns=['Benchmark', 'Baseline [s]', 'Current [s]', 'Change [%]', 'Status'])
+
+def format_results(results):
+    rows = [{'Benchmark': name, 'Seconds': r['seconds'],
+             'us/bar': r['seconds'] / r['bars'] * 1e6 if r['bars'] else np.nan} for name, r in results.items()]
+    return pd.DataFrame(rows).to_string(index=False, float_format=lambda x: f'{x:.4f}', na_rep='')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the backtest engine and the main.py / portfolio_analyzer.py stages.')
+    parser.add_argument('--groups', nargs='+', choices=GROUPS, default=list(GROUPS),
+                        help='Benchmark groups to run (default: all)')
+    parser.add_argument('--quick', action='store_true', help='Skip the 1M-bar synthetic series')
+    parser.add_argument('--rounds', type=int, default=DEFAULT_ROUNDS,
+                        help=f'Times the whole suite is run; each benchmark keeps its best (default: {DEFAULT_ROUNDS})')
+    parser.add_argument('--data-dir', default=DATA_DIR,
+                        help='Ticker CSVs for the main and portfolio groups (default: stockData; see synthetic_data.py)')
+    parser.add_argument('--save', metavar='PATH', nargs='?', const=BASELINE_PATH,
+                        help=f'Write the results as a JSON baseline (default path: {os.path.basename(BASELINE_PATH)})')
+    parser.add_argument('--compare', metavar='PATH', nargs='?', const=BASELINE_PATH,
+                        help='Compare the results with a JSON baseline and exit with status 1 on regressions')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'Slowdown (fraction) flagged as a regression by --compare (default: {DEFAULT_THRESHOLD})')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.groups, quick=args.quick, rounds=args.rounds, data_dir=args.data_dir)
+    print(format_results(results))
+    regressions = 0
+    if args.compare:
+        comparison = compare_results(results, load_baseline(args.compare), args.threshold)
+        print(f'\nCompared with {args.compare} (threshold {args.threshold:.0%}):')
+        print(comparison.to_string(index=False, float_format=lambda x: f'{x:.4f}', na_rep=''))
+        regressions = int((comparison['Status'] == 'REGRESSION').sum())
+        print(f'\n{regressions} regression(s)')
+    if args.save:
+        save_baseline(results, args.save)
+        print(f'Baseline written to {args.save}')
+    sys.exit(1 if regressions else 0)
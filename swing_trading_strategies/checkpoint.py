@@ -0,0 +1,86 @@
+import hashlib
+import os
+import pickle
+import sys
+
+sys.path.append(os.path.dirname(__file__))
+from result_cache import data_fingerprint, engine_version
+from streaming_engine import StreamingEngine
+
+# Checkpoint/resume for nightly updates. When a day's bar is appended to a
+# stockData CSV, run_incremental() restores the StreamingEngine saved after the
+# previous run of the same ticker and strategy, feeds it only the new rows and
+# saves it again, so the update costs the new bars instead of a re-simulation
+# from START_DATE. A checkpoint is only resumed if the data it processed is
+# still an unchanged prefix of the new data (a revised or re-adjusted history
+# means a full re-run), and it is keyed by the engine source like the result
+# cache.
+
+CHECKPOINT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '.checkpoints'))
+
+class CheckpointStore:
+    """One StreamingEngine snapshot per (name, strategy spec, starting cash) in `checkpoint_dir`."""
+    def __init__(self, checkpoint_dir=CHECKPOINT_DIR):
+        self.checkpoint_dir = checkpoint_dir
+        self.resumed = 0
+        self.rebuilt = 0
+
+    def path(self, name, strategy_spec, initial_cash):
+        parts = [name, strategy_spec.key(), repr(float(initial_cash)), engine_version()]
+        key = hashlib.sha1('|'.join(parts).encode()).hexdigest()
+        return os.path.join(self.checkpoint_dir, f'{key}.ckpt')
+
+    def load(self, path):
+        """(engine, fingerprint of the bars it processed), or None if there is no usable checkpoint."""
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+            return entry['engine'], entry['fingerprint']
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, KeyError, TypeError, ValueError):
+            return None
+
+    def save(self, path, engine, fingerprint):
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(self.checkpoint_dir, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                pickle.dump({'engine': engine, 'fingerprint': fingerprint}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def clear(self):
+        if os.path.isdir(self.checkpoint_dir):
+            for name in os.listdir(self.checkpoint_dir):
+                if name.endswith('.ckpt'):
+                    os.remove(os.path.join(self.checkpoint_dir, name))
+
+def run_incremental(data, strategy_spec, name, initial_cash=100000, store=None):
+    """
+    (trades, equity_curve) of strategy_spec() on `data`, as BacktestEngine.run
+    returns them, resuming from the checkpoint saved under `name` (e.g. the
+    ticker) when `data` extends the bars it has processed. The checkpoint is
+    then updated to cover all of `data`.
+    """
+    store = store or CheckpointStore()
+    path = store.path(name, strategy_spec, initial_cash)
+    frame = data.reset_index() if 'Date' not in data.columns else data
+
+    engine = None
+    checkpoint = store.load(path)
+    if checkpoint is not None:
+        engine, fingerprint = checkpoint
+        done = engine.bar_count
+        if done > len(frame) or data_fingerprint(frame.iloc[:done]) != fingerprint:
+            engine = None
+    if engine is None:
+        engine = StreamingEngine(strategy_spec(), initial_cash)
+        store.rebuilt += 1
+    else:
+        store.resumed += 1
+
+    if engine.bar_count < len(frame):
+        engine.replay(frame.iloc[engine.bar_count:])
+        store.save(path, engine, data_fingerprint(frame))
+    return engine.results()
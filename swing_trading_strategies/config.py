@@ -9,8 +9,18 @@ Percent_Cash_Portfolio = 0.80
 # The annual risk-free return on the cash portion. (e.g., 0.03 = 3%)
 Cash_Yearly_Rtn = 0.03
 
-# Set to True to rebalance the portfolio annually back to the target cash percentage.
+# Set to True to rebalance the portfolio back to the target cash percentage (see Rebalance_Frequency).
 # Set to False to let the cash and invested portions grow independently.
 Rebalance_Portfolio_Yearly = False
+# How often to rebalance when enabled: 'yearly', 'quarterly' or 'monthly'.
+Rebalance_Frequency = 'yearly'
+
+# Set to True to run each strategy as one portfolio with a shared cash pool
+# (PortfolioEngine) instead of independent sleeves with fixed capital per stock.
+Portfolio_Shared_Cash = False
+# Shared-cash limits: largest single position as a fraction of invested equity
+# (None = 1 / number of stocks) and maximum number of positions held at once.
+Max_Position_Perc = None
+Max_Positions = None
 Use_Log_Plots_Portfolio = True
 Use_Log_Plots_Equities = True
\ No newline at end of file
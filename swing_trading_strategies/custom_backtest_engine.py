@@ -1,7 +1,16 @@
+import copy
+import os
+import sys
+import time
+from bisect import bisect_left
 from dataclasses import dataclass
 import pandas as pd
 import numpy as np
 
+sys.path.append(os.path.dirname(__file__))
+from indicators import INDICATORS, Rsi
+from profiling import PROFILER
+
 # --- Data Classes ---
 
 @dataclass
@@ -24,12 +33,224 @@ class Position:
     stop_loss: float
     take_profit: float
 
+@dataclass
+class StrategyState:
+    """
+    Per-run mutable state of the trailing-stop / pyramiding strategies. The
+    engine allocates one per run (and a fresh one after each exit), so the
+    strategy object itself only holds parameters and can be shared.
+    """
+    pyramid_count: int = 0
+    long_stop_price: float = 0.0
+
+@dataclass
+class SignalArrays:
+    """
+    Whole-series description of a strategy whose entries depend only on
+    prices, consumed by VectorizedBacktestEngine. A position is opened at the
+    close of any `entries` bar while flat and closed at the first later bar
+    where the close reaches the stop, the target (entry * take_profit) or an
+    `exits` bar, checked in that order unless tp_first is set.
+
+    The stop is fixed at entry * stop_loss, or, when trailing_stop is set,
+    ratchets up to the highest High * trailing_stop seen since the entry bar.
+    With max_pyramids > 1, an `entries` bar while in a position adds another
+    size_perc of equity once the close is pyramid_profit_perc above the
+    average entry price, up to max_pyramids entries in total. If
+    stop_after_pyramid is set, each add moves a fixed stop to that level.
+    """
+    entries: np.ndarray
+    exits: np.ndarray = None
+    stop_loss: float = None
+    take_profit: float = None
+    size_perc: float = 1.0
+    stop_reason: str = 'Stop Loss'
+    tp_reason: str = 'Take Profit'
+    exit_reason: str = 'Signal'
+    tp_first: bool = False
+    trailing_stop: float = None
+    max_pyramids: int = 1
+    pyramid_profit_perc: float = None
+    stop_after_pyramid: float = None
+
+# --- Indicators ---
+# The rolling indicators come from indicators.py, whose update() and
+# compute() entry points give identical values. INDICATORS maps each kind
+# used in Strategy.indicators() specs to its whole-series compute function.
+# IncrementalRsi is the name the RSI updater had before it moved there.
+
+IncrementalRsi = Rsi
+
+def compute_indicators(data, specs):
+    """
+    Computes every indicator in `specs` ({name: (kind, column, window)}) once
+    over the whole series and returns {name: np.ndarray}. `data` may be a
+    DataFrame or a BarData view.
+    """
+    if isinstance(data, BarData):
+        return {name: data.indicator(*spec) for name, spec in specs.items()}
+    columns = {}
+    result = {}
+    for name, (kind, column, window) in specs.items():
+        if column not in columns:
+            columns[column] = data[column].to_numpy(dtype=np.float64)
+        result[name] = INDICATORS[kind](columns[column], window)
+    return result
+
+# --- Bar Data ---
+
+class BarData:
+    """
+    Array-backed view of an OHLCV DataFrame. Prices are converted once into
+    contiguous float64 arrays (open, high, low, close, volume) and dates into
+    int64 nanoseconds, so per-bar access is plain array indexing.
+
+    `ind` holds the indicator arrays of the strategy the view was prepared for.
+    For strategies written against the DataFrame API, data['Close'] still
+    returns the underlying pandas column.
+    """
+    _parent = None  # (whole-series BarData, row slice) of window() views
+
+    def __init__(self, data):
+        self.source = data
+        frame = data if 'Date' in data.columns else data.reset_index()
+        self.frame = frame
+        self.date_values = frame['Date'].to_numpy()
+        self.dates = self.date_values.astype('datetime64[ns]').view(np.int64)
+        self.open = self._float_column('Open')
+        self.high = self._float_column('High')
+        self.low = self._float_column('Low')
+        self.close = self._float_column('Close')
+        self.volume = self._float_column('Volume')
+        self.ind = {}
+        self._indicator_cache = {}
+
+    def _float_column(self, column):
+        if column not in self.frame.columns:
+            return None
+        return np.ascontiguousarray(self.frame[column].to_numpy(dtype=np.float64))
+
+    def __len__(self):
+        return len(self.close)
+
+    def __getitem__(self, column):
+        return self.frame[column]
+
+    def date(self, i):
+        return pd.Timestamp(self.date_values[i])
+
+    def array(self, column):
+        values = getattr(self, column.lower()) if column in ('Open', 'High', 'Low', 'Close', 'Volume') else None
+        return values if values is not None else self.frame[column].to_numpy(dtype=np.float64)
+
+    def view(self):
+        """
+        Returns a shallow copy sharing the price arrays and indicator cache but
+        with its own `ind`, so several strategies can prepare the same bars.
+        """
+        bars = copy.copy(self)
+        bars.ind = {}
+        return bars
+
+    def window(self, start, stop):
+        """
+        A view of bars [start, stop), e.g. one walk-forward window, sharing
+        this view's arrays. Its indicators are slices of this view's
+        whole-series arrays, so they are computed once for every window over
+        the same bars, and the window's first bars see values warmed up on
+        the bars before it.
+        """
+        bars = copy.copy(self)
+        bars.frame = self.frame.iloc[start:stop].reset_index(drop=True)
+        bars.source = bars.frame
+        for name in ('date_values', 'dates', 'open', 'high', 'low', 'close', 'volume'):
+            values = getattr(self, name)
+            setattr(bars, name, values[start:stop] if values is not None else None)
+        bars.ind = {}
+        bars._indicator_cache = {}
+        bars._parent = (self, slice(start, stop))
+        return bars
+
+    def indicator(self, kind, column, window):
+        """Returns the indicator array, computing it on first request and caching it by spec."""
+        key = (kind, column, window)
+        if key not in self._indicator_cache:
+            if self._parent is not None:
+                parent, rows = self._parent
+                self._indicator_cache[key] = parent.indicator(kind, column, window)[rows]
+            else:
+                self._indicator_cache[key] = INDICATORS[kind](self.array(column), window)
+        return self._indicator_cache[key]
+
 # --- Base Strategy Class ---
 
 class Strategy:
-    def generate_signals(self, data, i, position):
+    # Set to True by strategies that implement signal_arrays()
+    vectorized = False
+
+    def indicators(self):
+        """
+        Override to declare the indicators generate_signals reads.
+        Should return a dictionary {name: (kind, column, window)}, e.g.
+        {'sma': ('sma', 'Close', 20)}, where kind is a key of INDICATORS.
         """
-        User must override this method.
+        return {}
+
+    def prepare(self, data):
+        """
+        Returns a BarData view of `data` with this strategy's indicators
+        computed into `ind`. Called by the engine once before its loop.
+        """
+        bars = data.view() if isinstance(data, BarData) else BarData(data)
+        bars.ind = compute_indicators(bars, self.indicators())
+        return bars
+
+    def bars(self, data):
+        """
+        Returns `data` as a prepared BarData. A DataFrame passed in directly
+        (callers using the original generate_signals(df, i, position) contract)
+        is converted on the first call and reused for later bars.
+        """
+        if isinstance(data, BarData):
+            return data
+        cached = getattr(self, '_compat_bars', None)
+        if cached is None or cached.source is not data:
+            cached = self._compat_bars = self.prepare(data)
+        return cached
+
+    def new_state(self):
+        """
+        Override to return a fresh per-run state object (e.g. StrategyState)
+        for strategies that track state between bars. The engine calls it at
+        the start of a run and after every exit and passes the result to
+        generate_signals as `state`. Stateless strategies return None.
+        """
+        return None
+
+    def run_state(self, state):
+        """
+        Returns `state`, or for callers that drive generate_signals directly
+        without one, a state object kept on the instance.
+        """
+        if state is not None:
+            return state
+        fallback = getattr(self, '_state', None)
+        if fallback is None:
+            fallback = self._state = self.new_state()
+        return fallback
+
+    def signal_arrays(self, bars):
+        """
+        Optional. Strategies whose decisions depend only on prices may return a
+        SignalArrays for the prepared `bars` so VectorizedBacktestEngine can
+        run them without a per-bar loop. Set `vectorized = True` when overriding.
+        """
+        raise NotImplementedError
+
+    def generate_signals(self, data, i, position, state=None):
+        """
+        User must override this method. `state` is the per-run object from
+        new_state(); the engine only passes it to strategies that have one.
         Should return a tuple containing:
         (signal, sl_tp_info, trade_size_percentage)
         signal: 'buy', 'sell', 'hold', 'pyramid'
@@ -40,21 +261,37 @@ class Strategy:
 # --- Strategy Implementations ---
 
 class MovingAverageCrossoverStrategy(Strategy):
+    vectorized = True
+
     def __init__(self, n1=10, n2=20, sl=0.95, tp=1.10):
         self.n1 = n1
         self.n2 = n2
         self.sl = sl
         self.tp = tp
 
-    def generate_signals(self, data, i, position):
+    def indicators(self):
+        return {'sma1': ('sma', 'Close', self.n1), 'sma2': ('sma', 'Close', self.n2)}
+
+    def signal_arrays(self, bars):
+        sma1, sma2 = bars.ind['sma1'], bars.ind['sma2']
+        entries = np.zeros(bars.close.shape, dtype=bool)
+        if len(bars) > self.n2:
+            i = slice(self.n2, None)
+            prev = slice(self.n2 - 1, -1)
+            entries[i] = (sma1[prev] < sma2[prev]) & (sma1[i] > sma2[i])
+        return SignalArrays(entries=entries, stop_loss=self.sl, take_profit=self.tp)
+
+    def generate_signals(self, data, i, position, state=None):
         if i < self.n2:
             return 'hold', None, None
         
-        price = data['Close'].iloc[i]
-        sma1 = data['Close'].iloc[i-self.n1+1:i+1].mean()
-        sma2 = data['Close'].iloc[i-self.n2+1:i+1].mean()
-        prev_sma1 = data['Close'].iloc[i-self.n1:i].mean()
-        prev_sma2 = data['Close'].iloc[i-self.n2:i].mean()
+        data = self.bars(data)
+        ind = data.ind
+        price = data.close[i]
+        sma1 = ind['sma1'][i]
+        sma2 = ind['sma2'][i]
+        prev_sma1 = ind['sma1'][i-1]
+        prev_sma2 = ind['sma2'][i-1]
         
         if not position:
             if prev_sma1 < prev_sma2 and sma1 > sma2:
@@ -70,25 +307,25 @@ class MovingAverageCrossoverStrategy(Strategy):
         return 'hold', None, None
 
 class RsiMomentumStrategy(Strategy):
-    def __init__(self, rsi_period=14, rsi_upper=70, rsi_lower=30, sl=0.95, tp=1.10):
+    def __init__(self, rsi_period=14, rsi_upper=70, rsi_lower=30, sl=0.95, tp=1.10, rsi_method='simple'):
         self.rsi_period = rsi_period
         self.rsi_upper = rsi_upper
         self.rsi_lower = rsi_lower
         self.sl = sl
         self.tp = tp
+        self.rsi_method = rsi_method # 'simple' (rolling means) or 'wilder'
 
-    def generate_signals(self, data, i, position):
+    def indicators(self):
+        kind = 'rsi_wilder' if self.rsi_method == 'wilder' else 'rsi'
+        return {'rsi': (kind, 'Close', self.rsi_period)}
+
+    def generate_signals(self, data, i, position, state=None):
         if i < self.rsi_period:
             return 'hold', None, None
         
-        close_prices = data['Close'].iloc[:i+1]
-        delta = pd.Series(close_prices).diff()
-        gain = delta.clip(lower=0).rolling(self.rsi_period, min_periods=self.rsi_period).mean()
-        loss = -delta.clip(upper=0).rolling(self.rsi_period, min_periods=self.rsi_period).mean()
-        rs = gain / loss
-        rsi = (100 - (100 / (1 + rs))).iloc[-1]
-        
-        price = data['Close'].iloc[i]
+        data = self.bars(data)
+        rsi = data.ind['rsi'][i]
+        price = data.close[i]
         
         if not position:
             if rsi < self.rsi_lower:
@@ -106,17 +343,30 @@ class RsiMomentumStrategy(Strategy):
         return 'hold', None, None
 
 class BreakoutStrategy(Strategy):
+    vectorized = True
+
     def __init__(self, breakout_period=20, sl=0.95, tp=1.10):
         self.breakout_period = breakout_period
         self.sl = sl
         self.tp = tp
 
-    def generate_signals(self, data, i, position):
+    def indicators(self):
+        return {'highest_high': ('max', 'High', self.breakout_period)}
+
+    def signal_arrays(self, bars):
+        entries = np.zeros(bars.close.shape, dtype=bool)
+        if len(bars) > self.breakout_period:
+            prev_high = bars.ind['highest_high'][self.breakout_period - 1:-1]
+            entries[self.breakout_period:] = bars.close[self.breakout_period:] > prev_high
+        return SignalArrays(entries=entries, stop_loss=self.sl, take_profit=self.tp)
+
+    def generate_signals(self, data, i, position, state=None):
         if i < self.breakout_period:
             return 'hold', None, None
             
-        price = data['Close'].iloc[i]
-        prev_high = data['High'].iloc[i-self.breakout_period:i].max()
+        data = self.bars(data)
+        price = data.close[i]
+        prev_high = data.ind['highest_high'][i-1]
         
         if not position:
             if price > prev_high:
@@ -133,10 +383,29 @@ class BreakoutStrategy(Strategy):
 
 # In custom_backtest_engine.py
 
-def STD(series, n):
-    return pd.Series(series).rolling(n).std()
+def _pyramiding_signal_arrays(strategy, entries):
+    """
+    SignalArrays for the trailing-stop / pyramiding strategies below. A
+    pyramid add hands the position the run state's long_stop_price, which is
+    never set in fixed-stop mode, so there the fixed stop drops to 0.0.
+    """
+    trailing = strategy.use_trailing_stop
+    return SignalArrays(
+        entries=entries,
+        stop_loss=None if trailing else 1 - strategy.fixed_stop_perc,
+        take_profit=strategy.tp_long_perc,
+        size_perc=strategy.entry_size_perc,
+        stop_reason='Trailing Stop' if trailing else 'Fixed Stop',
+        tp_first=True,
+        trailing_stop=1 - strategy.trailing_stop_perc if trailing else None,
+        max_pyramids=strategy.max_pyramids,
+        pyramid_profit_perc=strategy.pyramid_profit_perc,
+        stop_after_pyramid=None if trailing else 0.0,
+    )
 
 class TwoStdDevStrategy(Strategy):
+    vectorized = True
+
     def __init__(self, 
                  # --- Behavior Switches ---
                  buy_condition_option='Lower Band - Cross Above',
@@ -163,20 +432,38 @@ class TwoStdDevStrategy(Strategy):
         self.pyramid_profit_perc = pyramid_profit_perc # <-- Store new parameter
         self.entry_size_perc = entry_size_perc
         self.tp_long_perc = tp_long_perc
-        
-        # --- State Variables ---
-        self.pyramid_count = 0
-        self.long_stop_price = 0.0
 
-    def generate_signals(self, data, i, position):
+    def new_state(self):
+        return StrategyState()
+
+    def indicators(self):
+        return {'sma': ('sma', 'Close', self.length), 'std': ('std', 'Close', self.length)}
+
+    def signal_arrays(self, bars):
+        entries = np.zeros(bars.close.shape, dtype=bool)
+        if len(bars) > self.length:
+            i = slice(self.length, None)
+            sma, std = bars.ind['sma'][i], bars.ind['std'][i]
+            band = {
+                'Lower Band - Cross Above': sma - self.stdev_factor * std,
+                'SMA - Cross Above': sma,
+                'Upper Band - Cross Above': sma + self.stdev_factor * std,
+            }.get(self.buy_condition_option)
+            if band is not None:
+                entries[i] = (bars.close[i] > band) & (bars.close[self.length - 1:-1] < band)
+        return _pyramiding_signal_arrays(self, entries)
+
+    def generate_signals(self, data, i, position, state=None):
         if i < self.length:
             return 'hold', None, None
 
-        price = data['Close'].iloc[i]
+        data = self.bars(data)
+        state = self.run_state(state)
+        price = data.close[i]
         
         # --- INDICATORS ---
-        sma = data['Close'].iloc[i-self.length+1:i+1].mean()
-        std = data['Close'].iloc[i-self.length+1:i+1].std()
+        sma = data.ind['sma'][i]
+        std = data.ind['std'][i]
         upper_band = sma + self.stdev_factor * std
         lower_band = sma - self.stdev_factor * std
 
@@ -186,9 +473,9 @@ class TwoStdDevStrategy(Strategy):
                 return 'sell', 'Take Profit', None
 
             if self.use_trailing_stop:
-                new_stop_candidate = data['High'].iloc[i] * (1 - self.trailing_stop_perc)
-                self.long_stop_price = max(self.long_stop_price, new_stop_candidate)
-                if price <= self.long_stop_price:
+                new_stop_candidate = data.high[i] * (1 - self.trailing_stop_perc)
+                state.long_stop_price = max(state.long_stop_price, new_stop_candidate)
+                if price <= state.long_stop_price:
                     return 'sell', 'Trailing Stop', None
             else:
                 if price <= position.stop_loss:
@@ -196,36 +483,39 @@ class TwoStdDevStrategy(Strategy):
 
         # --- ENTRY LOGIC ---
         buy_signal = False
-        if self.buy_condition_option == 'Lower Band - Cross Above' and price > lower_band and data['Close'].iloc[i-1] < lower_band:
+        prev_price = data.close[i-1]
+        if self.buy_condition_option == 'Lower Band - Cross Above' and price > lower_band and prev_price < lower_band:
             buy_signal = True
-        elif self.buy_condition_option == 'SMA - Cross Above' and price > sma and data['Close'].iloc[i-1] < sma:
+        elif self.buy_condition_option == 'SMA - Cross Above' and price > sma and prev_price < sma:
             buy_signal = True
-        elif self.buy_condition_option == 'Upper Band - Cross Above' and price > upper_band and data['Close'].iloc[i-1] < upper_band:
+        elif self.buy_condition_option == 'Upper Band - Cross Above' and price > upper_band and prev_price < upper_band:
             buy_signal = True
 
         if buy_signal:
             if not position:
-                self.pyramid_count = 1
+                state.pyramid_count = 1
                 sl_tp_dict = {'tp': price * self.tp_long_perc}
                 if self.use_trailing_stop:
-                    self.long_stop_price = data['High'].iloc[i] * (1 - self.trailing_stop_perc)
-                    sl_tp_dict['sl'] = self.long_stop_price
+                    state.long_stop_price = data.high[i] * (1 - self.trailing_stop_perc)
+                    sl_tp_dict['sl'] = state.long_stop_price
                 else:
                     sl_tp_dict['sl'] = price * (1 - self.fixed_stop_perc)
                 return 'buy', sl_tp_dict, self.entry_size_perc
 
-            elif position and self.pyramid_count < self.max_pyramids:
+            elif position and state.pyramid_count < self.max_pyramids:
                 profit_perc = (price - position.entry_price) / position.entry_price
                 if profit_perc >= self.pyramid_profit_perc:
-                    self.pyramid_count += 1
-                    return 'pyramid', {'sl': self.long_stop_price}, self.entry_size_perc
+                    state.pyramid_count += 1
+                    return 'pyramid', {'sl': state.long_stop_price}, self.entry_size_perc
 
         if position and self.use_trailing_stop:
-            return 'hold', {'sl': self.long_stop_price}, None
+            return 'hold', {'sl': state.long_stop_price}, None
         
         return 'hold', None, None
 
 class BreakoutVer2Strategy(Strategy):
+    vectorized = True
+
     def __init__(self, 
                  # --- Behavior Switches ---
                  use_trailing_stop=True,
@@ -248,18 +538,29 @@ class BreakoutVer2Strategy(Strategy):
         self.pyramid_profit_perc = pyramid_profit_perc
         self.entry_size_perc = entry_size_perc
         self.tp_long_perc = tp_long_perc # << NEW: Store the TP parameter
-        
-        # --- State Variables ---
-        self.pyramid_count = 0
-        self.long_stop_price = 0.0
 
-    def generate_signals(self, data, i, position):
+    def new_state(self):
+        return StrategyState()
+
+    def indicators(self):
+        return {'highest_high': ('max', 'High', self.breakout_period)}
+
+    def signal_arrays(self, bars):
+        entries = np.zeros(bars.close.shape, dtype=bool)
+        if len(bars) > self.breakout_period:
+            prev_high = bars.ind['highest_high'][self.breakout_period - 1:-1]
+            entries[self.breakout_period:] = bars.close[self.breakout_period:] > prev_high
+        return _pyramiding_signal_arrays(self, entries)
+
+    def generate_signals(self, data, i, position, state=None):
         if i < self.breakout_period:
             return 'hold', None, None
 
-        price = data['Close'].iloc[i]
-        high = data['High'].iloc[i]
-        highest_high = data['High'].iloc[i-self.breakout_period:i].max()
+        data = self.bars(data)
+        state = self.run_state(state)
+        price = data.close[i]
+        high = data.high[i]
+        highest_high = data.ind['highest_high'][i-1]
 
         # --- EXIT LOGIC ---
         if position:
@@ -271,8 +572,8 @@ class BreakoutVer2Strategy(Strategy):
             # 2. Stop Loss Check (conditional based on strategy mode)
             if self.use_trailing_stop:
                 new_stop_candidate = high * (1 - self.trailing_stop_perc)
-                self.long_stop_price = max(self.long_stop_price, new_stop_candidate)
-                if price <= self.long_stop_price:
+                state.long_stop_price = max(state.long_stop_price, new_stop_candidate)
+                if price <= state.long_stop_price:
                     return 'sell', 'Trailing Stop', None
             else: # Using fixed stop
                 if price <= position.stop_loss:
@@ -282,7 +583,7 @@ class BreakoutVer2Strategy(Strategy):
         is_breakout = price > highest_high
         if is_breakout:
             if not position:
-                self.pyramid_count = 1
+                state.pyramid_count = 1
                 
                 # << NEW: Add TP to the return dictionary >>
                 sl_tp_dict = {}
@@ -291,51 +592,152 @@ class BreakoutVer2Strategy(Strategy):
                 sl_tp_dict['tp'] = take_profit_price
 
                 if self.use_trailing_stop:
-                    self.long_stop_price = high * (1 - self.trailing_stop_perc)
-                    sl_tp_dict['sl'] = self.long_stop_price
+                    state.long_stop_price = high * (1 - self.trailing_stop_perc)
+                    sl_tp_dict['sl'] = state.long_stop_price
                 else:
                     fixed_stop_price = price * (1 - self.fixed_stop_perc)
                     sl_tp_dict['sl'] = fixed_stop_price
 
                 return 'buy', sl_tp_dict, self.entry_size_perc
 
-            elif position and self.pyramid_count < self.max_pyramids:
+            elif position and state.pyramid_count < self.max_pyramids:
                 # (Pyramiding logic remains unchanged)
                 profit_perc = (price - position.entry_price) / position.entry_price
                 if profit_perc >= self.pyramid_profit_perc:
-                    self.pyramid_count += 1
-                    return 'pyramid', {'sl': self.long_stop_price}, self.entry_size_perc
+                    state.pyramid_count += 1
+                    return 'pyramid', {'sl': state.long_stop_price}, self.entry_size_perc
 
         if position and self.use_trailing_stop:
-            return 'hold', {'sl': self.long_stop_price}, None
+            return 'hold', {'sl': state.long_stop_price}, None
         
         return 'hold', None, None
     
+# --- Trade Storage ---
+
+def trade_frame(entry_bars, exit_bars, entry_prices, exit_prices, sizes, reasons, date_values):
+    """The trades DataFrame the engines return, from per-trade arrays (bar indices into date_values)."""
+    if len(entry_bars) == 0:
+        return pd.DataFrame([])
+    pnl = (exit_prices - entry_prices) * sizes
+    entry_dates, exit_dates = date_values[entry_bars], date_values[exit_bars]
+    return pd.DataFrame({
+        'entry_date': entry_dates,
+        'entry_price': entry_prices,
+        'exit_date': exit_dates,
+        'exit_price': exit_prices,
+        'size': sizes,
+        'pnl': pnl,
+        'return_pct': pnl / (entry_prices * sizes) * 100,
+        'duration': (exit_dates - entry_dates) // np.timedelta64(1, 'D'),
+        'exit_reason': reasons,
+    })
+
+TRADE_DTYPE = np.dtype([('entry_bar', np.int64), ('exit_bar', np.int64), ('entry_price', np.float64),
+                        ('exit_price', np.float64), ('size', np.float64), ('reason', np.int32)])
+
+class TradeLog:
+    """
+    Closed trades as rows of a TRADE_DTYPE record array that doubles when
+    full, with each distinct exit reason stored once. P&L, returns, dates
+    and durations are derived from the records only when frame() is called.
+    """
+    __slots__ = ('records', 'count', 'reasons', '_reason_codes')
+
+    def __init__(self, capacity=16):
+        self.records = np.empty(capacity, dtype=TRADE_DTYPE)
+        self.count = 0
+        self.reasons = []
+        self._reason_codes = {}
+
+    def __len__(self):
+        return self.count
+
+    def append(self, entry_bar, exit_bar, entry_price, exit_price, size, reason):
+        if self.count == len(self.records):
+            grown = np.empty(max(2 * self.count, 16), dtype=TRADE_DTYPE)
+            grown[:self.count] = self.records
+            self.records = grown
+        code = self._reason_codes.get(reason)
+        if code is None:
+            code = self._reason_codes[reason] = len(self.reasons)
+            self.reasons.append(reason)
+        self.records[self.count] = (entry_bar, exit_bar, entry_price, exit_price, size, code)
+        self.count += 1
+
+    def frame(self, date_values):
+        records = self.records[:self.count]
+        return trade_frame(records['entry_bar'], records['exit_bar'], records['entry_price'], records['exit_price'],
+                           records['size'], [self.reasons[c] for c in records['reason'].tolist()], date_values)
+
+class BacktestResult:
+    """
+    Outcome of BacktestEngine.simulate(): `equity` (float64, one value per bar
+    plus the final cash) and the `trade_log`. frames() builds the
+    (trades DataFrame, equity Series) pair that run() returns.
+    """
+    __slots__ = ('equity', 'trade_log', 'date_values')
+
+    def __init__(self, equity, trade_log, date_values):
+        self.equity = equity
+        self.trade_log = trade_log
+        self.date_values = date_values
+
+    def trades(self):
+        return self.trade_log.frame(self.date_values)
+
+    def equity_curve(self):
+        return pd.Series(self.equity)
+
+    def frames(self):
+        return self.trades(), self.equity_curve()
+
 # --- BacktestEngine ---
 class BacktestEngine:
     def __init__(self, data, strategy, initial_cash=100000):
-        self.data = data.reset_index()
+        # A prepared BarData can be shared by several runs (and their indicator cache)
+        self.data = data if isinstance(data, BarData) else data.reset_index()
         self.strategy = strategy
         self.initial_cash = initial_cash
-        self.equity_curve = []
-        self.trades = []
+        self.equity_curve = None
+        self.trades = None
 
     def run(self):
+        """(trades DataFrame, equity Series) of the strategy on the data."""
+        return self.simulate().frames()
+
+    def simulate(self):
+        """
+        Runs the backtest and returns a BacktestResult: the equity curve goes
+        into a preallocated array and closed trades into a TradeLog, so no
+        per-bar objects are created and no DataFrame is built unless asked for.
+        """
+        # With PROFILER enabled, generate_signals is timed per call and the
+        # rest of the loop counts as fill time; disabled, nothing is added
+        profiling = PROFILER.enabled
+        if profiling:
+            start = time.perf_counter()
         cash = self.initial_cash
         position = None
 
-        if hasattr(self.strategy, 'pyramid_count'):
-            self.strategy.pyramid_count = 0
-        if hasattr(self.strategy, 'long_stop_price'):
-            self.strategy.long_stop_price = 0.0
+        # Per-run strategy state lives here, not on the (shareable) strategy
+        state = self.strategy.new_state()
+        state_args = () if state is None else (state,)
+        bars = self.strategy.prepare(self.data)
+        closes = bars.close
+        n = len(bars)
+        self.equity_curve = equity = np.empty(n + 1)
+        self.trades = trade_log = TradeLog()
+        generate_signals = self.strategy.generate_signals
+        if profiling:
+            prepared = time.perf_counter()
+            generate_signals = PROFILER.timed(generate_signals)
 
-        for i in range(len(self.data)):
-            date = self.data['Date'].iloc[i]
-            price = self.data['Close'].iloc[i]
+        for i in range(n):
+            price = closes[i]
             current_equity = cash + (position.size * price) if position else cash
-            self.equity_curve.append(current_equity)
+            equity[i] = current_equity
 
-            signal, sl_tp_info, size_perc = self.strategy.generate_signals(self.data, i, position)
+            signal, sl_tp_info, size_perc = generate_signals(bars, i, position, *state_args)
             
             if position and isinstance(sl_tp_info, dict):
                 if 'sl' in sl_tp_info:
@@ -347,10 +749,11 @@ class BacktestEngine:
                 trade_value = current_equity * (size_perc or 1.0)
                 shares = trade_value / price
                 position = Position(
-                    entry_date=date, entry_price=price, size=shares,
+                    entry_date=bars.date(i), entry_price=price, size=shares,
                     stop_loss=sl_tp_info.get('sl'), 
                     take_profit=sl_tp_info.get('tp')
                 )
+                entry_bar = i
                 cash -= shares * price
 
             elif position and signal == 'pyramid':
@@ -364,48 +767,249 @@ class BacktestEngine:
                 cash -= new_shares * price
 
             elif position and signal == 'sell':
-                exit_price = price
-                pnl = (exit_price - position.entry_price) * position.size
-                cash += position.size * exit_price
-                
-                return_pct = pnl / (position.entry_price * position.size) * 100
-                duration = (date - position.entry_date).days
-                
-                self.trades.append(Trade(
-                    entry_date=position.entry_date, entry_price=position.entry_price,
-                    exit_date=date, exit_price=exit_price, size=position.size,
-                    pnl=pnl, return_pct=return_pct, duration=duration,
-                    exit_reason=sl_tp_info
-                ))
+                cash += position.size * price
+                trade_log.append(entry_bar, i, position.entry_price, price, position.size, sl_tp_info)
                 position = None
-                if hasattr(self.strategy, 'pyramid_count'): self.strategy.pyramid_count = 0
-                if hasattr(self.strategy, 'long_stop_price'): self.strategy.long_stop_price = 0.0
+                if state is not None:
+                    state = self.strategy.new_state()
+                    state_args = (state,)
 
         if position:
-            price = self.data['Close'].iloc[-1]
-            date = self.data['Date'].iloc[-1]
-            pnl = (price - position.entry_price) * position.size
+            price = closes[-1]
             cash += position.size * price
-            self.trades.append(Trade(
-                entry_date=position.entry_date, entry_price=position.entry_price,
-                exit_date=date, exit_price=price, size=position.size, pnl=pnl,
-                return_pct=pnl / (position.entry_price * position.size) * 100,
-                duration=(date - position.entry_date).days, exit_reason='forced_close'
-            ))
-        
-        self.equity_curve.append(cash)
-        return pd.DataFrame([t.__dict__ for t in self.trades]), pd.Series(self.equity_curve)
+            trade_log.append(entry_bar, n - 1, position.entry_price, price, position.size, 'forced_close')
+
+        equity[n] = cash
+        result = BacktestResult(equity, trade_log, bars.date_values)
+        if profiling:
+            PROFILER.add('BacktestEngine.signals', generate_signals.seconds, generate_signals.calls)
+            PROFILER.record_run('BacktestEngine', n, len(trade_log), prepare=prepared - start,
+                                fills=time.perf_counter() - prepared - generate_signals.seconds)
+        return result
+
+# --- Vectorized Engine ---
+
+_EXIT_BATCH = 64           # entry candidates resolved together
+_EXIT_WINDOW_MAX = 4096    # widest look-ahead block per candidate
+
+EXIT_FORCED, EXIT_STOP, EXIT_TARGET, EXIT_SIGNAL = 0, 1, 2, 3
+
+def resolve_exits(closes, entries, stops, targets, exits=None, tp_first=False, highs=None, trail=None):
+    """
+    For each entry bar in `entries`, finds the first later bar whose close
+    reaches that entry's stop (close <= stop), target (close >= target) or an
+    `exits` bar. NaN disables a stop or target. When `trail` is given the
+    stops are trailing: each starts at the given level and ratchets to the
+    running maximum of highs * trail (a segmented cumulative max per entry).
+    Returns (exit_bars, exit_codes), with bar -1 and EXIT_FORCED when the
+    series ends first. All entries are searched together in look-ahead
+    blocks that double in width, so the cost is proportional to the bars
+    actually scanned.
+    """
+    n = len(closes)
+    exit_bars = np.full(len(entries), -1, dtype=np.int64)
+    exit_codes = np.full(len(entries), EXIT_FORCED, dtype=np.int8)
+    first_code, second_code = (EXIT_TARGET, EXIT_STOP) if tp_first else (EXIT_STOP, EXIT_TARGET)
+    pending = np.arange(len(entries))
+    levels = np.asarray(stops, dtype=np.float64)
+    offset, width = 1, 16
+    while len(pending):
+        bars = entries[pending, None] + np.arange(offset, offset + width)
+        in_range = bars < n
+        bars = np.minimum(bars, n - 1)
+        window = closes[bars]
+        if trail is not None:
+            stop_levels = np.maximum(np.maximum.accumulate(highs[bars] * trail, axis=1), levels[:, None])
+            levels = stop_levels[:, -1]
+        else:
+            stop_levels = levels[:, None]
+        stop_hit = (window <= stop_levels) & in_range
+        tp_hit = (window >= targets[pending, None]) & in_range
+        hit = stop_hit | tp_hit
+        if exits is not None:
+            hit |= exits[bars] & in_range
+        found = hit.any(axis=1)
+        rows = np.flatnonzero(found)
+        cols = hit[rows].argmax(axis=1)
+        first, second = (tp_hit, stop_hit) if tp_first else (stop_hit, tp_hit)
+        exit_bars[pending[rows]] = bars[rows, cols]
+        exit_codes[pending[rows]] = np.where(first[rows, cols], first_code,
+                                             np.where(second[rows, cols], second_code, EXIT_SIGNAL))
+        keep = ~found & in_range[:, -1]
+        pending, levels = pending[keep], levels[keep]
+        offset += width
+        width = min(width * 2, _EXIT_WINDOW_MAX)
+    return exit_bars, exit_codes
+
+class VectorizedBacktestEngine:
+    """
+    Runs strategies described by SignalArrays without a per-bar Python loop:
+    entries come from a boolean array, exits (including trailing stops) are
+    resolved with array searches (resolve_exits) and pyramid adds with a
+    first-touch search over the bars of each trade. Only the chaining of
+    trades and the cash bookkeeping step per trade or add. Returns the same
+    (trades DataFrame, equity Series) as BacktestEngine.run. Pass `signals`
+    to backtest precomputed arrays directly, otherwise the strategy's
+    signal_arrays() is used.
+    """
+    def __init__(self, data, strategy=None, initial_cash=100000, signals=None):
+        if strategy is None and signals is None:
+            raise ValueError("VectorizedBacktestEngine needs a strategy or signal arrays")
+        # A prepared BarData can be shared by several runs (and their indicator cache)
+        self.data = data if isinstance(data, BarData) else data.reset_index()
+        self.strategy = strategy
+        self.signals = signals
+        self.initial_cash = initial_cash
+
+    def _initial_stops(self, sig, bars, entry_bars):
+        if sig.trailing_stop is not None:
+            return bars.high[entry_bars] * sig.trailing_stop
+        if sig.stop_loss is not None:
+            return bars.close[entry_bars] * sig.stop_loss
+        return np.full(len(entry_bars), np.nan)
+
+    def _targets(self, sig, entry_prices):
+        if sig.take_profit:
+            return entry_prices * sig.take_profit
+        return np.full(len(entry_prices), np.nan)
+
+    def run(self):
+        if not PROFILER.enabled:
+            return self._run()
+        # Profiled: prepare and signal_arrays are timed, the rest counts as fill time
+        phases = {}
+        start = time.perf_counter()
+        trades, equity = self._run(phases)
+        phases['fills'] = time.perf_counter() - start - phases['prepare'] - phases['signals']
+        PROFILER.record_run('VectorizedBacktestEngine', len(equity) - 1, len(trades), **phases)
+        return trades, equity
+
+    def _run(self, phases=None):
+        if phases is not None:
+            start = time.perf_counter()
+        if self.strategy is not None:
+            bars = self.strategy.prepare(self.data)
+        else:
+            bars = self.data if isinstance(self.data, BarData) else BarData(self.data)
+        if phases is not None:
+            phases['prepare'] = time.perf_counter() - start
+            start = time.perf_counter()
+        sig = self.signals if self.signals is not None else self.strategy.signal_arrays(bars)
+        if phases is not None:
+            phases['signals'] = time.perf_counter() - start
+        closes = bars.close
+        close_list = closes.tolist()
+        n = len(closes)
+        exits = np.asarray(sig.exits, dtype=bool) if sig.exits is not None else None
+        trail = sig.trailing_stop
+        size_perc = sig.size_perc or 1.0
+        can_pyramid = sig.max_pyramids > 1 and sig.pyramid_profit_perc is not None
+        reset_stop = can_pyramid and trail is None and sig.stop_after_pyramid is not None
+
+        candidates = np.flatnonzero(sig.entries)
+        candidate_list = candidates.tolist()
+        exit_bars = np.zeros(len(candidates), dtype=np.int64)
+        exit_codes = np.zeros(len(candidates), dtype=np.int8)
+        resolved_exits = [None] * len(candidates)
+
+        # Per trade: entry bar, exit bar, exit code, average price, size, cash after exit.
+        trade_entries, trade_exits, trade_codes, avg_prices, sizes, cash_after = [], [], [], [], [], []
+        # Holding segments with constant (cash, shares): first bar, last bar, cash, shares.
+        seg_starts, seg_ends, seg_cash, seg_shares = [], [], [], []
+
+        cash = self.initial_cash
+        k = 0
+        while k < len(candidates):
+            if resolved_exits[k] is None:
+                batch = slice(k, k + _EXIT_BATCH)
+                batch_bars = candidates[batch]
+                exit_bars[batch], exit_codes[batch] = resolve_exits(
+                    closes, batch_bars, self._initial_stops(sig, bars, batch_bars),
+                    self._targets(sig, closes[batch_bars]), exits, sig.tp_first, bars.high, trail)
+                resolved_exits[batch] = exit_bars[batch].tolist()
+            e = candidate_list[k]
+            j, code = resolved_exits[k], int(exit_codes[k])
+
+            price = close_list[e]
+            shares = cash * size_perc / price
+            cash -= shares * price
+            avg_price = price
+            seg_start = e + 1
+
+            if can_pyramid:
+                count = 1
+                search_from = e + 1
+                while count < sig.max_pyramids:
+                    end = j if j >= 0 else n
+                    lo, hi = bisect_left(candidate_list, search_from), bisect_left(candidate_list, end)
+                    if lo == hi:
+                        break
+                    adds = candidates[lo:hi]
+                    profitable = np.flatnonzero((closes[adds] - avg_price) / avg_price >= sig.pyramid_profit_perc)
+                    if not len(profitable):
+                        break
+                    p = int(adds[profitable[0]])
+                    add_price = close_list[p]
+                    seg_starts.append(seg_start); seg_ends.append(p); seg_cash.append(cash); seg_shares.append(shares)
+                    new_shares = (cash + shares * add_price) * size_perc / add_price
+                    new_total = shares + new_shares
+                    avg_price = ((avg_price * shares) + (add_price * new_shares)) / new_total
+                    shares = new_total
+                    cash -= new_shares * add_price
+                    count += 1
+                    seg_start = search_from = p + 1
+                    if reset_stop:
+                        new_exit, new_code = resolve_exits(
+                            closes, np.array([p]), np.array([sig.stop_after_pyramid], dtype=np.float64),
+                            self._targets(sig, np.array([price])), exits, sig.tp_first)
+                        j, code = int(new_exit[0]), int(new_code[0])
+
+            x = j if j >= 0 else n - 1
+            seg_starts.append(seg_start); seg_ends.append(x); seg_cash.append(cash); seg_shares.append(shares)
+            cash += shares * close_list[x]
+            trade_entries.append(e); trade_exits.append(x); trade_codes.append(code)
+            avg_prices.append(avg_price); sizes.append(shares); cash_after.append(cash)
+            if j < 0:
+                break
+            k = bisect_left(candidate_list, j + 1)
+
+        # --- Equity curve ---
+        # Holding-segment bars are marked to market; every other bar
+        # (including entry bars and the final value) holds the cash left by
+        # the previous trade.
+        close_bars = np.array(trade_exits, dtype=np.int64)
+        equity = np.empty(n + 1)
+        flat_cash = np.array([self.initial_cash] + cash_after)
+        equity[:] = flat_cash[np.searchsorted(close_bars, np.arange(n + 1), side='left')]
+        seg_starts = np.array(seg_starts, dtype=np.int64)
+        seg_lengths = np.array(seg_ends, dtype=np.int64) - seg_starts + 1
+        held_seg = np.repeat(np.arange(len(seg_lengths)), seg_lengths)
+        held_bars = np.arange(len(held_seg)) - np.repeat(np.cumsum(seg_lengths) - seg_lengths, seg_lengths) + seg_starts[held_seg]
+        equity[held_bars] = np.array(seg_cash)[held_seg] + np.array(seg_shares)[held_seg] * closes[held_bars]
+
+        if not trade_entries:
+            return pd.DataFrame([]), pd.Series(equity)
+
+        reason_names = {EXIT_FORCED: 'forced_close', EXIT_STOP: sig.stop_reason, EXIT_TARGET: sig.tp_reason, EXIT_SIGNAL: sig.exit_reason}
+        trades = trade_frame(np.array(trade_entries, dtype=np.int64), close_bars, np.array(avg_prices),
+                             closes[close_bars], np.array(sizes), [reason_names[c] for c in trade_codes],
+                             bars.date_values)
+        return trades, pd.Series(equity)
+
+def create_engine(data, strategy, initial_cash=100000):
+    """Returns a VectorizedBacktestEngine when the strategy supports it, otherwise a BacktestEngine."""
+    if strategy.vectorized:
+        return VectorizedBacktestEngine(data, strategy, initial_cash=initial_cash)
+    return BacktestEngine(data, strategy, initial_cash=initial_cash)
 
 # --- Test Harness ---
 if __name__ == '__main__':
+    from data_loader import load_ohlcv
     try:
-        df = pd.read_csv('stockData/AAPL_1d.csv', index_col='Date', parse_dates=True)
+        df = load_ohlcv('stockData/AAPL_1d.csv', pd.Timestamp('2020-01-01'), pd.Timestamp('2023-12-31'))
     except FileNotFoundError:
         print("Error: 'stockData/AAPL_1d.csv' not found.")
         exit()
-
-    df.index = pd.to_datetime(df.index, utc=True).tz_localize(None)
-    df = df[(df.index >= pd.Timestamp('2020-01-01')) & (df.index <= pd.Timestamp('2023-12-31'))]
     
     print("--- Testing BreakoutVer2Strategy ---")
     strat_v2 = BreakoutVer2Strategy(
@@ -0,0 +1,97 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Shared loader for the stockData CSVs. Parsing the timezone-offset dates is
+# the slowest part of startup, so each CSV is parsed once and its columns are
+# written to a binary .npz next to the data (in .cache/). The cache is reused
+# until the CSV's mtime or size changes.
+
+DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'stockData'))
+CACHE_DIRNAME = '.cache'
+_CACHE_VERSION = 1
+
+def ticker_files(data_dir=DATA_DIR):
+    """Sorted CSV filenames in `data_dir`."""
+    return sorted(f for f in os.listdir(data_dir) if f.endswith('.csv'))
+
+def ticker_path(ticker, data_dir=DATA_DIR):
+    return os.path.join(data_dir, f'{ticker}_1d.csv')
+
+def _cache_path(csv_path):
+    directory, filename = os.path.split(os.path.abspath(csv_path))
+    return os.path.join(directory, CACHE_DIRNAME, filename[:-len('.csv')] + '.npz')
+
+def _parse_csv(csv_path):
+    data = pd.read_csv(csv_path, index_col='Date', parse_dates=True)
+    data.index = pd.to_datetime(data.index, utc=True).tz_localize(None)
+    return data
+
+def _read_cache(cache_path, stat):
+    try:
+        with np.load(cache_path, allow_pickle=False) as cached:
+            if (int(cached['version']) != _CACHE_VERSION or int(cached['source_mtime']) != stat.st_mtime_ns
+                    or int(cached['source_size']) != stat.st_size):
+                return None
+            columns = [str(c) for c in cached['columns']]
+            index = pd.DatetimeIndex(cached['index'], name='Date')
+            return pd.DataFrame({c: cached[f'col{i}'] for i, c in enumerate(columns)}, index=index)
+    except (OSError, KeyError, ValueError):
+        return None
+
+def _write_cache(cache_path, data, stat):
+    arrays = {f'col{i}': data[c].to_numpy() for i, c in enumerate(data.columns)}
+    tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        # np.savez appends .npz unless given a file object
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, version=_CACHE_VERSION, source_mtime=stat.st_mtime_ns, source_size=stat.st_size,
+                     columns=np.array(data.columns, dtype=str), index=data.index.to_numpy(), **arrays)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        # A read-only data directory just means no cache
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def prime_cache(csv_path, data):
+    """
+    Writes the cache entry of `csv_path` for `data`, the frame load_ohlcv
+    would parse from it, so the first load skips parsing (for writers that
+    already hold the columns, like synthetic_data.py).
+    """
+    _write_cache(_cache_path(csv_path), data, os.stat(csv_path))
+
+def slice_dates(data, start_date=None, end_date=None):
+    """
+    Rows with start_date <= index <= end_date, found by binary search on the
+    sorted index (same rows as the boolean-mask filter).
+    """
+    if not data.index.is_monotonic_increasing:
+        mask = np.ones(len(data), dtype=bool)
+        if start_date is not None: mask &= data.index >= start_date
+        if end_date is not None: mask &= data.index <= end_date
+        return data[mask]
+    start = 0 if start_date is None else data.index.searchsorted(pd.Timestamp(start_date), side='left')
+    stop = len(data) if end_date is None else data.index.searchsorted(pd.Timestamp(end_date), side='right')
+    return data.iloc[start:stop]
+
+def load_ohlcv(csv_path, start_date=None, end_date=None, use_cache=True):
+    """
+    Loads a stockData CSV as a DataFrame indexed by tz-naive 'Date', identical
+    to read_csv(parse_dates=True) followed by to_datetime(utc=True).tz_localize(None),
+    optionally sliced to [start_date, end_date].
+    """
+    if use_cache:
+        stat = os.stat(csv_path)
+        cache_path = _cache_path(csv_path)
+        data = _read_cache(cache_path, stat)
+        if data is None:
+            data = _parse_csv(csv_path)
+            _write_cache(cache_path, data, stat)
+    else:
+        data = _parse_csv(csv_path)
+    return slice_dates(data, start_date, end_date)
+
+def load_ticker(ticker, start_date=None, end_date=None, data_dir=DATA_DIR, use_cache=True):
+    return load_ohlcv(ticker_path(ticker, data_dir), start_date, end_date, use_cache=use_cache)
@@ -0,0 +1,238 @@
+from collections import deque
+from functools import partial
+import numpy as np
+
+# Online rolling indicators. Each class keeps O(1) state per update(value)
+# call (O(window) memory), and its compute(values, window) classmethod returns
+# the whole series as an array whose element i is what update() returned for
+# values[i] (NaN while the window is incomplete). compute() evaluates the same
+# recurrence as update() - the running sums are a cumulative sum of the
+# per-bar changes - so the two entry points agree bit for bit, and a strategy
+# sees the same values in a backtest and in the streaming engine.
+#
+# compute() works along the last axis, so a (tickers x bars) array gives each
+# row the values of its 1-D series (Rsi.compute takes 1-D series only). The
+# running sums carry a NaN forward, so series must not have gaps.
+
+# --- Rolling Mean ---
+
+class RollingMean:
+    """Mean of the last `window` values, kept as a running sum."""
+    def __init__(self, window):
+        self.window = window
+        self.values = deque()
+        self.total = 0.0
+
+    def update(self, value):
+        self.values.append(value)
+        old = self.values.popleft() if len(self.values) > self.window else 0.0
+        self.total += value - old
+        if self.window < 1 or len(self.values) < self.window:
+            return np.nan
+        return self.total / self.window
+
+    @classmethod
+    def compute(cls, values, window):
+        values = np.asarray(values, dtype=np.float64)
+        out = np.full(values.shape, np.nan)
+        if window < 1 or values.shape[-1] < window:
+            return out
+        total = _running_sum(values, window)
+        out[..., window-1:] = total[..., window-1:] / window
+        return out
+
+def _running_sum(values, window):
+    """The running sum update() keeps: cumulative sum of value - value `window` bars back."""
+    changes = values.copy()
+    changes[..., window:] -= values[..., :-window]
+    return np.cumsum(changes, axis=-1)
+
+# --- Rolling Standard Deviation ---
+
+class RollingStd:
+    """
+    Sample standard deviation (ddof=1) of the last `window` values, from
+    running sums of the values and their squares. Every `window` updates the
+    sums are recomputed from the window itself, shifted by its newest value:
+    that bounds the rounding drift of the running sums and keeps them small,
+    avoiding most of the cancellation in sum_sq - sum**2 / n. Updates stay
+    amortized O(1).
+    """
+    def __init__(self, window):
+        self.window = window
+        self.values = deque()
+        self.count = 0
+        self.shift = 0.0
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def update(self, value):
+        n = self.window
+        self.values.append(value)
+        old = self.values.popleft() if len(self.values) > n else None
+        self.count += 1
+        if n < 2 or self.count < n:
+            return np.nan
+        if (self.count - n) % n == 0:
+            self.shift = value
+            shifted = [v - value for v in self.values]
+            self.total = sum(shifted)
+            self.total_sq = sum(y * y for y in shifted)
+        else:
+            y, y_old = value - self.shift, old - self.shift
+            self.total += y - y_old
+            self.total_sq += y * y - y_old * y_old
+        return float(np.sqrt(max((self.total_sq - self.total * self.total / n) / (n - 1), 0.0)))
+
+    @classmethod
+    def compute(cls, values, window):
+        values = np.asarray(values, dtype=np.float64)
+        out = np.full(values.shape, np.nan)
+        n, length = window, values.shape[-1]
+        if n < 2 or length < n:
+            return out
+        # One row per block of n outputs; block b starts at the re-anchoring bar
+        starts = np.arange(n - 1, length, n)
+        bars = np.minimum(starts[:, None] + np.arange(n), length - 1)
+        shift = values[..., starts][..., None]
+        y = values[..., bars] - shift
+        y_old = values[..., bars - n] - shift
+        changes, changes_sq = y - y_old, y * y - y_old * y_old
+        # The first column of each block is the sum over the window itself
+        window_values = values[..., starts[:, None] - n + 1 + np.arange(n)] - shift
+        changes[..., 0] = np.cumsum(window_values, axis=-1)[..., -1]
+        changes_sq[..., 0] = np.cumsum(window_values * window_values, axis=-1)[..., -1]
+        total = np.cumsum(changes, axis=-1).reshape(values.shape[:-1] + (-1,))[..., :length - n + 1]
+        total_sq = np.cumsum(changes_sq, axis=-1).reshape(values.shape[:-1] + (-1,))[..., :length - n + 1]
+        var = (total_sq - total * total / n) / (n - 1)
+        out[..., n-1:] = np.sqrt(np.maximum(var, 0.0))
+        return out
+
+# --- Rolling Max ---
+
+class RollingMax:
+    """
+    Maximum of the last `window` values, from a deque of (index, value)
+    candidates kept in decreasing order: each value is pushed and popped at
+    most once, so updates are amortized O(1).
+    """
+    def __init__(self, window):
+        self.window = window
+        self.candidates = deque()
+        self.count = 0
+
+    def update(self, value):
+        candidates = self.candidates
+        while candidates and candidates[-1][1] <= value:
+            candidates.pop()
+        candidates.append((self.count, value))
+        self.count += 1
+        if candidates[0][0] <= self.count - 1 - self.window:
+            candidates.popleft()
+        if self.window < 1 or self.count < self.window:
+            return np.nan
+        return candidates[0][1]
+
+    @classmethod
+    def compute(cls, values, window):
+        # A maximum involves no rounding, so the vectorized sliding-window
+        # reduction gives exactly what the deque does
+        values = np.ascontiguousarray(values, dtype=np.float64)
+        out = np.full(values.shape, np.nan)
+        if window < 1 or values.shape[-1] < window:
+            return out
+        out[..., window-1:] = np.lib.stride_tricks.sliding_window_view(values, window, axis=-1).max(axis=-1)
+        return out
+
+# --- RSI ---
+
+def _rsi_from_averages(avg_gain, avg_loss):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = avg_gain / avg_loss
+        return 100 - (100 / (1 + rs))
+
+class Rsi:
+    """
+    RSI over `window` close-to-close changes. method='simple' averages the
+    gains and losses with RollingMean (the original RsiMomentumStrategy
+    formula); 'wilder' seeds Wilder smoothing with that first simple average
+    and then applies avg = (avg * (window - 1) + change) / window.
+    """
+    def __init__(self, window=14, method='simple'):
+        if method not in ('simple', 'wilder'):
+            raise ValueError(f"Unknown RSI method: {method}")
+        self.window = window
+        self.method = method
+        self.prev = None
+        self.gains = RollingMean(window)
+        self.losses = RollingMean(window)
+        self.avg_gain = None
+        self.avg_loss = None
+        self.value = np.nan
+
+    def update(self, value):
+        if self.prev is None:
+            self.prev = value
+            return self.value
+        delta = value - self.prev
+        self.prev = value
+        gain = delta if delta > 0 else 0.0
+        loss = -delta if delta < 0 else 0.0
+        n = self.window
+
+        if self.method == 'wilder' and self.avg_gain is not None:
+            self.avg_gain = (self.avg_gain * (n - 1) + gain) / n
+            self.avg_loss = (self.avg_loss * (n - 1) + loss) / n
+        else:
+            avg_gain, avg_loss = self.gains.update(gain), self.losses.update(loss)
+            if n < 1 or np.isnan(avg_gain):
+                return self.value
+            # Removing a change from a running sum can leave a tiny negative rounding residue
+            self.avg_gain, self.avg_loss = max(avg_gain, 0.0), max(avg_loss, 0.0)
+
+        self.value = float(_rsi_from_averages(np.float64(self.avg_gain), np.float64(self.avg_loss)))
+        return self.value
+
+    @classmethod
+    def compute(cls, values, window, method='simple'):
+        if method not in ('simple', 'wilder'):
+            raise ValueError(f"Unknown RSI method: {method}")
+        values = np.asarray(values, dtype=np.float64)
+        out = np.full(len(values), np.nan)
+        n = window
+        if n < 1 or len(values) <= n:
+            return out
+        delta = np.diff(values)
+        gains = np.maximum(RollingMean.compute(np.where(delta > 0, delta, 0.0), n)[n-1:], 0.0)
+        losses = np.maximum(RollingMean.compute(np.where(delta < 0, -delta, 0.0), n)[n-1:], 0.0)
+        if method == 'wilder':
+            changes = zip(np.where(delta > 0, delta, 0.0)[n:].tolist(), np.where(delta < 0, -delta, 0.0)[n:].tolist())
+            avg_gain, avg_loss = float(gains[0]), float(losses[0])
+            avg_gains, avg_losses = [avg_gain], [avg_loss]
+            for gain, loss in changes:
+                avg_gain = (avg_gain * (n - 1) + gain) / n
+                avg_loss = (avg_loss * (n - 1) + loss) / n
+                avg_gains.append(avg_gain)
+                avg_losses.append(avg_loss)
+            gains, losses = np.array(avg_gains), np.array(avg_losses)
+        out[n:] = _rsi_from_averages(gains, losses)
+        return out
+
+# --- Registry ---
+
+# Indicator kinds usable in Strategy.indicators() specs: (class, extra arguments)
+_KINDS = {
+    'sma': (RollingMean, {}),
+    'std': (RollingStd, {}),
+    'max': (RollingMax, {}),
+    'rsi': (Rsi, {}),
+    'rsi_wilder': (Rsi, {'method': 'wilder'}),
+}
+
+# kind -> compute(values, window), the whole-series arrays
+INDICATORS = {kind: partial(cls.compute, **options) for kind, (cls, options) in _KINDS.items()}
+
+def online_indicator(kind, window):
+    """A new updater for `kind`: call update(value) with each new value."""
+    cls, options = _KINDS[kind]
+    return cls(window, **options)
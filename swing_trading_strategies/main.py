@@ -1,26 +1,35 @@
+import argparse
 import os
 import pandas as pd
 import sys
-import matplotlib.pyplot as plt
+from concurrent.futures import ProcessPoolExecutor
 
 sys.path.append('..')
 from custom_backtest_engine import (
-    BacktestEngine,
     MovingAverageCrossoverStrategy,
     RsiMomentumStrategy,
     BreakoutStrategy,
     BreakoutVer2Strategy,
     TwoStdDevStrategy
 )
+from strategy_spec import StrategySpec
 from backtester import generate_summary_from_trades
+from data_loader import load_ohlcv, ticker_files
+from result_cache import run_cached
+from checkpoint import run_incremental
+from plotting import PlotJob, render_plots
+from profiling import PROFILER, cprofile, enable as enable_profiling
+from trade_store import TradeStore
+import matplotlib.pyplot as plt
 # --- Import config variables, including the new flag ---
 from config import START_DATE, END_DATE, Use_Log_Plots_Equities
 
-# This list is now fully compatible with the modified engine
+# This list is now fully compatible with the modified engine.
+# Entries are picklable StrategySpecs, so they can be shipped to worker processes.
 STRATEGIES = [
-    ("Breakout_Simple", lambda: BreakoutStrategy(breakout_period=20, sl=0.95, tp=999999.9)),
+    ("Breakout_Simple", StrategySpec.create(BreakoutStrategy, breakout_period=20, sl=0.95, tp=999999.9)),
 
-    ("BreakoutV2_As_Simple", lambda: BreakoutVer2Strategy(
+    ("BreakoutV2_As_Simple", StrategySpec.create(BreakoutVer2Strategy,
         use_trailing_stop=False,
         fixed_stop_perc=0.05,
         max_pyramids=1,
@@ -30,7 +39,7 @@ STRATEGIES = [
     )),
 
     # Test Group 2: V2 with its trailing stop enabled
-    ("BreakoutV2_TrailingStop", lambda: BreakoutVer2Strategy(
+    ("BreakoutV2_TrailingStop", StrategySpec.create(BreakoutVer2Strategy,
         use_trailing_stop=True,
         trailing_stop_perc=0.05,
         max_pyramids=1,
@@ -40,7 +49,7 @@ STRATEGIES = [
     )),
 
     # Test Group 3: V2 with all features enabled
-    ("BreakoutV2_Full_Features", lambda: BreakoutVer2Strategy(
+    ("BreakoutV2_Full_Features", StrategySpec.create(BreakoutVer2Strategy,
         use_trailing_stop=True,
         trailing_stop_perc=0.10,
         max_pyramids=5,
@@ -48,7 +57,7 @@ STRATEGIES = [
         pyramid_profit_perc=0.10,
         tp_long_perc=999
     )),
-    ("BreakoutV2_25_NoStop_Pyramid", lambda: BreakoutVer2Strategy(
+    ("BreakoutV2_25_NoStop_Pyramid", StrategySpec.create(BreakoutVer2Strategy,
         use_trailing_stop=False,
         trailing_stop_perc=0.20,
         max_pyramids=4,
@@ -57,7 +66,7 @@ STRATEGIES = [
         fixed_stop_perc=1.0,
         tp_long_perc=99999
     )),
-    ("BreakoutV2_20_Trailingstop", lambda: BreakoutVer2Strategy(
+    ("BreakoutV2_20_Trailingstop", StrategySpec.create(BreakoutVer2Strategy,
         use_trailing_stop=True,
         trailing_stop_perc=0.20,
         max_pyramids=1,
@@ -67,7 +76,7 @@ STRATEGIES = [
     )),
 
     # --- Two Standard Deviation Strategies ---
-    ("TwoStdDev_MonthlyTrend_LowerBand_Trailing", lambda: TwoStdDevStrategy(
+    ("TwoStdDev_MonthlyTrend_LowerBand_Trailing", StrategySpec.create(TwoStdDevStrategy,
         buy_condition_option='Lower Band - Cross Above',
         use_trailing_stop=True,
         trailing_stop_perc=50.0,
@@ -76,7 +85,7 @@ STRATEGIES = [
         tp_long_perc=10000,
         length=20
     )),
-    ("TwoStdDev_YearlyTrend_LowerBand_Trailing", lambda: TwoStdDevStrategy(
+    ("TwoStdDev_YearlyTrend_LowerBand_Trailing", StrategySpec.create(TwoStdDevStrategy,
         buy_condition_option='Lower Band - Cross Above',
         use_trailing_stop=True,
         trailing_stop_perc=50.0,
@@ -85,7 +94,7 @@ STRATEGIES = [
         tp_long_perc=10000,
         length=260
     )),
-    ("TwoStdDev_MonthlyTrend_LowerBand_Trailing_pyramiding50g_4", lambda: TwoStdDevStrategy(
+    ("TwoStdDev_MonthlyTrend_LowerBand_Trailing_pyramiding50g_4", StrategySpec.create(TwoStdDevStrategy,
         buy_condition_option='SMA - Cross Above',
         use_trailing_stop=True,
         trailing_stop_perc=50.0,
@@ -94,7 +103,7 @@ STRATEGIES = [
         tp_long_perc=10000,
         length=20
     )),
-    ("TwoStdDev_YearlyTrend_SMABand_Trailing", lambda: TwoStdDevStrategy(
+    ("TwoStdDev_YearlyTrend_SMABand_Trailing", StrategySpec.create(TwoStdDevStrategy,
         buy_condition_option='SMA - Cross Above',
         use_trailing_stop=True,
         trailing_stop_perc=50.0,
@@ -103,7 +112,7 @@ STRATEGIES = [
         tp_long_perc=10000,
         length=260
     )),
-    ("TwoStdDev_MonthlyTrend_LowerBand_Trailing", lambda: TwoStdDevStrategy(
+    ("TwoStdDev_MonthlyTrend_LowerBand_Trailing", StrategySpec.create(TwoStdDevStrategy,
         buy_condition_option='SMA - Cross Above',
         use_trailing_stop=True,
         trailing_stop_perc=50.0,
@@ -112,7 +121,7 @@ STRATEGIES = [
         tp_long_perc=10000,
         length=20
     )),
-    ("TwoStdDev_UpperBand_Trailing", lambda: TwoStdDevStrategy(
+    ("TwoStdDev_UpperBand_Trailing", StrategySpec.create(TwoStdDevStrategy,
         buy_condition_option='Upper Band - Cross Above',
         use_trailing_stop=True,
         trailing_stop_perc=1.0,
@@ -122,7 +131,7 @@ STRATEGIES = [
         length=260
     )),
 
-    ("TwoStdDev_SMA_Trailing_Pyramid", lambda: TwoStdDevStrategy(
+    ("TwoStdDev_SMA_Trailing_Pyramid", StrategySpec.create(TwoStdDevStrategy,
         buy_condition_option='SMA - Cross Above',
         use_trailing_stop=True,
         trailing_stop_perc=0.10,
@@ -131,7 +140,7 @@ STRATEGIES = [
         entry_size_perc=0.20,
         tp_long_perc=1.20
     )),
-    ("TwoStdDev_SMA_Trailing_Pyramid_Hold_To_End", lambda: TwoStdDevStrategy(
+    ("TwoStdDev_SMA_Trailing_Pyramid_Hold_To_End", StrategySpec.create(TwoStdDevStrategy,
         buy_condition_option='SMA - Cross Above',
         use_trailing_stop=True,
         trailing_stop_perc=0.50,
@@ -143,7 +152,8 @@ STRATEGIES = [
 
 ]
 
-def plot_equity_curve(strategy_equity, buy_and_hold_equity, ticker, strat_name, strat_instance, plot_dir, initial_cash):
+def plot_equity_curve(strategy_equity, buy_and_hold_equity, ticker, strat_name, strat_params, plot_path, initial_cash,
+                      log_scale=Use_Log_Plots_Equities):
     """
     Generates and saves a plot of an individual equity curve against its Buy & Hold benchmark.
     """
@@ -154,7 +164,7 @@ def plot_equity_curve(strategy_equity, buy_and_hold_equity, ticker, strat_name,
     ax.plot(buy_and_hold_equity.index, buy_and_hold_equity.values, label='Buy & Hold Equity', color='gray', linestyle='-', linewidth=1.5, alpha=0.9, zorder=5)
     ax.axhline(y=initial_cash, color='red', linestyle='--', linewidth=1.5, label=f'Initial Capital (${initial_cash:,.0f})')
 
-    if Use_Log_Plots_Equities:
+    if log_scale:
         ax.set_yscale('log')
         ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'${x:,.0f}'))
         ax.set_ylabel('Equity ($) - Log Scale')
@@ -165,14 +175,7 @@ def plot_equity_curve(strategy_equity, buy_and_hold_equity, ticker, strat_name,
     fig.suptitle(f'Equity Curve for {ticker}', fontsize=16, fontweight='bold')
     
     # --- This is the corrected title logic ---
-    # Make a copy of params to format for display without altering the original object
-    params = strat_instance.__dict__.copy()
-
-    # If long_stop_price exists and is a number, format it to two decimal places
-    if 'long_stop_price' in params and isinstance(params['long_stop_price'], (int, float)):
-        params['long_stop_price'] = f"{params['long_stop_price']:.2f}"
-    
-    param_list = [f'{k}={v}' for k, v in params.items() if not k.startswith('_')]
+    param_list = [f'{k}={v}' for k, v in strat_params.items() if not k.startswith('_')]
 
     subtitle = f"Strategy: {strat_name}"
     if param_list:
@@ -193,21 +196,91 @@ def plot_equity_curve(strategy_equity, buy_and_hold_equity, ticker, strat_name,
     ax.grid(which='major', linestyle='-', linewidth='0.5', color='gray')
     ax.grid(which='minor', linestyle=':', linewidth='0.5', color='lightgray')
     
-    safe_ticker = ticker.replace(" ", "_")
-    plot_filename = os.path.join(plot_dir, f'{safe_ticker}.png')
     fig.tight_layout(rect=[0, 0.03, 1, 0.93])
-    plt.savefig(plot_filename, dpi=150)
+    plt.savefig(plot_path, dpi=150)
     plt.close(fig)
 
-def run_backtest(strategy_class, data, cash=100000):
-    strat = strategy_class()
-    engine = BacktestEngine(data, strat, initial_cash=cash)
-    trades, equity_curve = engine.run()
+def run_backtest(strategy_spec, data, cash=100000, cache=None, checkpoint_name=None):
+    """
+    Runs one backtest through the result cache, or, with `checkpoint_name`,
+    resumes the checkpoint saved under that name so only new bars are simulated.
+    """
+    strat = strategy_spec()
+    if checkpoint_name is not None:
+        trades, equity_curve = run_incremental(data, strategy_spec, checkpoint_name, initial_cash=cash)
+    else:
+        trades, equity_curve = run_cached(data, strategy_spec, initial_cash=cash, cache=cache)
     trades = trades.rename(columns={'pnl': 'PnL', 'return_pct': 'ReturnPct', 'exit_reason': 'Tag'})
     return {'_trades': trades, '_equity_curve': equity_curve, '_strat_instance': strat}
 
-def main():
-    data_dir = os.path.join(os.path.dirname(__file__), '..', 'stockData')
+def load_ticker_data(data_dir, filename):
+    return load_ohlcv(os.path.join(data_dir, filename), START_DATE, END_DATE)
+
+# Per-process cache so a worker parses each ticker once however many strategies it runs
+_TICKER_DATA = {}
+
+def run_ticker_strategy(data_dir, filename, strat_index, base_plots_dir, initial_cash, use_cache=True, incremental=False):
+    """
+    Runs STRATEGIES[strat_index] on one ticker and returns (key, trades
+    DataFrame, summary, PlotJob for its equity plot, profiler timings or None),
+    or None if the ticker has no data in range. Module-level so it can be sent
+    to worker processes.
+    """
+    lap = PROFILER.laps('main.task')
+    if filename not in _TICKER_DATA:
+        _TICKER_DATA.clear()
+        _TICKER_DATA[filename] = load_ticker_data(data_dir, filename)
+    data = _TICKER_DATA[filename]
+    lap('data_load')
+    if data.empty:
+        return None
+
+    ticker = filename.split('_')[0]
+    strat_name, strat_spec = STRATEGIES[strat_index]
+    print(f"Running {strat_name} on {ticker}...")
+    buy_and_hold_equity = (initial_cash / data['Close'].iloc[0]) * data['Close']
+    stats = run_backtest(strat_spec, data, cash=initial_cash, cache=None if use_cache else False,
+                         checkpoint_name=ticker if incremental else None)
+    lap('backtest')
+    key = f'{ticker}_{strat_name}'
+    trades = stats['_trades']
+    equity_curve_raw = stats['_equity_curve']
+    strat_instance = stats['_strat_instance']
+
+    strategy_equity = pd.Series(equity_curve_raw.values[1:], index=data.index)
+
+    plot_path = os.path.join(base_plots_dir, strat_name, f'{ticker.replace(" ", "_")}.png')
+    plot_job = PlotJob(plot_equity_curve, plot_path, dict(
+        strategy_equity=strategy_equity,
+        buy_and_hold_equity=buy_and_hold_equity,
+        ticker=ticker,
+        strat_name=strat_name,
+        strat_params={k: v for k, v in strat_instance.__dict__.items() if not k.startswith('_')},
+        initial_cash=initial_cash,
+        log_scale=Use_Log_Plots_Equities
+    ))
+
+    lap('plot_job')
+    summary = generate_summary_from_trades(trades, equity_curve_raw)
+    lap('metrics')
+    # Timings are handed back with the result so worker processes' timers reach the parent
+    return key, trades, summary, plot_job, PROFILER.take() if PROFILER.enabled else None
+
+def main(workers=1, use_cache=True, plots=True, plots_only=False, plot_workers=None, incremental=False, data_dir=None,
+         trade_logs=False):
+    """
+    Backtests the ticker x strategy matrix, writes the trades to the trade
+    store (trades.db, see trade_store.py) and the reports, then renders the equity plots as a separate stage (in `plot_workers`
+    processes, skipping unchanged plots). plots=False skips the plot stage;
+    plots_only=True renders the plots without rewriting the logs and reports.
+    incremental=True resumes each run from its checkpoint (see checkpoint.py),
+    for nightly updates after new bars are appended to stockData. Stage timings
+    go to profiling.PROFILER when it is enabled (see --profile). data_dir
+    replaces stockData, e.g. with files from synthetic_data.py. trade_logs=True
+    also exports the trades as text to trade_logs.txt.
+    """
+    lap = PROFILER.laps('main')
+    data_dir = data_dir or os.path.join(os.path.dirname(__file__), '..', 'stockData')
     summary_results = {}
     trade_logs_path = os.path.join(os.path.dirname(__file__), 'trade_logs.txt')
     results_path = os.path.join(os.path.dirname(__file__), 'backtest_results.txt')
@@ -220,48 +293,45 @@ def main():
         
     initial_cash = 100000
 
-    with open(trade_logs_path, 'w') as trade_log_file:
-        for filename in os.listdir(data_dir):
-            if filename.endswith('.csv'):
-                ticker = filename.split('_')[0]
-                data = pd.read_csv(f'{data_dir}/{filename}', index_col='Date', parse_dates=True)
-                data.index = pd.to_datetime(data.index, utc=True).tz_localize(None)
-                start_date = START_DATE
-                end_date = END_DATE
-                data = data[(data.index >= start_date) & (data.index <= end_date)]
-
-                if data.empty:
+    # Tickers are sorted and tasks kept in (ticker, strategy) order, so the
+    # output files are identical whether the matrix runs serially or in parallel.
+    filenames = ticker_files(data_dir)
+    tasks = [(data_dir, filename, k, base_plots_dir, initial_cash, use_cache, incremental)
+             for filename in filenames for k in range(len(STRATEGIES))]
+    if workers > 1:
+        initializer = enable_profiling if PROFILER.enabled else None
+        with ProcessPoolExecutor(max_workers=workers, initializer=initializer) as executor:
+            # map() yields results in task order regardless of completion order
+            results = list(executor.map(run_ticker_strategy, *zip(*tasks)))
+    else:
+        results = [run_ticker_strategy(*task) for task in tasks]
+    lap('backtests')
+    for result in results:
+        if result is not None and result[4] is not None:
+            PROFILER.merge(result[4])
+
+    plot_jobs = [result[3] for result in results if result is not None]
+    if plots_only:
+        render_plots(plot_jobs, base_plots_dir, workers=plot_workers)
+        lap('plotting')
+        return
+
+    with TradeStore() as store:
+        store.clear()
+        for (_, filename, k, *_), result in zip(tasks, results):
+            ticker = filename.split('_')[0]
+            if result is None:
+                if k == 0:
                     print(f"Skipping {ticker} due to no data in the date range.")
-                    continue
-                buy_and_hold_equity = (initial_cash / data['Close'].iloc[0]) * data['Close']
-
-                for strat_name, strat_class in STRATEGIES:
-                    print(f"Running {strat_name} on {ticker}...")
-                    stats = run_backtest(strat_class, data, cash=initial_cash)
-                    key = f'{ticker}_{strat_name}'
-                    trades = stats['_trades']
-                    equity_curve_raw = stats['_equity_curve']
-                    strat_instance = stats['_strat_instance']
-
-                    strategy_equity = pd.Series(equity_curve_raw.values[1:], index=data.index)
-
-                    strat_plot_dir = os.path.join(base_plots_dir, strat_name)
-                    plot_equity_curve(
-                        strategy_equity, 
-                        buy_and_hold_equity, 
-                        ticker, 
-                        strat_name, 
-                        strat_instance, 
-                        strat_plot_dir, 
-                        initial_cash
-                    )
-                    
-                    trade_log_file.write(f'{key} TRADES:\n')
-                    trade_log_file.write(trades.to_string(index=False))
-                    trade_log_file.write('\n\n')
-                    
-                    summary = generate_summary_from_trades(trades, equity_curve_raw)
-                    summary_results[key] = summary
+                continue
+            key, trades, summary, *_ = result
+            store.append(ticker, STRATEGIES[k][0], trades)
+            summary_results[key] = summary
+        store.flush()
+        lap('trade_store')
+        if trade_logs:
+            store.export_text(trade_logs_path)
+            lap('trade_log_export')
 
     def format_value(metric, value):
         if value == 'N/A': return value
@@ -283,9 +353,44 @@ def main():
     summary_df.index.name = 'Strategy'
     summary_csv_path = os.path.join(os.path.dirname(__file__), 'backtest_summary.csv')
     summary_df.to_csv(summary_csv_path)
+    lap('write_summary')
 
     from report_generator import generate_report
-    generate_report(results_path)
+    generate_report(results_path, trade_log_path=trade_logs_path if trade_logs else None)
+    lap('report')
+
+    if plots:
+        render_plots(plot_jobs, base_plots_dir, workers=plot_workers)
+        lap('plotting')
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Backtest every strategy in STRATEGIES on every ticker in stockData.')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of processes for the ticker x strategy matrix (default: 1, serial)')
+    parser.add_argument('--no-cache', action='store_true', help='Re-run every backtest instead of using the result cache')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Resume each backtest from its checkpoint and simulate only bars added since the last run')
+    plot_mode = parser.add_mutually_exclusive_group()
+    plot_mode.add_argument('--no-plots', action='store_true', help='Skip rendering the equity plots')
+    plot_mode.add_argument('--plots-only', action='store_true', help='Only render the equity plots, without rewriting logs and reports')
+    parser.add_argument('--plot-workers', type=int, default=None,
+                        help='Number of processes for rendering plots (default: all cores)')
+    parser.add_argument('--trade-logs', action='store_true',
+                        help='Also export the trades as text to trade_logs.txt (they are always stored in trades.db)')
+    parser.add_argument('--data-dir', default=None,
+                        help='Directory of ticker CSVs to use instead of stockData (e.g. from synthetic_data.py)')
+    parser.add_argument('--profile', nargs='?', const='profile.json', default=None, metavar='PATH',
+                        help='Time each pipeline stage and engine phase, print the breakdown and write it as JSON to PATH (default: profile.json)')
+    parser.add_argument('--cprofile', default=None, metavar='PATH',
+                        help='Also run under cProfile and dump the pstats to PATH (serial work only; see --workers)')
+    args = parser.parse_args()
+    if args.profile:
+        enable_profiling()
+    with cprofile(args.cprofile):
+        main(workers=args.workers, use_cache=not args.no_cache, plots=not args.no_plots,
+             plots_only=args.plots_only, plot_workers=args.plot_workers, incremental=args.incremental,
+             data_dir=args.data_dir, trade_logs=args.trade_logs)
+    if args.profile:
+        print(PROFILER.report())
+        PROFILER.write_json(args.profile)
+        print(f"Profile written to {args.profile}")
\ No newline at end of file
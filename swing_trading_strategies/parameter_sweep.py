@@ -0,0 +1,142 @@
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(__file__))
+import custom_backtest_engine
+from custom_backtest_engine import BarData, create_engine
+from backtester import generate_summary_from_trades
+from batch_engine import ParameterBatchEngine
+from config import START_DATE, END_DATE
+from data_loader import DATA_DIR, load_ticker, ticker_files
+
+# Per-process cache of BarData views, filled by the pool initializer so each
+# worker parses every ticker once and reuses its indicator arrays across all
+# the configurations it runs.
+_WORKER_BARS = {}
+
+# Chunks of at least this many vectorized configurations run through
+# ParameterBatchEngine; below it, per-config VectorizedBacktestEngine runs are faster.
+BATCH_MIN_CONFIGS = 64
+
+def expand_grid(param_grid):
+    """
+    Expands {param: [values, ...]} into a list of parameter dictionaries
+    covering every combination.
+    """
+    names = list(param_grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(param_grid[name] for name in names))]
+
+def available_tickers(data_dir=DATA_DIR):
+    return [f.split('_')[0] for f in ticker_files(data_dir)]
+
+def load_ticker_data(data_dir, ticker, start_date=START_DATE, end_date=END_DATE):
+    return load_ticker(ticker, start_date, end_date, data_dir=data_dir)
+
+def _init_worker(data_dir, tickers, start_date, end_date):
+    _WORKER_BARS.clear()
+    for ticker in tickers:
+        data = load_ticker_data(data_dir, ticker, start_date, end_date)
+        if not data.empty:
+            _WORKER_BARS[ticker] = BarData(data.reset_index())
+
+def _run_chunk(strategy_class, fixed_params, ticker, chunk, initial_cash):
+    """Runs one batch of (config index, params) on one ticker and returns result rows."""
+    bars = _WORKER_BARS.get(ticker)
+    rows = []
+    if bars is None:
+        return rows
+    strategies = [strategy_class(**{**fixed_params, **params}) for _, params in chunk]
+    if len(strategies) >= BATCH_MIN_CONFIGS and all(strat.vectorized for strat in strategies):
+        # One pass over the bars for the whole chunk
+        results = ParameterBatchEngine(bars, strategies, initial_cash=initial_cash).run()
+    else:
+        results = (create_engine(bars, strat, initial_cash=initial_cash).run() for strat in strategies)
+    for (config_id, params), (trades, equity_curve) in zip(chunk, results):
+        trades = trades.rename(columns={'pnl': 'PnL', 'return_pct': 'ReturnPct', 'exit_reason': 'Tag'})
+        summary = generate_summary_from_trades(trades, equity_curve, initial_cash=initial_cash)
+        rows.append({'Config': config_id, 'Ticker': ticker, **params, **summary})
+    return rows
+
+def _chunks(configs, chunk_size):
+    for start in range(0, len(configs), chunk_size):
+        yield configs[start:start + chunk_size]
+
+def run_sweep(strategy_class, param_grid, tickers=None, fixed_params=None, initial_cash=100000,
+              workers=None, chunk_size=None, data_dir=DATA_DIR, start_date=START_DATE, end_date=END_DATE):
+    """
+    Backtests every combination in `param_grid` on every ticker and returns one
+    DataFrame row per (config, ticker) with the parameters and the
+    generate_summary_from_trades metrics, ordered by config then ticker.
+
+    Runs are batched into chunks of `chunk_size` configurations per ticker and
+    fanned out across a ProcessPoolExecutor with `workers` processes
+    (default: all cores). workers=1 runs everything in this process.
+    """
+    tickers = list(tickers) if tickers else available_tickers(data_dir)
+    fixed_params = dict(fixed_params or {})
+    configs = list(enumerate(expand_grid(param_grid)))
+    workers = workers or os.cpu_count() or 1
+    if chunk_size is None:
+        # Aim for ~4 tasks per worker per ticker, capped to keep results flowing.
+        chunk_size = max(1, min(500, len(configs) // (workers * 4)))
+
+    tasks = [(ticker, chunk) for ticker in tickers for chunk in _chunks(configs, chunk_size)]
+    total_runs = len(configs) * len(tickers)
+    print(f"Sweeping {len(configs)} configurations x {len(tickers)} tickers = {total_runs} backtests "
+          f"({len(tasks)} tasks, {workers} workers)...")
+    start = time.perf_counter()
+
+    rows = []
+    if workers == 1:
+        _init_worker(data_dir, tickers, start_date, end_date)
+        for ticker, chunk in tasks:
+            rows.extend(_run_chunk(strategy_class, fixed_params, ticker, chunk, initial_cash))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(data_dir, tickers, start_date, end_date)) as executor:
+            futures = [executor.submit(_run_chunk, strategy_class, fixed_params, ticker, chunk, initial_cash)
+                       for ticker, chunk in tasks]
+            for done, future in enumerate(as_completed(futures), 1):
+                rows.extend(future.result())
+                if done % max(1, len(futures) // 10) == 0:
+                    print(f"  {done}/{len(futures)} tasks done ({time.perf_counter() - start:.1f}s)")
+
+    elapsed = time.perf_counter() - start
+    print(f"Sweep finished in {elapsed:.1f}s ({total_runs / elapsed if elapsed else 0:.0f} backtests/s)")
+    results = pd.DataFrame(rows)
+    if not results.empty:
+        ticker_order = {ticker: i for i, ticker in enumerate(tickers)}
+        results = (results.assign(_ticker_order=results['Ticker'].map(ticker_order))
+                          .sort_values(['Config', '_ticker_order'])
+                          .drop(columns='_ticker_order')
+                          .reset_index(drop=True))
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run a parameter sweep over the stockData universe.')
+    parser.add_argument('--strategy', default='TwoStdDevStrategy', help='Strategy class name in custom_backtest_engine')
+    parser.add_argument('--grid', default=None,
+                        help='JSON parameter grid, e.g. \'{"length": [20, 50], "stdev_factor": [1.5, 2.0]}\'')
+    parser.add_argument('--tickers', nargs='*', default=None)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunk-size', type=int, default=None)
+    parser.add_argument('--output', default=os.path.join(os.path.dirname(__file__), 'sweep_results.csv'))
+    args = parser.parse_args()
+
+    grid = json.loads(args.grid) if args.grid else {
+        'length': [20, 50, 100, 260],
+        'stdev_factor': [1.5, 2.0, 2.5],
+        'trailing_stop_perc': [0.05, 0.10, 0.20, 0.50],
+        'pyramid_profit_perc': [0.10, 0.20],
+    }
+    results = run_sweep(getattr(custom_backtest_engine, args.strategy), grid, tickers=args.tickers,
+                        workers=args.workers, chunk_size=args.chunk_size)
+    results.to_csv(args.output, index=False)
+    print(f"Saved {len(results)} rows to {args.output}")
@@ -1,21 +1,31 @@
+import argparse
 import os
+import numpy as np
 import pandas as pd
 import sys
 from datetime import date
-import matplotlib.pyplot as plt
 
 # Add the project root to the Python path to allow for absolute imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from swing_trading_strategies.plotting import PlotJob, render_plots
+import matplotlib.pyplot as plt
 
 # --- Import the new flags from your config file ---
 from swing_trading_strategies.config import (
     START_DATE, END_DATE, Use_Log_Plots_Portfolio,
-    Percent_Cash_Portfolio, Cash_Yearly_Rtn, Rebalance_Portfolio_Yearly
+    Percent_Cash_Portfolio, Cash_Yearly_Rtn, Rebalance_Portfolio_Yearly, Rebalance_Frequency,
+    Portfolio_Shared_Cash, Max_Position_Perc, Max_Positions
 )
-from swing_trading_strategies.custom_backtest_engine import BacktestEngine
 from swing_trading_strategies.main import STRATEGIES
-
-def plot_portfolio_equity(portfolio_equity, strat_name, strat_params, plots_dir, initial_capital, buy_and_hold_equity=None, pure_buy_and_hold_equity=None):
+from swing_trading_strategies.data_loader import load_ohlcv, ticker_files
+from swing_trading_strategies.result_cache import ResultCache, run_cached
+from swing_trading_strategies.portfolio_engine import PortfolioEngine
+# The engines import profiling as a top-level module (main puts this directory
+# on the path), so it is imported the same way here to share one PROFILER
+from profiling import PROFILER, cprofile, enable as enable_profiling
+
+def plot_portfolio_equity(portfolio_equity, strat_name, strat_params, plot_path, initial_capital, buy_and_hold_equity=None, pure_buy_and_hold_equity=None,
+                          log_scale=Use_Log_Plots_Portfolio, percent_cash=Percent_Cash_Portfolio):
     """
     Generates and saves a plot of the portfolio equity curve.
     Includes the Buy and Hold curve (with cash allocation) and a 100% Equity B&H curve.
@@ -26,7 +36,7 @@ def plot_portfolio_equity(portfolio_equity, strat_name, strat_params, plots_dir,
     ax.plot(portfolio_equity.index, portfolio_equity.values, label=f'{strat_name} Equity', color='royalblue', linewidth=2, zorder=10)
 
     if buy_and_hold_equity is not None:
-        label = f'B&H with {Percent_Cash_Portfolio:.0%} Cash'
+        label = f'B&H with {percent_cash:.0%} Cash'
         ax.plot(buy_and_hold_equity.index, buy_and_hold_equity.values, label=label, color='gray', linestyle='-', linewidth=1.5, alpha=0.9, zorder=5)
 
     if pure_buy_and_hold_equity is not None:
@@ -34,7 +44,7 @@ def plot_portfolio_equity(portfolio_equity, strat_name, strat_params, plots_dir,
 
     ax.axhline(y=initial_capital, color='red', linestyle='--', linewidth=1.5, label=f'Initial Capital (${initial_capital:,.0f})')
 
-    if Use_Log_Plots_Portfolio:
+    if log_scale:
         ax.set_yscale('log')
         ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'${x:,.0f}'))
         ax.set_ylabel('Portfolio Value ($) - Log Scale')
@@ -60,56 +70,88 @@ def plot_portfolio_equity(portfolio_equity, strat_name, strat_params, plots_dir,
     ax.grid(which='major', linestyle='-', linewidth='0.5', color='gray')
     ax.grid(which='minor', linestyle=':', linewidth='0.5', color='lightgray')
     
-    safe_strat_name = strat_name.replace(" ", "_").replace("/", "_")
-    plot_filename = os.path.join(plots_dir, f'portfolio_{safe_strat_name}.png')
-    
     fig.tight_layout(rect=[0, 0.03, 1, 0.95])
     
-    plt.savefig(plot_filename, dpi=150)
+    plt.savefig(plot_path, dpi=150)
     plt.close(fig)
-    print(f"Saved plot for {strat_name} to {plot_filename}")
-
+    print(f"Saved plot for {strat_name} to {plot_path}")
 
-def run_rebalancing_simulation(invested_equity_curve, initial_invested, initial_cash, daily_cash_return):
+def portfolio_plot_job(plots_dir, strat_name, strat_params, **kwargs):
+    """PlotJob for plot_portfolio_equity, with the current config's log scale and cash allocation."""
+    safe_strat_name = strat_name.replace(" ", "_").replace("/", "_")
+    return PlotJob(plot_portfolio_equity, os.path.join(plots_dir, f'portfolio_{safe_strat_name}.png'), dict(
+        strat_name=strat_name,
+        strat_params={k: v for k, v in strat_params.items() if not k.startswith('_')},
+        log_scale=Use_Log_Plots_Portfolio,
+        percent_cash=Percent_Cash_Portfolio,
+        **kwargs
+    ))
+
+
+# Calendar keys that define the rebalancing periods
+REBALANCE_PERIODS = {
+    'yearly': lambda index: index.year,
+    'quarterly': lambda index: index.year * 4 + index.quarter,
+    'monthly': lambda index: index.year * 12 + index.month,
+}
+
+def run_rebalancing_simulation(invested_equity_curve, initial_invested, initial_cash, daily_cash_return,
+                               frequency='yearly', cash_fraction=None):
     """
-    Performs a day-by-day simulation of a portfolio with annual rebalancing.
+    Simulates a portfolio that is reset to the `cash_fraction` split (default
+    Percent_Cash_Portfolio) on the first trading day of every year, quarter
+    or month. Within a period both sleeves compound independently; on the
+    reset day the previous day's total is split and that day's return is not
+    applied, as in the original day-by-day simulation.
     """
-    invested_returns = invested_equity_curve.pct_change().fillna(0)
-    
-    sim = pd.DataFrame(index=invested_equity_curve.index)
-    sim['invested'] = 0.0
-    sim['cash'] = 0.0
-    sim.loc[sim.index[0], ['invested', 'cash']] = [initial_invested, initial_cash]
-
-    prev_year = sim.index[0].year
-
-    for i in range(1, len(sim)):
-        current_index = sim.index[i]
-        prev_index = sim.index[i-1]
-        
-        current_year = current_index.year
-        if current_year != prev_year:
-            total_value = sim.loc[prev_index, 'invested'] + sim.loc[prev_index, 'cash']
-            sim.loc[current_index, 'invested'] = total_value * (1 - Percent_Cash_Portfolio)
-            sim.loc[current_index, 'cash'] = total_value * Percent_Cash_Portfolio
-        else:
-            sim.loc[current_index, 'invested'] = sim.loc[prev_index, 'invested'] * (1 + invested_returns.iloc[i])
-            sim.loc[current_index, 'cash'] = sim.loc[prev_index, 'cash'] * (1 + daily_cash_return)
-        
-        prev_year = current_year
-
-    sim['total'] = sim['invested'] + sim['cash']
-    return sim['total']
-
-
-def run_portfolio_analysis(initial_capital=100000):
+    if cash_fraction is None:
+        cash_fraction = Percent_Cash_Portfolio
+    index = invested_equity_curve.index
+    n = len(index)
+    invested_returns = invested_equity_curve.pct_change().fillna(0).to_numpy()
+
+    period = np.asarray(REBALANCE_PERIODS[frequency](index))
+    is_start = np.ones(n, dtype=bool)
+    is_start[1:] = period[1:] != period[:-1]
+    starts = np.flatnonzero(is_start)
+    segment = np.cumsum(is_start) - 1
+
+    # Growth of each sleeve since the start of its period
+    growth = 1 + invested_returns
+    growth[starts] = 1.0
+    invested_growth = pd.Series(growth).groupby(segment).cumprod().to_numpy()
+    cash_growth = (1 + daily_cash_return) ** (np.arange(n) - starts[segment])
+
+    # Starting values of each period follow from the previous period's end total
+    ends = np.append(starts[1:] - 1, n - 1)
+    invested_start = np.empty(len(starts))
+    cash_start = np.empty(len(starts))
+    invested_start[0], cash_start[0] = initial_invested, initial_cash
+    for p in range(1, len(starts)):
+        total_value = invested_start[p-1] * invested_growth[ends[p-1]] + cash_start[p-1] * cash_growth[ends[p-1]]
+        invested_start[p] = total_value * (1 - cash_fraction)
+        cash_start[p] = total_value * cash_fraction
+
+    total = invested_start[segment] * invested_growth + cash_start[segment] * cash_growth
+    return pd.Series(total, index=index, name='total')
+
+
+def run_portfolio_analysis(initial_capital=100000, use_cache=True, plots=True, plots_only=False, plot_workers=None,
+                           report_path=None, data_dir=None):
+    """
+    Builds the portfolio equity of every strategy, writes portfolio_report.md
+    (or `report_path`) and then renders the plots as a separate stage (see
+    main.main for the plots / plots_only / plot_workers / data_dir options).
+    Stage timings go to PROFILER when it is enabled (see --profile).
+    """
+    lap = PROFILER.laps('portfolio')
     project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-    data_dir = os.path.join(project_root, 'stockData')
+    data_dir = data_dir or os.path.join(project_root, 'stockData')
     
     plots_dir = os.path.join(os.path.dirname(__file__), 'plots', 'portfolios')
     os.makedirs(plots_dir, exist_ok=True)
     
-    stock_files = [f for f in os.listdir(data_dir) if f.endswith('.csv')]
+    stock_files = ticker_files(data_dir)
     stock_symbols = [f.split('_')[0] for f in stock_files]
     num_stocks = len(stock_files)
     
@@ -118,21 +160,20 @@ def run_portfolio_analysis(initial_capital=100000):
     capital_per_stock = invested_capital / num_stocks if num_stocks > 0 else 0
 
     portfolio_results = {}
+    plot_jobs = []
 
     common_index = None
     all_stock_data = {}
     for filename in stock_files:
-        data = pd.read_csv(os.path.join(data_dir, filename), index_col='Date', parse_dates=True)
-        data.index = pd.to_datetime(data.index, utc=True).tz_localize(None)
-        start_date = START_DATE
-        end_date = END_DATE
-        data = data[(data.index >= start_date) & (data.index <= end_date)]
+        data = load_ohlcv(os.path.join(data_dir, filename), START_DATE, END_DATE)
         all_stock_data[filename] = data
         if common_index is None:
             common_index = data.index
         else:
             common_index = common_index.union(data.index)
 
+    lap('data_load')
+
     analysis_start_date = common_index.min().strftime('%Y-%m-%d')
     analysis_end_date = common_index.max().strftime('%Y-%m-%d')
     
@@ -181,17 +222,18 @@ def run_portfolio_analysis(initial_capital=100000):
             
             if Rebalance_Portfolio_Yearly and Percent_Cash_Portfolio > 0:
                 buy_and_hold_portfolio_equity = run_rebalancing_simulation(
-                    buy_and_hold_invested_equity, invested_capital, initial_cash_position, daily_cash_return
+                    buy_and_hold_invested_equity, invested_capital, initial_cash_position, daily_cash_return,
+                    frequency=Rebalance_Frequency
                 )
             else:
                 cash_equity_curve = pd.Series(daily_cash_return, index=common_index).add(1).cumprod() * initial_cash_position
                 buy_and_hold_portfolio_equity = buy_and_hold_invested_equity.add(cash_equity_curve, fill_value=initial_cash_position)
 
-            plot_portfolio_equity(
-                portfolio_equity=buy_and_hold_portfolio_equity, 
-                strat_name='Buy and Hold', strat_params={}, plots_dir=plots_dir, initial_capital=initial_capital,
+            plot_jobs.append(portfolio_plot_job(
+                plots_dir, 'Buy and Hold', {},
+                portfolio_equity=buy_and_hold_portfolio_equity, initial_capital=initial_capital,
                 pure_buy_and_hold_equity=pure_buy_and_hold_equity
-            )
+            ))
 
             final_val = buy_and_hold_portfolio_equity.iloc[-1]
             cagr = ((final_val / initial_capital)**(1/num_years) - 1) * 100
@@ -206,38 +248,50 @@ def run_portfolio_analysis(initial_capital=100000):
                 'Max Drawdown [%]': max_dd
             }
 
-    for strat_name, strat_class_lambda in STRATEGIES:
+    lap('buy_and_hold')
+
+    # Results of main.py's runs are reused (rescaled to capital_per_stock) when cached
+    cache = ResultCache() if use_cache else False
+    for strat_name, strat_spec in STRATEGIES:
         print(f"Analyzing portfolio for strategy: {strat_name}...")
         all_equity_curves = []
         
-        temp_strat_instance = strat_class_lambda()
+        temp_strat_instance = strat_spec()
         strat_params = temp_strat_instance.__dict__
 
-        for filename, data in all_stock_data.items():
-            if data.empty: continue
-            strategy_instance = strat_class_lambda()
-            engine = BacktestEngine(data, strategy_instance, initial_cash=capital_per_stock)
-            _, equity_curve_raw = engine.run()
-            equity_curve = pd.Series(equity_curve_raw.values[1:], index=data.index)
-            reindexed_curve = equity_curve.reindex(common_index, method='ffill').fillna(capital_per_stock)
-            all_equity_curves.append(reindexed_curve)
+        if Portfolio_Shared_Cash:
+            # One pass over all stocks; idle cash in one position can fund another
+            portfolio_data = {filename: data for filename, data in all_stock_data.items() if not data.empty}
+            max_position_perc = Max_Position_Perc if Max_Position_Perc is not None else 1 / num_stocks
+            _, shared_equity = PortfolioEngine(portfolio_data, strat_spec(), initial_cash=invested_capital,
+                                               max_positions=Max_Positions, max_position_perc=max_position_perc).run()
+            all_equity_curves.append(shared_equity)
+        else:
+            for filename, data in all_stock_data.items():
+                if data.empty: continue
+                _, equity_curve_raw = run_cached(data, strat_spec, initial_cash=capital_per_stock, cache=cache)
+                equity_curve = pd.Series(equity_curve_raw.values[1:], index=data.index)
+                reindexed_curve = equity_curve.reindex(common_index, method='ffill').fillna(capital_per_stock)
+                all_equity_curves.append(reindexed_curve)
 
         if all_equity_curves:
             invested_portfolio_equity = pd.concat(all_equity_curves, axis=1).sum(axis=1)
             
             if Rebalance_Portfolio_Yearly and Percent_Cash_Portfolio > 0:
                 total_portfolio_equity = run_rebalancing_simulation(
-                    invested_portfolio_equity, invested_capital, initial_cash_position, daily_cash_return
+                    invested_portfolio_equity, invested_capital, initial_cash_position, daily_cash_return,
+                    frequency=Rebalance_Frequency
                 )
             else:
                 cash_equity_curve = pd.Series(daily_cash_return, index=common_index).add(1).cumprod() * initial_cash_position
                 total_portfolio_equity = invested_portfolio_equity.add(cash_equity_curve, fill_value=initial_cash_position)
             
-            plot_portfolio_equity(
-                portfolio_equity=total_portfolio_equity, strat_name=strat_name, strat_params=strat_params, plots_dir=plots_dir, initial_capital=initial_capital,
+            plot_jobs.append(portfolio_plot_job(
+                plots_dir, strat_name, strat_params,
+                portfolio_equity=total_portfolio_equity, initial_capital=initial_capital,
                 buy_and_hold_equity=buy_and_hold_portfolio_equity,
                 pure_buy_and_hold_equity=pure_buy_and_hold_equity
-            )
+            ))
 
             final_val = total_portfolio_equity.iloc[-1]
             cagr = ((final_val / initial_capital)**(1/num_years) - 1) * 100
@@ -258,6 +312,13 @@ def run_portfolio_analysis(initial_capital=100000):
                 'Max Drawdown [%]': 0
             }
 
+    lap('strategies')
+
+    if plots_only:
+        render_plots(plot_jobs, plots_dir, workers=plot_workers)
+        lap('plotting')
+        return
+
     # --- Generate and Save Report ---
     print("\n--- Portfolio Analysis Results ---")
     results_df = pd.DataFrame.from_dict(portfolio_results, orient='index')
@@ -284,7 +345,7 @@ def run_portfolio_analysis(initial_capital=100000):
 
     print(report_content)
 
-    report_path = os.path.join(os.path.dirname(__file__), 'portfolio_report.md')
+    report_path = report_path or os.path.join(os.path.dirname(__file__), 'portfolio_report.md')
     today_str = date.today().strftime('%Y-%m-%d')
 
     # --- Robust file writing with error handling ---
@@ -297,7 +358,7 @@ def run_portfolio_analysis(initial_capital=100000):
             f.write("### Portfolio Allocation Strategy\n")
             f.write(f"- **Target Cash Allocation:** {Percent_Cash_Portfolio:.1%}\n")
             f.write(f"- **Assumed Cash Annual Return:** {Cash_Yearly_Rtn:.1%}\n")
-            f.write(f"- **Annual Rebalancing:** {'Yes' if Rebalance_Portfolio_Yearly and Percent_Cash_Portfolio > 0 else 'No (Static Allocation)'}\n\n")
+            f.write(f"- **Rebalancing:** {Rebalance_Frequency.capitalize() if Rebalance_Portfolio_Yearly and Percent_Cash_Portfolio > 0 else 'No (Static Allocation)'}\n\n")
             f.write(f"**Portfolio Stocks ({num_stocks} total):** {', '.join(stock_symbols)}\n\n")
             f.write(report_content)
         print(f"\nReport successfully saved to {report_path}")
@@ -306,7 +367,34 @@ def run_portfolio_analysis(initial_capital=100000):
         print(f"Path: {report_path}")
         print(f"Reason: {e}")
         print("\nPlease check file permissions or if the file is locked by another program.")
+    lap('report')
+
+    if plots:
+        render_plots(plot_jobs, plots_dir, workers=plot_workers)
+        lap('plotting')
 
 
 if __name__ == '__main__':
-    run_portfolio_analysis()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Analyze every strategy in STRATEGIES as an equal-weight portfolio.')
+    parser.add_argument('--no-cache', action='store_true', help='Re-run every backtest instead of using the result cache')
+    plot_mode = parser.add_mutually_exclusive_group()
+    plot_mode.add_argument('--no-plots', action='store_true', help='Skip rendering the portfolio plots')
+    plot_mode.add_argument('--plots-only', action='store_true', help='Only render the portfolio plots, without rewriting the report')
+    parser.add_argument('--plot-workers', type=int, default=None,
+                        help='Number of processes for rendering plots (default: all cores)')
+    parser.add_argument('--data-dir', default=None,
+                        help='Directory of ticker CSVs to use instead of stockData (e.g. from synthetic_data.py)')
+    parser.add_argument('--profile', nargs='?', const='portfolio_profile.json', default=None, metavar='PATH',
+                        help='Time each stage and engine phase, print the breakdown and write it as JSON to PATH (default: portfolio_profile.json)')
+    parser.add_argument('--cprofile', default=None, metavar='PATH',
+                        help='Also run under cProfile and dump the pstats to PATH')
+    args = parser.parse_args()
+    if args.profile:
+        enable_profiling()
+    with cprofile(args.cprofile):
+        run_portfolio_analysis(use_cache=not args.no_cache, plots=not args.no_plots,
+                               plots_only=args.plots_only, plot_workers=args.plot_workers, data_dir=args.data_dir)
+    if args.profile:
+        print(PROFILER.report())
+        PROFILER.write_json(args.profile)
+        print(f"Profile written to {args.profile}")
\ No newline at end of file
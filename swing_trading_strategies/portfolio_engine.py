@@ -0,0 +1,272 @@
+import heapq
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(__file__))
+from custom_backtest_engine import (BarData, VectorizedBacktestEngine, resolve_exits, _EXIT_BATCH,
+                                    EXIT_FORCED, EXIT_STOP, EXIT_TARGET, EXIT_SIGNAL)
+
+# --- Portfolio Engine ---
+
+class PortfolioEngine:
+    """
+    Backtests one strategy (or one per ticker) across several tickers in a
+    single pass over an aligned (dates x tickers) calendar with a shared cash
+    pool, instead of N independent runs with fixed capital per ticker.
+
+    Strategies must be vectorized: their SignalArrays are computed on each
+    ticker's own bars and mapped onto the union calendar. Exits do not depend
+    on cash, so each position's exit is resolved with resolve_exits when it
+    opens and only calendar rows with an entry signal or a scheduled exit are
+    visited. On those rows exits, pyramid adds and new entries are applied in
+    ticker order, sized from the portfolio equity at that row:
+      - a buy targets equity * size_perc, capped by `max_position_perc` of
+        equity per ticker and by the cash available (no margin);
+      - at most `max_positions` tickers are held at once;
+      - a position still open on its ticker's last bar is closed there, so
+        a ticker whose data ends early frees its cash and slot.
+    Exits, stops and pyramiding follow the single-ticker engines, so a
+    one-ticker portfolio reproduces BacktestEngine's trades as long as its
+    pyramid adds fit in the cash (the single-ticker engines let cash go
+    negative there).
+
+    run() returns (trades, equity): the trades DataFrame of the single-ticker
+    engines with a leading 'ticker' column, and the portfolio equity after
+    each calendar date's trades.
+    """
+    def __init__(self, data, strategy, initial_cash=100000, max_positions=None, max_position_perc=None):
+        self.tickers = list(data)
+        self.data = data
+        self.strategies = strategy if isinstance(strategy, dict) else {t: strategy for t in self.tickers}
+        self.initial_cash = initial_cash
+        self.max_positions = max_positions
+        self.max_position_perc = max_position_perc
+
+    def _prepare(self):
+        """Prepares each ticker's bars and signal arrays and maps them onto the union calendar."""
+        legs = []
+        for ticker in self.tickers:
+            strategy = self.strategies[ticker]
+            if not strategy.vectorized:
+                raise ValueError(f"PortfolioEngine needs vectorized strategies; {type(strategy).__name__} is not")
+            frame = self.data[ticker]
+            bars = strategy.prepare(frame if isinstance(frame, BarData) else frame.reset_index())
+            legs.append((bars, strategy.signal_arrays(bars)))
+
+        calendar = np.unique(np.concatenate([bars.date_values for bars, _ in legs]))
+        shape = (len(calendar), len(legs))
+        close = np.full(shape, np.nan)
+        entries = np.zeros(shape, dtype=bool)
+        local = np.full(shape, -1, dtype=np.int64)
+        rows = []
+        for k, (bars, sig) in enumerate(legs):
+            leg_rows = np.searchsorted(calendar, bars.date_values)
+            close[leg_rows, k] = bars.close
+            entries[leg_rows, k] = sig.entries
+            local[leg_rows, k] = np.arange(len(bars))
+            rows.append(leg_rows)
+        # Last known close per ticker (0 before its first bar) for marking positions to market
+        marks = pd.DataFrame(close).ffill().fillna(0.0).to_numpy()
+        return calendar, legs, rows, close, marks, entries, local
+
+    def run(self):
+        calendar, legs, rows, close, marks, entries, local = self._prepare()
+        n_dates, n_tickers = close.shape
+        params = [self._leg_params(sig) for _, sig in legs]
+        exit_cache = [{} for _ in legs]
+
+        def scheduled_exit(k, e):
+            """(calendar row, code) of the exit for an entry at local bar e; a forced close on the ticker's last row if none."""
+            cache = exit_cache[k]
+            if e not in cache:
+                # Resolve this and the next few entry candidates of the ticker together
+                bars, sig = legs[k]
+                candidates = params[k]['candidates']
+                batch = candidates[np.searchsorted(candidates, e):][:_EXIT_BATCH]
+                exit_bars, exit_codes = resolve_exits(
+                    bars.close, batch, self._initial_stops(sig, bars, batch), self._targets(sig, bars.close[batch]),
+                    params[k]['exits'], sig.tp_first, bars.high, sig.trailing_stop)
+                cache.update(zip(batch.tolist(), zip(exit_bars.tolist(), exit_codes.tolist())))
+            exit_bar, code = cache[e]
+            return (int(rows[k][exit_bar]), code) if exit_bar >= 0 else (int(rows[k][-1]), EXIT_FORCED)
+
+        # Rows with entry signals, and the tickers signalling on each (in ticker order)
+        signal_rows, signal_tickers = np.nonzero(entries)
+        signals_by_row = {}
+        for t, k in zip(signal_rows.tolist(), signal_tickers.tolist()):
+            signals_by_row.setdefault(t, []).append(k)
+        pending_rows = sorted(signals_by_row)
+        exit_heap = []  # (row, ticker) of scheduled exits
+        # Tickers by the calendar row of their last bar, where open positions are force-closed
+        ends_by_row = {}
+        for k in range(n_tickers):
+            if len(rows[k]):
+                ends_by_row.setdefault(int(rows[k][-1]), []).append(k)
+
+        held = [False] * n_tickers
+        shares = np.zeros(n_tickers)
+        avg_price = [0.0] * n_tickers
+        count = [0] * n_tickers
+        entry_row = [0] * n_tickers
+        first_price = [0.0] * n_tickers
+        exit_row = [-1] * n_tickers
+        exit_code = [EXIT_FORCED] * n_tickers
+        n_held = 0
+
+        cash = self.initial_cash
+        trades = []
+        # (row, ticker, share change, cash change) for rebuilding the equity curve
+        changes = []
+
+        def buy_value(k, equity, price):
+            value = equity * params[k]['size_perc']
+            if self.max_position_perc is not None:
+                value = min(value, equity * self.max_position_perc - shares[k] * price)
+            return min(value, cash)
+
+        i = 0
+        while i < len(pending_rows) or exit_heap:
+            if exit_heap and (i == len(pending_rows) or exit_heap[0][0] <= pending_rows[i]):
+                t = exit_heap[0][0]
+            else:
+                t = pending_rows[i]
+            if i < len(pending_rows) and pending_rows[i] == t:
+                i += 1
+            equity = cash + shares @ marks[t]
+
+            # --- Exits ---
+            exited = set()
+            while exit_heap and exit_heap[0][0] == t:
+                _, k = heapq.heappop(exit_heap)
+                if not held[k] or exit_row[k] != t or exit_code[k] == EXIT_FORCED:
+                    continue  # superseded by a later reschedule, or closed after this row's signals below
+                price = close[t, k]
+                cash += shares[k] * price
+                trades.append((k, entry_row[k], t, avg_price[k], price, shares[k], exit_code[k]))
+                changes.append((t, k, -shares[k], shares[k] * price))
+                shares[k] = 0.0
+                held[k] = False
+                n_held -= 1
+                exited.add(k)
+
+            signalling = signals_by_row.get(t, ())
+            # --- Pyramid adds ---
+            for k in signalling:
+                leg = params[k]
+                if not held[k] or count[k] >= leg['max_pyramids']:
+                    continue
+                price = close[t, k]
+                if (price - avg_price[k]) / avg_price[k] < leg['pyramid_profit_perc']:
+                    continue
+                value = buy_value(k, equity, price)
+                if value <= 0:
+                    continue
+                new_shares = value / price
+                new_total = shares[k] + new_shares
+                avg_price[k] = ((avg_price[k] * shares[k]) + (price * new_shares)) / new_total
+                shares[k] = new_total
+                cash -= new_shares * price
+                changes.append((t, k, new_shares, -new_shares * price))
+                count[k] += 1
+                if leg['stop_after_pyramid'] is not None:
+                    bars, sig = legs[k]
+                    exit_bars, exit_codes = resolve_exits(
+                        bars.close, local[t, k:k + 1], np.array([leg['stop_after_pyramid']], dtype=np.float64),
+                        self._targets(sig, np.array([first_price[k]])), leg['exits'], sig.tp_first)
+                    if exit_bars[0] >= 0:
+                        exit_row[k], exit_code[k] = int(rows[k][exit_bars[0]]), int(exit_codes[0])
+                    else:
+                        exit_row[k], exit_code[k] = int(rows[k][-1]), EXIT_FORCED
+                    if exit_row[k] > t:
+                        heapq.heappush(exit_heap, (exit_row[k], k))
+
+            # --- Entries (not on a ticker's exit bar) ---
+            for k in signalling:
+                if held[k] or k in exited:
+                    continue
+                if self.max_positions is not None and n_held >= self.max_positions:
+                    break
+                price = close[t, k]
+                value = buy_value(k, equity, price)
+                if value <= 0:
+                    continue
+                shares[k] = value / price
+                cash -= shares[k] * price
+                changes.append((t, k, shares[k], -shares[k] * price))
+                held[k] = True
+                n_held += 1
+                avg_price[k] = first_price[k] = price
+                count[k] = 1
+                entry_row[k] = t
+                exit_row[k], exit_code[k] = scheduled_exit(k, int(local[t, k]))
+                if exit_row[k] > t:
+                    heapq.heappush(exit_heap, (exit_row[k], k))
+
+            # --- Forced close of positions in tickers whose data ends on this row ---
+            # (after the row's signals, as the single-ticker engines close on their last bar;
+            # this frees the cash and the position slot for the rest of the calendar)
+            for k in ends_by_row.get(t, ()):
+                if not held[k]:
+                    continue
+                price = close[t, k]
+                cash += shares[k] * price
+                trades.append((k, entry_row[k], t, avg_price[k], price, shares[k], EXIT_FORCED))
+                changes.append((t, k, -shares[k], shares[k] * price))
+                shares[k] = 0.0
+                held[k] = False
+                n_held -= 1
+
+        # --- Equity curve ---
+        share_changes = np.zeros((n_dates, n_tickers))
+        cash_changes = np.zeros(n_dates)
+        if changes:
+            t_idx, k_idx, d_shares, d_cash = (np.array(c) for c in zip(*changes))
+            np.add.at(share_changes, (t_idx.astype(np.int64), k_idx.astype(np.int64)), d_shares)
+            np.add.at(cash_changes, t_idx.astype(np.int64), d_cash)
+        holdings = np.cumsum(share_changes, axis=0)
+        equity_curve = self.initial_cash + np.cumsum(cash_changes) + np.einsum('ij,ij->i', holdings, marks)
+        if n_dates:
+            equity_curve[-1] = cash
+        equity = pd.Series(equity_curve, index=pd.DatetimeIndex(calendar, name='Date'))
+
+        if not trades:
+            return pd.DataFrame([]), equity
+        trades.sort(key=lambda trade: (trade[2], trade[0]))
+        k, entry_rows, exit_rows, entry_prices, exit_prices, sizes, codes = (np.array(c) for c in zip(*trades))
+        pnl = (exit_prices - entry_prices) * sizes
+        entry_dates, exit_dates = calendar[entry_rows], calendar[exit_rows]
+        trades = pd.DataFrame({
+            'ticker': [self.tickers[i] for i in k],
+            'entry_date': entry_dates,
+            'entry_price': entry_prices,
+            'exit_date': exit_dates,
+            'exit_price': exit_prices,
+            'size': sizes,
+            'pnl': pnl,
+            'return_pct': pnl / (entry_prices * sizes) * 100,
+            'duration': (exit_dates - entry_dates) // np.timedelta64(1, 'D'),
+            'exit_reason': [self._reason(legs[i][1], c) for i, c in zip(k, codes)],
+        })
+        return trades, equity
+
+    @staticmethod
+    def _leg_params(sig):
+        can_pyramid = sig.max_pyramids > 1 and sig.pyramid_profit_perc is not None
+        return {
+            'candidates': np.flatnonzero(sig.entries),
+            'exits': np.asarray(sig.exits, dtype=bool) if sig.exits is not None else None,
+            'size_perc': sig.size_perc or 1.0,
+            'max_pyramids': sig.max_pyramids if can_pyramid else 1,
+            'pyramid_profit_perc': sig.pyramid_profit_perc if can_pyramid else None,
+            'stop_after_pyramid': sig.stop_after_pyramid if can_pyramid and sig.trailing_stop is None else None,
+        }
+
+    @staticmethod
+    def _reason(sig, code):
+        return {EXIT_FORCED: 'forced_close', EXIT_STOP: sig.stop_reason,
+                EXIT_TARGET: sig.tp_reason, EXIT_SIGNAL: sig.exit_reason}[code]
+
+    _initial_stops = VectorizedBacktestEngine._initial_stops
+    _targets = VectorizedBacktestEngine._targets
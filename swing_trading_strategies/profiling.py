@@ -0,0 +1,154 @@
+import cProfile
+import json
+import time
+from contextlib import contextmanager
+
+# Built-in instrumentation for the pipeline. PROFILER collects named timers
+# (total seconds and calls) and counters; it is disabled by default, and the
+# engines and stages only check PROFILER.enabled once per run or stage, so
+# the hooks cost nothing measurable when it is off. main.py and
+# portfolio_analyzer.py enable it with --profile and write summary() as JSON;
+# --cprofile additionally dumps a cProfile/pstats file of the whole run.
+#
+# The engines import this as the top-level module `profiling`; code that
+# reads PROFILER should import it the same way so there is one instance.
+
+class _TimedCall:
+    """Wraps a function, accumulating the time spent in it and the number of calls."""
+    def __init__(self, func):
+        self.func = func
+        self.seconds = 0.0
+        self.calls = 0
+
+    def __call__(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self.func(*args, **kwargs)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.calls += 1
+
+def _no_lap(name):
+    pass
+
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.reset()
+
+    def reset(self):
+        self.timers = {}    # name -> [seconds, calls]
+        self.counters = {}  # name -> count
+
+    def add(self, name, seconds, calls=1):
+        timer = self.timers.setdefault(name, [0.0, 0])
+        timer[0] += seconds
+        timer[1] += calls
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    @contextmanager
+    def stage(self, name):
+        """Times the body of a with-block as timer `name` (when enabled)."""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def laps(self, prefix):
+        """
+        A lap timer for consecutive stages of one function: each lap(name)
+        call records the time since the previous call (or since laps()) as
+        timer f'{prefix}.{name}'. Returns a no-op when disabled.
+        """
+        if not self.enabled:
+            return _no_lap
+        last = [time.perf_counter()]
+        def lap(name):
+            now = time.perf_counter()
+            self.add(f'{prefix}.{name}', now - last[0])
+            last[0] = now
+        return lap
+
+    def timed(self, func):
+        """`func` wrapped to accumulate its time in .seconds and .calls."""
+        return _TimedCall(func)
+
+    def record_run(self, engine, bars, trades, **phases):
+        """Adds one engine run: a timer per phase, plus run, bar and trade counters."""
+        for phase, seconds in phases.items():
+            self.add(f'{engine}.{phase}', seconds)
+        self.count(f'{engine}.runs')
+        self.count(f'{engine}.bars', bars)
+        self.count(f'{engine}.trades', trades)
+
+    # --- Collecting ---
+
+    def take(self):
+        """Returns the timers and counters as plain data and resets them (for worker processes)."""
+        snapshot = {'timers': self.timers, 'counters': self.counters}
+        self.reset()
+        return snapshot
+
+    def merge(self, snapshot):
+        for name, (seconds, calls) in snapshot['timers'].items():
+            self.add(name, seconds, calls)
+        for name, n in snapshot['counters'].items():
+            self.count(name, n)
+
+    def summary(self):
+        """
+        {'timers': {name: {'seconds', 'calls'}}, 'counters': {...}, 'rates': {...}},
+        where rates holds bars per second for each engine that recorded runs.
+        """
+        rates = {}
+        for name, bars in self.counters.items():
+            if name.endswith('.bars'):
+                engine = name[:-len('.bars')]
+                seconds = sum(t[0] for timer, t in self.timers.items() if timer.startswith(f'{engine}.'))
+                if seconds > 0:
+                    rates[f'{engine}.bars_per_sec'] = bars / seconds
+        return {
+            'timers': {name: {'seconds': seconds, 'calls': calls} for name, (seconds, calls) in sorted(self.timers.items())},
+            'counters': dict(sorted(self.counters.items())),
+            'rates': rates,
+        }
+
+    def write_json(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def report(self):
+        """The summary as text: timers sorted by time, then counters and rates."""
+        summary = self.summary()
+        lines = [f"{'Timer':<40} {'Seconds':>10} {'Calls':>10}"]
+        for name, timer in sorted(summary['timers'].items(), key=lambda item: -item[1]['seconds']):
+            lines.append(f"{name:<40} {timer['seconds']:>10.3f} {timer['calls']:>10}")
+        for name, value in {**summary['counters'], **summary['rates']}.items():
+            lines.append(f"{name:<40} {value:>10,.0f}")
+        return '\n'.join(lines)
+
+PROFILER = Profiler()
+
+def enable():
+    """Enables PROFILER (module-level so it can be a worker-process initializer)."""
+    PROFILER.enabled = True
+
+@contextmanager
+def cprofile(path):
+    """Runs the with-block under cProfile and dumps the pstats to `path`; does nothing if path is None."""
+    if path is None:
+        yield
+        return
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        profile.dump_stats(path)
@@ -2,12 +2,16 @@ import pandas as pd
 from datetime import date
 from config import START_DATE, END_DATE
 
-def generate_report(results_file):
-
-
+def generate_report(results_file, summary_csv_path=None, report_path=None, trade_log_path=None):
+    """
+    Writes swing_trading_report.md from backtest_summary.csv. The paths default
+    to the files main.py writes; benchmark.py points them at a scratch directory.
+    Zero-trade warnings are also appended to `trade_log_path` when one is given
+    (main.py passes its trade_logs.txt export).
+    """
     import os
     # Always use the subdirectory for results
-    summary_csv_path = os.path.join(os.path.dirname(__file__), 'backtest_summary.csv')
+    summary_csv_path = summary_csv_path or os.path.join(os.path.dirname(__file__), 'backtest_summary.csv')
     if not os.path.exists(summary_csv_path):
         raise FileNotFoundError('backtest_summary.csv not found. Please run the backtester first.')
     df = pd.read_csv(summary_csv_path)
@@ -31,12 +35,12 @@ def generate_report(results_file):
             for strat in zero_trade_strategies:
                 print(f"  - {strat}")
 
-            # Write warning to trade_logs.txt
-            trade_log_path = os.path.join(os.path.dirname(__file__), 'trade_logs.txt')
-            with open(trade_log_path, 'a') as logf:
-                logf.write("Warning: The following strategies have zero trades:\n")
-                for strat in zero_trade_strategies:
-                    logf.write(f"  - {strat}\n")
+            # Write warning to the text trade log, if one was exported
+            if trade_log_path:
+                with open(trade_log_path, 'a') as logf:
+                    logf.write("Warning: The following strategies have zero trades:\n")
+                    for strat in zero_trade_strategies:
+                        logf.write(f"  - {strat}\n")
 
     
 
@@ -115,7 +119,7 @@ The winning strategy is **{winner}** with a Sharpe Ratio of {winner_sharpe}.
             winner_description="No winning strategy found."
         )
 
-    report_path = os.path.join(os.path.dirname(__file__), '..', 'swing_trading_report.md')
+    report_path = report_path or os.path.join(os.path.dirname(__file__), '..', 'swing_trading_report.md')
     with open(report_path, 'w') as f:
         f.write(report)
 
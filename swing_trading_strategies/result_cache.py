@@ -0,0 +1,144 @@
+import hashlib
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(__file__))
+from custom_backtest_engine import create_engine
+
+# On-disk memoization of backtest results. Entries are keyed by the content of
+# the price data, the strategy spec, the date range and the engine source, so
+# main.py and portfolio_analyzer.py share results for the same runs. The cash
+# amount is not part of the key: every strategy sizes positions as a fraction
+# of equity, so trades and equity scale linearly with the starting cash and a
+# cached run is rescaled instead of re-run.
+
+CACHE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '.result_cache'))
+MAX_CACHE_BYTES = 512 * 1024 * 1024
+_ENGINE_SOURCES = [os.path.join(os.path.dirname(__file__), name) for name in ('custom_backtest_engine.py', 'indicators.py')]
+_engine_version = None
+
+def engine_version():
+    """Hash of the engine/strategy source, so any change to it invalidates the cache."""
+    global _engine_version
+    if _engine_version is None:
+        digest = hashlib.sha1()
+        for path in _ENGINE_SOURCES:
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+        _engine_version = digest.hexdigest()[:16]
+    return _engine_version
+
+def data_fingerprint(data):
+    digest = hashlib.sha1()
+    index = data['Date'] if 'Date' in data.columns else data.index
+    digest.update(np.asarray(index, dtype='datetime64[ns]').view(np.int64).tobytes())
+    for column in data.columns:
+        if column != 'Date':
+            digest.update(column.encode())
+            digest.update(np.ascontiguousarray(data[column].to_numpy(dtype=np.float64)).tobytes())
+    return digest.hexdigest()
+
+class ResultCache:
+    """
+    Stores (trades, equity_curve) per key as a pickle in `cache_dir`. File
+    mtimes track use: hits touch the entry, and when the directory grows past
+    `max_bytes` the least recently used entries are deleted.
+    """
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._total_bytes = None  # running estimate, so puts don't rescan the directory
+
+    def key(self, data, strategy_spec):
+        index = data['Date'] if 'Date' in data.columns else data.index
+        date_range = f'{index[0]}..{index[-1]}' if len(index) else 'empty'
+        parts = [data_fingerprint(data), strategy_spec.key(), date_range, engine_version()]
+        return hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.pkl')
+
+    def get(self, key, initial_cash):
+        """Returns (trades, equity_curve) scaled to `initial_cash`, or None on a miss."""
+        path = self._path(key)
+        try:
+            entry = pd.read_pickle(path)
+            os.utime(path)
+        except (OSError, EOFError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        trades, equity_curve = entry['trades'], entry['equity_curve']
+        if initial_cash != entry['initial_cash']:
+            scale = initial_cash / entry['initial_cash']
+            equity_curve = equity_curve * scale
+            if not trades.empty:
+                trades = trades.copy()
+                trades['size'] *= scale
+                trades['pnl'] *= scale
+        return trades, equity_curve
+
+    def put(self, key, trades, equity_curve, initial_cash):
+        path = self._path(key)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            pd.to_pickle({'trades': trades, 'equity_curve': equity_curve, 'initial_cash': initial_cash}, tmp_path)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        if self._total_bytes is None:
+            self.evict()
+        else:
+            self._total_bytes += os.path.getsize(path)
+            if self._total_bytes > self.max_bytes:
+                self.evict()
+
+    def evict(self):
+        """Deletes least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.pkl'):
+                try:
+                    stat = os.stat(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._total_bytes = total
+
+    def clear(self):
+        if os.path.isdir(self.cache_dir):
+            for name in os.listdir(self.cache_dir):
+                if name.endswith('.pkl'):
+                    os.remove(os.path.join(self.cache_dir, name))
+
+def run_cached(data, strategy_spec, initial_cash=100000, cache=None):
+    """
+    create_engine(data, strategy_spec(), initial_cash).run(), memoized in `cache`
+    (the default ResultCache if None, or no caching if False).
+    """
+    if cache is False:
+        return create_engine(data, strategy_spec(), initial_cash=initial_cash).run()
+    cache = cache or ResultCache()
+    key = cache.key(data, strategy_spec)
+    cached = cache.get(key, initial_cash)
+    if cached is not None:
+        return cached
+    trades, equity_curve = create_engine(data, strategy_spec(), initial_cash=initial_cash).run()
+    cache.put(key, trades, equity_curve, initial_cash)
+    return trades, equity_curve
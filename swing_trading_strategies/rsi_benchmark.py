@@ -0,0 +1,53 @@
+import os
+import sys
+import time
+import pandas as pd
+
+sys.path.append(os.path.dirname(__file__))
+from custom_backtest_engine import BacktestEngine, RsiMomentumStrategy, IncrementalRsi
+from data_loader import load_ohlcv
+
+# Benchmarks RsiMomentumStrategy on growing slices of the AAPL history. With the
+# RSI computed once per series the time per bar should stay flat as the history
+# grows; the old per-bar recomputation grew linearly per bar (quadratic overall).
+
+HISTORY_LENGTHS = [1000, 2000, 4000, 8000, None]  # None = full file
+
+def time_call(func, repeats=3):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def run_benchmark(csv_path):
+    data = load_ohlcv(csv_path)
+
+    rows = []
+    for length in HISTORY_LENGTHS:
+        subset = data if length is None else data.iloc[:length]
+        for method in ('simple', 'wilder'):
+            strat = RsiMomentumStrategy(rsi_method=method)
+            engine_time = time_call(lambda: BacktestEngine(subset, strat).run())
+
+            closes = subset['Close'].tolist()
+            def stream():
+                rsi = IncrementalRsi(strat.rsi_period, method)
+                for close in closes:
+                    rsi.update(close)
+            stream_time = time_call(stream)
+
+            rows.append({
+                'Bars': len(subset),
+                'Method': method,
+                'Engine [s]': engine_time,
+                'Engine [us/bar]': engine_time / len(subset) * 1e6,
+                'Incremental [us/bar]': stream_time / len(subset) * 1e6,
+            })
+    return pd.DataFrame(rows)
+
+if __name__ == '__main__':
+    csv_path = os.path.join(os.path.dirname(__file__), '..', 'stockData', 'AAPL_1d.csv')
+    results = run_benchmark(csv_path)
+    print(results.to_string(index=False, float_format=lambda x: f'{x:.3f}'))
@@ -0,0 +1,79 @@
+import hashlib
+import importlib
+import json
+import os
+import sys
+from dataclasses import dataclass
+
+sys.path.append(os.path.dirname(__file__))
+
+# Short class names in a spec resolve against this module.
+DEFAULT_MODULE = 'custom_backtest_engine'
+_PACKAGE_PREFIX = 'swing_trading_strategies.'
+
+def _class_path(strategy_class):
+    """
+    Normalizes a class or dotted path to 'module.ClassName'. The package prefix
+    is dropped so a strategy imported as swing_trading_strategies.x or as x gets
+    the same path (and therefore the same key).
+    """
+    if isinstance(strategy_class, type):
+        strategy_class = f'{strategy_class.__module__}.{strategy_class.__qualname__}'
+    if '.' not in strategy_class:
+        strategy_class = f'{DEFAULT_MODULE}.{strategy_class}'
+    if strategy_class.startswith(_PACKAGE_PREFIX):
+        strategy_class = strategy_class[len(_PACKAGE_PREFIX):]
+    return strategy_class
+
+@dataclass(frozen=True)
+class StrategySpec:
+    """
+    Declarative description of a strategy: a class path plus frozen constructor
+    parameters. Unlike a lambda factory it pickles (so it can be sent to worker
+    processes), hashes, and has a stable key() for caching results.
+    Calling the spec builds a fresh strategy instance.
+    """
+    class_path: str
+    params: tuple = ()
+
+    @classmethod
+    def create(cls, strategy_class, **params):
+        return cls(_class_path(strategy_class), tuple(sorted(params.items())))
+
+    @classmethod
+    def from_dict(cls, entry):
+        return cls.create(entry['strategy'], **entry.get('params', {}))
+
+    def to_dict(self):
+        return {'strategy': self.class_path, 'params': dict(self.params)}
+
+    @property
+    def kwargs(self):
+        return dict(self.params)
+
+    @property
+    def strategy_class(self):
+        module_name, _, class_name = self.class_path.rpartition('.')
+        return getattr(importlib.import_module(module_name), class_name)
+
+    def __call__(self):
+        return self.strategy_class(**self.kwargs)
+
+    def key(self):
+        """Stable content hash of the class path and parameters."""
+        payload = json.dumps([self.class_path, self.params], sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+def load_strategy_specs(path):
+    """
+    Loads a JSON file of [{"name": ..., "strategy": ..., "params": {...}}, ...]
+    and returns a list of (name, StrategySpec) pairs in file order, the same
+    shape as main.STRATEGIES.
+    """
+    with open(path) as f:
+        entries = json.load(f)
+    return [(entry['name'], StrategySpec.from_dict(entry)) for entry in entries]
+
+def save_strategy_specs(strategies, path):
+    with open(path, 'w') as f:
+        json.dump([{'name': name, **spec.to_dict()} for name, spec in strategies], f, indent=4)
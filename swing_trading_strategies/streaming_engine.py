@@ -0,0 +1,268 @@
+import os
+import pickle
+import sys
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(__file__))
+from custom_backtest_engine import BarData, Position, Trade
+from indicators import online_indicator
+
+# --- Orders ---
+
+@dataclass
+class Order:
+    """A decision taken by StreamingEngine.on_bar, filled at the bar's close."""
+    action: str          # 'buy', 'pyramid' or 'sell'
+    date: pd.Timestamp
+    price: float
+    shares: float
+    reason: str = None   # exit reason for 'sell'
+
+# --- Rolling Bars ---
+
+_PRICE_COLUMNS = ('Open', 'High', 'Low', 'Close', 'Volume')
+
+class RollingBars(BarData):
+    """
+    BarData over only the most recent `capacity` bars. Each column lives in
+    a buffer of twice the capacity: bars are appended at the end and, when
+    the buffer is full, the last capacity - 1 bars are moved back to the
+    front, so appends are amortized O(1) and every column is always a
+    contiguous view. Indicator columns in `ind` roll along with the prices,
+    so generate_signals(bars, len(bars) - 1, ...) sees the same values at
+    the current and previous bar as it would on the full history.
+    """
+    def __init__(self, capacity, indicator_names=()):
+        self.capacity = capacity
+        self.source = None
+        self.frame = None
+        self._columns = {name: np.empty(2 * capacity) for name in _PRICE_COLUMNS}
+        self._indicators = {name: np.empty(2 * capacity) for name in indicator_names}
+        self._dates = None  # created on the first bar, in that bar's datetime unit
+        self.date_values = np.empty(0, dtype='datetime64[ns]')
+        self.dates = np.empty(0, dtype=np.int64)
+        self._start = self._end = 0
+        self._indicator_cache = {}
+        self._refresh()
+
+    def _refresh(self):
+        window = slice(self._start, self._end)
+        self.open, self.high, self.low, self.close, self.volume = (self._columns[c][window] for c in _PRICE_COLUMNS)
+        if self._dates is not None:
+            self.date_values = self._dates[window]
+            self.dates = self.date_values.astype('datetime64[ns]').view(np.int64)
+        self.ind = {name: values[window] for name, values in self._indicators.items()}
+
+    def append(self, date, prices):
+        """
+        Adds a bar; `date` is a timestamp or np.datetime64 and `prices` maps
+        the price columns to values (missing ones are NaN).
+        """
+        if not isinstance(date, np.datetime64):
+            date = pd.Timestamp(date)
+            # Dates are tz-naive UTC, as data_loader stores them
+            date = (date.tz_convert(None) if date.tzinfo else date).to_datetime64()
+        if self._dates is None:
+            self._dates = np.empty(2 * self.capacity, dtype=date.dtype)
+        if self._end == 2 * self.capacity:
+            keep = slice(self._end - self.capacity + 1, self._end)
+            for values in (*self._columns.values(), *self._indicators.values(), self._dates):
+                values[:self.capacity - 1] = values[keep]
+            self._end = self.capacity - 1
+        end = self._end
+        for column, values in self._columns.items():
+            values[end] = prices.get(column, np.nan)
+        self._dates[end] = date
+        self._end = end + 1
+        self._start = max(0, self._end - self.capacity)
+        self._refresh()
+
+    def set_indicator(self, name, value):
+        """Sets indicator `name` at the newest bar."""
+        self._indicators[name][self._end - 1] = value
+
+    def array(self, column):
+        return getattr(self, column.lower())
+
+    def indicator(self, kind, column, window):
+        raise TypeError("RollingBars indicators are updated bar by bar by StreamingEngine")
+
+# --- Streaming Engine ---
+
+class StreamingEngine:
+    """
+    Incremental counterpart of BacktestEngine for live or paper trading:
+    on_bar() takes one new bar, updates the indicators, asks the strategy
+    for its decision and applies it, returning the resulting Order (or None).
+    Position, stops, strategy state and the last few bars are kept in memory,
+    so each bar costs the same however long the history is.
+
+    Feeding a series bar by bar makes the same decisions BacktestEngine.run
+    makes at each bar; results() then returns its (trades, equity_curve),
+    force-closing any open position at the last bar as run() does. The
+    indicators are the O(1) updaters of indicators.py, which are
+    bit-identical to the arrays the batch engines compute.
+    """
+    def __init__(self, strategy, initial_cash=100000):
+        self.strategy = strategy
+        self.initial_cash = initial_cash
+        self.cash = initial_cash
+        self.position = None
+        self.state = strategy.new_state()
+        self.trades = []
+        self.equity_curve = []
+        self.bar_count = 0
+        specs = strategy.indicators()
+        self._indicators = {name: (column, online_indicator(kind, window))
+                            for name, (kind, column, window) in specs.items()}
+        # generate_signals reads the current and previous bar; warm-up checks
+        # compare the bar index against the longest window
+        capacity = max([window for _, _, window in specs.values()], default=0) + 2
+        self.bars = RollingBars(capacity, specs)
+
+    @property
+    def last_date(self):
+        """Date of the last bar processed, or None before the first one."""
+        return self.bars.date(-1) if self.bar_count else None
+
+    def __getstate__(self):
+        # The equity curve is a list of numpy scalars, far cheaper to pickle as one array
+        state = self.__dict__.copy()
+        state['equity_curve'] = np.array(self.equity_curve, dtype=np.float64)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.equity_curve = self.equity_curve.tolist()
+
+    def save(self, path):
+        """
+        Writes the engine's full state (cash, position, strategy state,
+        indicator windows, recent bars, trades and equity curve) to `path`.
+        load() restores it, and on_bar() / replay() continue from there.
+        """
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            engine = pickle.load(f)
+        if not isinstance(engine, cls):
+            raise ValueError(f"{path} does not hold a {cls.__name__}")
+        return engine
+
+    @classmethod
+    def from_history(cls, strategy, data, initial_cash=100000):
+        """An engine that has already processed every bar of `data`."""
+        engine = cls(strategy, initial_cash)
+        engine.replay(data)
+        return engine
+
+    def replay(self, data):
+        """Feeds every bar of a DataFrame (Date index or column) through on_bar; returns the orders."""
+        frame = data if 'Date' in data.columns else data.reset_index()
+        columns = [c for c in _PRICE_COLUMNS if c in frame.columns]
+        values = frame[columns].to_numpy(dtype=np.float64)
+        orders = []
+        for date, row in zip(frame['Date'].to_numpy(), values):
+            order = self._step(date, dict(zip(columns, row.tolist())))
+            if order is not None:
+                orders.append(order)
+        return orders
+
+    def on_bar(self, bar):
+        """
+        Processes one bar, a mapping with 'Date' and the price columns (e.g.
+        a row of a stockData DataFrame after reset_index()), and returns the
+        Order executed at its close, or None.
+        """
+        return self._step(bar['Date'], {c: float(bar[c]) for c in _PRICE_COLUMNS if c in bar})
+
+    def _step(self, date, prices):
+        bars = self.bars
+        bars.append(date, prices)
+        for name, (column, indicator) in self._indicators.items():
+            bars.set_indicator(name, indicator.update(prices.get(column, np.nan)))
+        i = len(bars) - 1
+        self.bar_count += 1
+
+        # --- Same bookkeeping as BacktestEngine.run for one bar ---
+        price = bars.close[i]
+        position = self.position
+        current_equity = self.cash + (position.size * price) if position else self.cash
+        self.equity_curve.append(current_equity)
+
+        state_args = () if self.state is None else (self.state,)
+        signal, sl_tp_info, size_perc = self.strategy.generate_signals(bars, i, position, *state_args)
+
+        if position and isinstance(sl_tp_info, dict):
+            if 'sl' in sl_tp_info:
+                position.stop_loss = sl_tp_info['sl']
+            if 'tp' in sl_tp_info:
+                position.take_profit = sl_tp_info['tp']
+
+        if not position and signal == 'buy':
+            trade_value = current_equity * (size_perc or 1.0)
+            shares = trade_value / price
+            self.position = Position(
+                entry_date=bars.date(i), entry_price=price, size=shares,
+                stop_loss=sl_tp_info.get('sl'),
+                take_profit=sl_tp_info.get('tp')
+            )
+            self.cash -= shares * price
+            return Order('buy', bars.date(i), price, shares)
+
+        if position and signal == 'pyramid':
+            trade_value = current_equity * (size_perc or 1.0)
+            new_shares = trade_value / price
+            new_total_shares = position.size + new_shares
+            position.entry_price = ((position.entry_price * position.size) + (price * new_shares)) / new_total_shares
+            position.size = new_total_shares
+            self.cash -= new_shares * price
+            return Order('pyramid', bars.date(i), price, new_shares)
+
+        if position and signal == 'sell':
+            date = bars.date(i)
+            self._close(date, price, sl_tp_info)
+            if self.state is not None:
+                self.state = self.strategy.new_state()
+            return Order('sell', date, price, self.trades[-1].size, sl_tp_info)
+        return None
+
+    @staticmethod
+    def _trade(position, date, price, reason):
+        pnl = (price - position.entry_price) * position.size
+        return Trade(
+            entry_date=position.entry_date, entry_price=position.entry_price,
+            exit_date=date, exit_price=price, size=position.size, pnl=pnl,
+            return_pct=pnl / (position.entry_price * position.size) * 100,
+            duration=(date - position.entry_date).days, exit_reason=reason
+        )
+
+    def _close(self, date, price, reason):
+        self.cash += self.position.size * price
+        self.trades.append(self._trade(self.position, date, price, reason))
+        self.position = None
+
+    def results(self):
+        """
+        (trades, equity_curve) as BacktestEngine.run would return them for the
+        bars seen so far, with an open position closed at the last bar. The
+        engine itself is left untouched and can keep receiving bars.
+        """
+        trades = list(self.trades)
+        cash = self.cash
+        if self.position:
+            price = self.bars.close[-1]
+            cash += self.position.size * price
+            trades.append(self._trade(self.position, self.bars.date(-1), price, 'forced_close'))
+        return pd.DataFrame([t.__dict__ for t in trades]), pd.Series(self.equity_curve + [cash])
@@ -0,0 +1,185 @@
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(__file__))
+from config import START_DATE
+from data_loader import prime_cache, ticker_path
+
+# Synthetic stockData for scale testing, without network access. Prices follow
+# geometric Brownian motion ('gbm') or a regime-switching GBM ('regime') whose
+# drift and volatility jump between regimes of random (geometric) length. Files
+# are written in exactly the stockData CSV layout, and by default the matching
+# data_loader cache entry is written as well, so the first load skips parsing.
+#
+# Bars are generated in blocks of CHUNK_BARS, each from its own random streams
+# (seeded by seed, ticker index, block and stream), so a series of tens of
+# millions of bars never has to be held in memory to write its CSV, and a
+# shorter series is always a prefix of a longer one with the same seed - handy
+# for simulating newly appended bars.
+#
+#   python synthetic_data.py --tickers 1000 --bars 6000 --model regime --out ../syntheticData
+#   python main.py --data-dir ../syntheticData --no-plots
+#
+# main.py and portfolio_analyzer.py slice every series to START_DATE..END_DATE
+# in config.py, so for more bars per ticker in range use --freq min.
+
+SYNTHETIC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'syntheticData'))
+CHUNK_BARS = 1_000_000
+MODELS = ('gbm', 'regime')
+TIMEZONE = 'America/New_York'  # stockData dates are local midnights with their UTC offset
+TRADING_DAYS = 252
+PRICE_DECIMALS = 6  # rounded so the prices survive the CSV round trip exactly
+BASE_VOLUME = 5_000_000
+DEFAULT_DRIFT = 0.08       # annualized
+DEFAULT_VOLATILITY = 0.25  # annualized
+# (annual drift, annual volatility, mean length in years) of each regime; the
+# regime-switching model moves through them in order
+DEFAULT_REGIMES = ((0.20, 0.15, 2.0), (-0.30, 0.35, 0.5))
+_STREAMS = ('returns', 'regimes', 'range', 'volume')
+
+def _bars_per_year(offset):
+    if isinstance(offset, pd.offsets.Tick):
+        return pd.Timedelta(days=365.25) / pd.Timedelta(offset)
+    return TRADING_DAYS
+
+def _regime_path(rng, size, regime, mean_lengths):
+    """Regime of each of `size` bars, starting in `regime`; run lengths are geometric."""
+    path = np.empty(size, dtype=np.intp)
+    filled = 0
+    while filled < size:
+        run = int(rng.geometric(min(1.0, 1 / mean_lengths[regime])))
+        path[filled:filled + run] = regime
+        filled += run
+        regime = (regime + 1) % len(mean_lengths)
+    return path
+
+def iter_chunks(n_bars, seed=0, ticker_index=0, model='gbm', start=START_DATE, freq='B', start_price=100.0,
+                drift=DEFAULT_DRIFT, volatility=DEFAULT_VOLATILITY, regimes=DEFAULT_REGIMES, bars_per_year=None):
+    """
+    Yields the series in blocks of up to CHUNK_BARS rows, as DataFrames with
+    the stockData columns and a tz-aware 'Date' index (as in the CSV).
+    Drift and volatility are annualized; bars_per_year defaults to 252 for
+    business days and the calendar count for intraday frequencies.
+    """
+    if model not in MODELS:
+        raise ValueError(f"Unknown model: {model} (expected one of {', '.join(MODELS)})")
+    offset = pd.tseries.frequencies.to_offset(freq)
+    first = pd.date_range(pd.Timestamp(start), periods=1, freq=offset, tz=TIMEZONE)[0]
+    try:
+        # The offset arithmetic itself may switch to a coarser unit instead of overflowing
+        in_range = (first + (n_bars - 1) * offset).tz_localize(None) < pd.Timestamp.max - pd.Timedelta(days=1)
+    except (OverflowError, pd.errors.OutOfBoundsDatetime):
+        in_range = False
+    if not in_range:
+        raise ValueError(f"{n_bars} bars at freq={freq} from {first.date()} run past the Timestamp range; "
+                         "use fewer bars or a shorter frequency such as 'min'")
+    bars_per_year = bars_per_year or _bars_per_year(offset)
+    mean_lengths = [years * bars_per_year for _, _, years in regimes]
+
+    last_close, regime = float(start_price), 0
+    for chunk, lo in enumerate(range(0, n_bars, CHUNK_BARS)):
+        size = min(CHUNK_BARS, n_bars - lo)
+        rngs = {stream: np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(ticker_index, chunk, i)))
+                for i, stream in enumerate(_STREAMS)}
+        if model == 'regime':
+            path = _regime_path(rngs['regimes'], size, regime, mean_lengths)
+            regime = int(path[-1])
+            annual_drift = np.array([d for d, _, _ in regimes])[path]
+            annual_vol = np.array([v for _, v, _ in regimes])[path]
+        else:
+            annual_drift, annual_vol = drift, volatility
+        mu, sigma = annual_drift / bars_per_year, annual_vol / np.sqrt(bars_per_year)
+
+        log_returns = mu - 0.5 * sigma**2 + sigma * rngs['returns'].standard_normal(size)
+        close = last_close * np.exp(np.cumsum(log_returns))
+        open_ = np.concatenate([[last_close], close[:-1]])
+        last_close = float(close[-1])
+        # High and low extend past the open/close by about half a bar's volatility
+        extension = np.abs(rngs['range'].standard_normal(2 * size)).reshape(2, size, order='F') * (0.5 * sigma)
+        volume = BASE_VOLUME * np.exp(0.5 * rngs['volume'].standard_normal(size)) * (1 + np.abs(log_returns) / sigma)
+
+        dates = pd.date_range(first + lo * offset, periods=size, freq=offset, name='Date')
+        yield pd.DataFrame({
+            'Open': np.round(open_, PRICE_DECIMALS),
+            'High': np.round(np.maximum(open_, close) * np.exp(extension[0]), PRICE_DECIMALS),
+            'Low': np.round(np.minimum(open_, close) * np.exp(-extension[1]), PRICE_DECIMALS),
+            'Close': np.round(close, PRICE_DECIMALS),
+            'Volume': np.rint(volume).astype(np.int64),
+            'Dividends': 0.0,
+            'Stock Splits': 0.0,
+        }, index=dates)
+
+def _as_loaded(chunk):
+    """A CSV block as load_ohlcv returns it: tz-naive UTC dates."""
+    chunk.index = chunk.index.tz_convert('UTC').tz_localize(None)
+    return chunk
+
+def synthetic_ohlcv(n_bars, seed=0, **options):
+    """
+    The series as a DataFrame identical to what load_ohlcv returns for the CSV
+    write_ticker writes with the same arguments (see iter_chunks for options).
+    """
+    return pd.concat([_as_loaded(chunk) for chunk in iter_chunks(n_bars, seed, **options)])
+
+def write_ticker(data_dir, ticker, n_bars, seed=0, ticker_index=0, cache=True, **options):
+    """
+    Writes {ticker}_1d.csv into `data_dir` in the stockData layout, block by
+    block; cache=True also writes its data_loader cache entry (this keeps the
+    whole series in memory). Returns the CSV path.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    path = ticker_path(ticker, data_dir)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    blocks = []
+    try:
+        with open(tmp_path, 'w', newline='') as f:
+            for chunk in iter_chunks(n_bars, seed, ticker_index, **options):
+                chunk.to_csv(f, header=f.tell() == 0)
+                if cache:
+                    blocks.append(_as_loaded(chunk))
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    if cache:
+        prime_cache(path, pd.concat(blocks))
+    return path
+
+def write_universe(data_dir, n_tickers, n_bars, seed=0, workers=1, cache=True, **options):
+    """
+    Writes `n_tickers` tickers (SYN0000, SYN0001, ...) of `n_bars` bars each,
+    every one with its own random streams, in `workers` processes. Returns the
+    CSV paths.
+    """
+    width = max(4, len(str(n_tickers - 1)))
+    tickers = [f'SYN{i:0{width}d}' for i in range(n_tickers)]
+    write = partial(_write_indexed, data_dir, n_bars=n_bars, seed=seed, cache=cache, **options)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(write, range(n_tickers), tickers))
+    return [write(i, ticker) for i, ticker in enumerate(tickers)]
+
+def _write_indexed(data_dir, ticker_index, ticker, **kwargs):
+    return write_ticker(data_dir, ticker, ticker_index=ticker_index, **kwargs)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Write synthetic OHLCV files in the stockData layout for scale testing.')
+    parser.add_argument('--tickers', type=int, default=10, help='Number of tickers (default: 10)')
+    parser.add_argument('--bars', type=int, default=6000, help='Bars per ticker (default: 6000)')
+    parser.add_argument('--model', choices=MODELS, default='gbm', help='Price model (default: gbm)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    parser.add_argument('--freq', default='B',
+                        help="Bar frequency as a pandas offset alias, e.g. B or min (default: B)")
+    parser.add_argument('--start', default=str(START_DATE.date()), help='First date (default: config START_DATE)')
+    parser.add_argument('--out', default=SYNTHETIC_DIR, help=f'Output directory (default: {SYNTHETIC_DIR})')
+    parser.add_argument('--no-cache', action='store_true', help='Write only the CSVs, not their binary cache entries')
+    parser.add_argument('--workers', type=int, default=1, help='Number of processes (default: 1)')
+    args = parser.parse_args()
+    paths = write_universe(args.out, args.tickers, args.bars, seed=args.seed, workers=args.workers,
+                           cache=not args.no_cache, model=args.model, freq=args.freq, start=args.start)
+    print(f"Wrote {len(paths)} tickers x {args.bars} bars to {args.out}")
@@ -0,0 +1,196 @@
+import argparse
+import os
+import sqlite3
+import numpy as np
+import pandas as pd
+
+# Structured store for the trades of every backtest, replacing the
+# trade_logs.txt text dump. Trades live in one SQLite file (stdlib, no extra
+# dependency) with one row per trade, indexed by ticker and strategy, exit
+# date and exit reason, so questions like "all Trailing Stop exits for NVDA"
+# are a single indexed query:
+#
+#   python trade_store.py --ticker NVDA --reason "Trailing Stop"
+#   python trade_store.py --export trade_logs.txt
+#
+# Appends are buffered and written in batches of `batch_rows` rows, one
+# transaction per batch. The database runs in WAL mode with a busy timeout,
+# so several processes may append at once; main.py still sends every write
+# through the parent process so rows keep the (ticker, strategy) task order.
+# The text layout of trade_logs.txt is an optional export (export_text).
+
+TRADE_STORE_PATH = os.path.join(os.path.dirname(__file__), 'trades.db')
+BATCH_ROWS = 10_000
+BUSY_TIMEOUT_MS = 30_000
+_SCHEMA_VERSION = 1  # a store with another version is rebuilt empty
+TRADE_COLUMNS = ['entry_date', 'entry_price', 'exit_date', 'exit_price', 'size', 'pnl', 'return_pct',
+                 'duration', 'exit_reason']
+_DATE_COLUMNS = ('entry_date', 'exit_date')
+# main.run_backtest renames these columns, backtesting.py style; trade_logs.txt shows them so
+LOG_COLUMN_NAMES = {'pnl': 'PnL', 'return_pct': 'ReturnPct', 'exit_reason': 'Tag'}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS backtests (
+    id INTEGER PRIMARY KEY,
+    ticker TEXT NOT NULL,
+    strategy TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS trades (
+    backtest_id INTEGER NOT NULL REFERENCES backtests (id),
+    ticker TEXT NOT NULL,
+    strategy TEXT NOT NULL,
+    entry_date TEXT NOT NULL,
+    entry_price REAL,
+    exit_date TEXT NOT NULL,
+    exit_price REAL,
+    size REAL,
+    pnl REAL,
+    return_pct REAL,
+    duration INTEGER,
+    exit_reason TEXT
+);
+CREATE INDEX IF NOT EXISTS trades_by_ticker_strategy ON trades (ticker, strategy);
+CREATE INDEX IF NOT EXISTS trades_by_exit_date ON trades (exit_date);
+CREATE INDEX IF NOT EXISTS trades_by_exit_reason ON trades (exit_reason, ticker);
+"""
+
+def _iso(dates):
+    """Dates as sortable ISO-8601 text (to the second), as stored."""
+    return np.datetime_as_string(np.asarray(dates, dtype='datetime64[s]'))
+
+class TradeStore:
+    """
+    Append-only trade store in the SQLite file at `path`. append() buffers
+    the trades DataFrame of one backtest (as the engines return it); rows
+    reach the file on flush(), every `batch_rows` rows, and on close().
+    """
+    def __init__(self, path=TRADE_STORE_PATH, batch_rows=BATCH_ROWS):
+        self.path = path
+        self.batch_rows = batch_rows
+        self._pending = []
+        self.connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        if self.connection.execute('PRAGMA user_version').fetchone()[0] != _SCHEMA_VERSION:
+            self.connection.executescript('DROP TABLE IF EXISTS trades; DROP TABLE IF EXISTS backtests;')
+            self.connection.execute(f'PRAGMA user_version = {_SCHEMA_VERSION}')
+        self.connection.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self.connection is not None:
+            self.flush()
+            self.connection.close()
+            self.connection = None
+
+    # --- Writing ---
+
+    def clear(self):
+        """Removes every backtest and trade (main.py starts each run from an empty store)."""
+        self._pending.clear()
+        with self.connection:
+            self.connection.execute('DELETE FROM trades')
+            self.connection.execute('DELETE FROM backtests')
+
+    def append(self, ticker, strategy, trades):
+        """
+        Adds one backtest's trades (possibly none, which still records the
+        backtest), with the engine's column names or LOG_COLUMN_NAMES. Each
+        call is a new backtest, even for a (ticker, strategy) seen before.
+        """
+        # The backtest row joins the open transaction; its trades follow in the next batch
+        backtest_id = self.connection.execute(
+            'INSERT INTO backtests (ticker, strategy) VALUES (?, ?)', (ticker, strategy)).lastrowid
+        if len(trades):
+            columns = [trades[c if c in trades.columns else LOG_COLUMN_NAMES[c]].to_numpy() for c in TRADE_COLUMNS]
+            columns = [_iso(values) if c in _DATE_COLUMNS else values for c, values in zip(TRADE_COLUMNS, columns)]
+            head = [backtest_id, ticker, strategy]
+            self._pending.extend(head + row for row in map(list, zip(*(c.tolist() for c in columns))))
+        if len(self._pending) >= self.batch_rows:
+            self.flush()
+
+    def flush(self):
+        """Writes the buffered trades and commits them with their backtests."""
+        placeholders = ', '.join('?' * (3 + len(TRADE_COLUMNS)))
+        with self.connection:
+            if self._pending:
+                self.connection.executemany(
+                    f"INSERT INTO trades (backtest_id, ticker, strategy, {', '.join(TRADE_COLUMNS)}) VALUES ({placeholders})",
+                    self._pending)
+        self._pending.clear()
+
+    # --- Reading ---
+
+    def backtests(self):
+        """[(id, ticker, strategy), ...] in append order."""
+        self.flush()
+        return self.connection.execute('SELECT id, ticker, strategy FROM backtests ORDER BY id').fetchall()
+
+    def query(self, ticker=None, strategy=None, exit_reason=None, start=None, end=None):
+        """
+        Trades matching every given filter (exit dates within [start, end]),
+        with backtest_id, ticker and strategy columns, in append order.
+        """
+        self.flush()
+        filters, params = [], []
+        for column, value in (('ticker', ticker), ('strategy', strategy), ('exit_reason', exit_reason)):
+            if value is not None:
+                filters.append(f'{column} = ?')
+                params.append(value)
+        if start is not None:
+            filters.append('exit_date >= ?')
+            params.append(_iso([pd.Timestamp(start)])[0])
+        if end is not None:
+            filters.append('exit_date <= ?')
+            params.append(_iso([pd.Timestamp(end)])[0])
+        where = f"WHERE {' AND '.join(filters)}" if filters else ''
+        frame = pd.read_sql_query(
+            f"SELECT backtest_id, ticker, strategy, {', '.join(TRADE_COLUMNS)} FROM trades {where} "
+            "ORDER BY backtest_id, rowid",
+            self.connection, params=params)
+        for column in _DATE_COLUMNS:
+            frame[column] = pd.to_datetime(frame[column], format='%Y-%m-%dT%H:%M:%S')
+        return frame
+
+    def trades(self, ticker, strategy):
+        """The trades DataFrame of (ticker, strategy), as the engine returned it (its last backtest if several)."""
+        self.flush()
+        row = self.connection.execute('SELECT max(id) FROM backtests WHERE ticker = ? AND strategy = ?',
+                                      (ticker, strategy)).fetchone()
+        frame = self.query(ticker=ticker, strategy=strategy)
+        frame = frame[frame['backtest_id'] == row[0]]
+        return frame[TRADE_COLUMNS].reset_index(drop=True) if len(frame) else pd.DataFrame([])
+
+    def export_text(self, path):
+        """Writes every backtest's trades in the trade_logs.txt layout (LOG_COLUMN_NAMES), in append order."""
+        grouped = dict(iter(self.query().groupby('backtest_id', sort=False)))
+        with open(path, 'w') as f:
+            for backtest_id, ticker, strategy in self.backtests():
+                frame = grouped.get(backtest_id)
+                frame = frame[TRADE_COLUMNS].rename(columns=LOG_COLUMN_NAMES) if frame is not None else pd.DataFrame([])
+                f.write(f'{ticker}_{strategy} TRADES:\n' + frame.to_string(index=False) + '\n\n')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Query the trade store written by main.py.')
+    parser.add_argument('--path', default=TRADE_STORE_PATH, help='Trade store file (default: trades.db)')
+    parser.add_argument('--ticker')
+    parser.add_argument('--strategy')
+    parser.add_argument('--reason', help='Exit reason, e.g. "Trailing Stop"')
+    parser.add_argument('--start', help='Earliest exit date')
+    parser.add_argument('--end', help='Latest exit date')
+    parser.add_argument('--export', metavar='PATH', help='Write every backtest in the trade_logs.txt layout instead')
+    args = parser.parse_args()
+    if not os.path.exists(args.path):
+        raise FileNotFoundError(f'{args.path} not found. Please run main.py first.')
+    with TradeStore(args.path) as store:
+        if args.export:
+            store.export_text(args.export)
+            print(f"Trade logs written to {args.export}")
+        else:
+            trades = store.query(args.ticker, args.strategy, args.reason, args.start, args.end)
+            print(trades.to_string(index=False))
+            print(f"\n{len(trades)} trade(s)")
@@ -0,0 +1,241 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(__file__))
+import custom_backtest_engine
+from custom_backtest_engine import BarData, create_engine
+from batch_engine import ParameterBatchEngine
+from config import START_DATE, END_DATE
+from data_loader import DATA_DIR
+from parameter_sweep import BATCH_MIN_CONFIGS, available_tickers, expand_grid, load_ticker_data
+
+# Walk-forward optimization: the history is cut into rolling (or anchored)
+# in-sample / out-of-sample windows; in each window the parameter grid is
+# backtested on the in-sample bars, the best configuration by `objective` is
+# run on the following out-of-sample bars, and the out-of-sample equity
+# curves are stitched into one compounded curve.
+#
+#   python walk_forward.py --tickers NVDA --in-sample 36 --out-of-sample 12 \
+#       --grid '{"length": [20, 50, 100], "stdev_factor": [1.5, 2.0]}'
+#
+# Windows are independent, so they are fanned out across a ProcessPoolExecutor.
+# Each worker loads every ticker once (pool initializer), and every window is a
+# BarData.window() view of it: indicators are computed once over the whole
+# series and sliced, so overlapping windows and all configurations share them
+# (and a window's first bars see indicators warmed up on the bars before it).
+# In-sample grids of at least BATCH_MIN_CONFIGS vectorized configurations run
+# through ParameterBatchEngine in chunks of IN_SAMPLE_CHUNK.
+#
+# Every window is backtested on its own: it starts flat, the strategies' warm-up
+# guards apply from its first bar, and open positions are closed at its last bar.
+
+# Per-process cache of whole-series BarData, filled by the pool initializer
+_WORKER_BARS = {}
+
+IN_SAMPLE_CHUNK = 500  # configurations per ParameterBatchEngine run (its arrays are bars x configs)
+TRADING_DAYS = 252
+
+def _sharpe_ratio(equity):
+    """Annualized Sharpe ratio of the bar-to-bar equity returns, as in generate_summary_from_trades."""
+    returns = np.diff(equity) / equity[:-1]
+    returns = returns[~np.isnan(returns)]
+    if len(returns) < 2:
+        return np.nan
+    std = returns.std(ddof=1)
+    return returns.mean() / std * TRADING_DAYS ** 0.5 if std > 0 else np.nan
+
+def _return_pct(equity):
+    return (equity[-1] / equity[0] - 1) * 100
+
+# objective -> (metric column, function of the equity array); configurations without trades score NaN
+OBJECTIVES = {
+    'sharpe': ('Sharpe Ratio', _sharpe_ratio),
+    'return': ('Return [%]', _return_pct),
+}
+
+@dataclass
+class WalkForwardResult:
+    windows: pd.DataFrame  # one row per (ticker, window): dates, chosen parameters, in/out-of-sample metrics
+    equity: dict           # ticker -> stitched out-of-sample equity Series indexed by date
+    trades: pd.DataFrame   # out-of-sample trades of every window, sizes and pnl on the stitched capital
+
+def walk_forward_windows(dates, in_sample_months=36, out_of_sample_months=12, anchored=False):
+    """
+    Bar index ranges [(is_start, is_stop, oos_start, oos_stop), ...] over the
+    sorted `dates`. Out-of-sample windows of `out_of_sample_months` follow each
+    other from `in_sample_months` after the first date; each in-sample window
+    covers the `in_sample_months` before it, or everything before it when
+    `anchored`. The last out-of-sample window may be shorter.
+    """
+    dates = pd.DatetimeIndex(dates)
+    if len(dates) == 0:
+        return []
+    windows = []
+    oos_start_date = dates[0] + pd.DateOffset(months=in_sample_months)
+    while True:
+        oos_start = dates.searchsorted(oos_start_date, side='left')
+        if oos_start >= len(dates):
+            break
+        oos_stop_date = oos_start_date + pd.DateOffset(months=out_of_sample_months)
+        oos_stop = dates.searchsorted(oos_stop_date, side='left')
+        is_start = 0 if anchored else dates.searchsorted(oos_start_date - pd.DateOffset(months=in_sample_months), side='left')
+        if oos_stop > oos_start and oos_start > is_start:
+            windows.append((int(is_start), int(oos_start), int(oos_start), int(oos_stop)))
+        oos_start_date = oos_stop_date
+    return windows
+
+def _init_worker(data_dir, tickers, start_date, end_date):
+    _WORKER_BARS.clear()
+    for ticker in tickers:
+        data = load_ticker_data(data_dir, ticker, start_date, end_date)
+        if not data.empty:
+            _WORKER_BARS[ticker] = BarData(data.reset_index())
+
+def _score_configs(strategies, bars, score, initial_cash):
+    """(objective score, # trades) of each strategy on `bars`."""
+    results = []
+    for start in range(0, len(strategies), IN_SAMPLE_CHUNK):
+        chunk = strategies[start:start + IN_SAMPLE_CHUNK]
+        if len(chunk) >= BATCH_MIN_CONFIGS and all(strat.vectorized for strat in chunk):
+            results.extend(ParameterBatchEngine(bars, chunk, initial_cash=initial_cash).run())
+        else:
+            results.extend(create_engine(bars, strat, initial_cash=initial_cash).run() for strat in chunk)
+    return [(score(equity.to_numpy()) if len(trades) else np.nan, len(trades)) for trades, equity in results]
+
+def _run_window(strategy_class, fixed_params, configs, objective, initial_cash, ticker, window_id, window):
+    """Optimizes one window in-sample and runs the winner out-of-sample; returns (row, trades, equity values)."""
+    bars = _WORKER_BARS[ticker]
+    is_start, is_stop, oos_start, oos_stop = window
+    metric, score = OBJECTIVES[objective]
+    strategies = [strategy_class(**{**fixed_params, **params}) for params in configs]
+    scores = _score_configs(strategies, bars.window(is_start, is_stop), score, initial_cash)
+    values = np.array([s for s, _ in scores], dtype=np.float64)
+    # Without any scored configuration (no in-sample trades at all) the first one is kept
+    best = int(np.nanargmax(values)) if not np.isnan(values).all() else 0
+
+    oos_bars = bars.window(oos_start, oos_stop)
+    trades, equity = create_engine(oos_bars, strategies[best], initial_cash=initial_cash).run()
+    equity = equity.to_numpy()
+    row = {
+        'Ticker': ticker, 'Window': window_id,
+        'IS Start': bars.date(is_start), 'IS End': bars.date(is_stop - 1),
+        'OOS Start': bars.date(oos_start), 'OOS End': bars.date(oos_stop - 1),
+        **configs[best],
+        f'IS {metric}': values[best], 'IS # Trades': scores[best][1],
+        f'OOS {metric}': score(equity) if len(trades) else np.nan,
+        'OOS Return [%]': _return_pct(equity), 'OOS # Trades': len(trades),
+    }
+    return row, trades, equity
+
+def _stitch(ticker, runs, dates, initial_cash):
+    """
+    Chains the out-of-sample runs of one ticker into one equity Series. Every
+    run starts from initial_cash and positions are sized on equity, so a run
+    scaled by (capital carried in / initial_cash) is the run on that capital.
+    """
+    capital = float(initial_cash)
+    curves, trade_frames = [], []
+    for window_id, window, trades, equity in runs:
+        scale = capital / initial_cash
+        curves.append(pd.Series(equity[1:] * scale, index=dates[window[2]:window[3]]))
+        if len(trades):
+            trades = trades.assign(size=trades['size'] * scale, pnl=trades['pnl'] * scale)
+            trade_frames.append(trades.assign(ticker=ticker, window=window_id))
+        capital = float(equity[-1] * scale)
+    equity = pd.concat(curves) if curves else pd.Series(dtype=np.float64)
+    return equity, trade_frames
+
+def run_walk_forward(strategy_class, param_grid, tickers=None, in_sample_months=36, out_of_sample_months=12,
+                     anchored=False, objective='sharpe', fixed_params=None, initial_cash=100000, workers=None,
+                     data_dir=DATA_DIR, start_date=START_DATE, end_date=END_DATE):
+    """
+    Walk-forward optimization of `strategy_class` over `param_grid` on every
+    ticker (see walk_forward_windows for the windows). Returns a
+    WalkForwardResult. Windows run across `workers` processes (default: all
+    cores); workers=1 runs everything in this process.
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective: {objective} (expected one of {', '.join(OBJECTIVES)})")
+    tickers = list(tickers) if tickers else available_tickers(data_dir)
+    fixed_params = dict(fixed_params or {})
+    configs = expand_grid(param_grid)
+    workers = workers or os.cpu_count() or 1
+
+    # Windows only need the dates; workers load the full bars in their initializer
+    ticker_dates = {}
+    for ticker in tickers:
+        data = load_ticker_data(data_dir, ticker, start_date, end_date)
+        if not data.empty:
+            ticker_dates[ticker] = data.index
+    tasks = [(ticker, window_id, window) for ticker, dates in ticker_dates.items()
+             for window_id, window in enumerate(walk_forward_windows(dates, in_sample_months, out_of_sample_months, anchored))]
+    print(f"Walk-forward: {len(tasks)} windows x {len(configs)} configurations = {len(tasks) * len(configs)} "
+          f"in-sample backtests ({workers} workers)...")
+    start = time.perf_counter()
+
+    args = [strategy_class, fixed_params, configs, objective, initial_cash]
+    loaded = list(ticker_dates)
+    if workers == 1 or len(tasks) <= 1:
+        _init_worker(data_dir, loaded, start_date, end_date)
+        results = [_run_window(*args, *task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), initializer=_init_worker,
+                                 initargs=(data_dir, loaded, start_date, end_date)) as executor:
+            futures = [executor.submit(_run_window, *args, *task) for task in tasks]
+            results = [future.result() for future in futures]
+
+    runs = {}
+    for (ticker, window_id, window), (_, trades, equity) in zip(tasks, results):
+        runs.setdefault(ticker, []).append((window_id, window, trades, equity))
+    equity, trade_frames = {}, []
+    for ticker, ticker_runs in runs.items():
+        equity[ticker], frames = _stitch(ticker, ticker_runs, ticker_dates[ticker], initial_cash)
+        trade_frames.extend(frames)
+
+    elapsed = time.perf_counter() - start
+    print(f"Walk-forward finished in {elapsed:.1f}s")
+    trades = pd.concat(trade_frames, ignore_index=True) if trade_frames else pd.DataFrame([])
+    return WalkForwardResult(pd.DataFrame([row for row, _, _ in results]), equity, trades)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Walk-forward optimization over the stockData universe.')
+    parser.add_argument('--strategy', default='TwoStdDevStrategy', help='Strategy class name in custom_backtest_engine')
+    parser.add_argument('--grid', default=None,
+                        help='JSON parameter grid, e.g. \'{"length": [20, 50], "stdev_factor": [1.5, 2.0]}\'')
+    parser.add_argument('--tickers', nargs='*', default=None)
+    parser.add_argument('--in-sample', type=int, default=36, help='In-sample window in months (default: 36)')
+    parser.add_argument('--out-of-sample', type=int, default=12, help='Out-of-sample window in months (default: 12)')
+    parser.add_argument('--anchored', action='store_true', help='Grow the in-sample window from the first date')
+    parser.add_argument('--objective', choices=list(OBJECTIVES), default='sharpe', help='In-sample ranking (default: sharpe)')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--data-dir', default=DATA_DIR, help='Directory of {ticker}_1d.csv files (default: stockData)')
+    parser.add_argument('--output', default=os.path.join(os.path.dirname(__file__), 'walk_forward'),
+                        help='Prefix of the _windows.csv and _equity.csv outputs')
+    args = parser.parse_args()
+
+    grid = json.loads(args.grid) if args.grid else {
+        'length': [20, 50, 100, 260],
+        'stdev_factor': [1.5, 2.0, 2.5],
+        'trailing_stop_perc': [0.05, 0.10, 0.20, 0.50],
+        'pyramid_profit_perc': [0.10, 0.20],
+    }
+    initial_cash = 100000
+    result = run_walk_forward(getattr(custom_backtest_engine, args.strategy), grid, tickers=args.tickers,
+                              in_sample_months=args.in_sample, out_of_sample_months=args.out_of_sample,
+                              anchored=args.anchored, objective=args.objective, initial_cash=initial_cash,
+                              workers=args.workers, data_dir=args.data_dir)
+    result.windows.to_csv(f'{args.output}_windows.csv', index=False)
+    pd.DataFrame(result.equity).to_csv(f'{args.output}_equity.csv', index_label='Date')
+    for ticker, equity in result.equity.items():
+        if len(equity):
+            print(f"{ticker}: out-of-sample return {(equity.iloc[-1] / initial_cash - 1) * 100:.2f}% "
+                  f"over {(result.windows['Ticker'] == ticker).sum()} windows")
+    print(f"Saved {len(result.windows)} windows to {args.output}_windows.csv and the equity curves to {args.output}_equity.csv")